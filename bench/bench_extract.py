@@ -0,0 +1,91 @@
+# bench_extract.py
+"""
+Порівняння швидкого витягання тексту (schedule/extract.py) з BeautifulSoup.get_text.
+
+Спершу перевіряє еквівалентність: обидва шляхи мають дати однаковий список
+інтервалів (підчерга, початок, кінець). Потім міряє час.
+
+Запуск з кореня репозиторію:
+    python -m bench.bench_extract                    # синтетичні сторінки
+    python -m bench.bench_extract saved1.html ...    # + збережені сторінки ZOE
+    python -m bench.bench_extract tests/fixtures/*.html
+
+Та сама перевірка еквівалентності на збережених сторінках — tests/test_extract.py.
+"""
+import sys
+import timeit
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from bench.synthetic import make_page
+from schedule.extract import extract_schedule_text
+from schedule.snapshot import _interval_re
+
+
+def intervals_bs4(page: str) -> list[tuple[str, str, str]]:
+    text = BeautifulSoup(page, "html.parser").get_text("\n")
+    return [(m.group(1).strip(), m.group(2), m.group(3)) for m in _interval_re.finditer(text)]
+
+
+def intervals_fast(page: str) -> list[tuple[str, str, str]]:
+    text = extract_schedule_text(page)
+    return [(m.group(1).strip(), m.group(2), m.group(3)) for m in _interval_re.finditer(text)]
+
+
+def check_equivalent(name: str, page: str):
+    ref, fast = intervals_bs4(page), intervals_fast(page)
+    if ref != fast:
+        raise AssertionError(
+            f"{name}: різні інтервали\n  bs4:  {ref[:10]}...({len(ref)})\n  fast: {fast[:10]}...({len(fast)})"
+        )
+    return len(ref)
+
+
+def _best(fn, page: str, number: int) -> float:
+    return min(timeit.repeat(lambda: fn(page), number=number, repeat=3)) / number
+
+
+def run(pages: list[tuple[str, str]]) -> list[dict]:
+    results = []
+    for name, page in pages:
+        n = check_equivalent(name, page)
+        number = max(1, int(2_000_000 / max(len(page), 1)))
+        t_bs4 = _best(intervals_bs4, page, number)
+        t_fast = _best(intervals_fast, page, number)
+        results.append(
+            {
+                "page": name,
+                "bytes": len(page),
+                "intervals": n,
+                "bs4_ms": t_bs4 * 1000,
+                "fast_ms": t_fast * 1000,
+                "speedup": t_bs4 / t_fast if t_fast else float("inf"),
+            }
+        )
+    return results
+
+
+def synthetic_pages() -> list[tuple[str, str]]:
+    return [
+        ("synthetic-small", make_page(seed=1, menu_items=50, script_kb=20, filler_paragraphs=10)),
+        ("synthetic-medium", make_page(seed=2)),
+        ("synthetic-large", make_page(seed=3, groups=12, subgroups=4, days=4, menu_items=800, script_kb=600)),
+    ]
+
+
+def main(argv: list[str]):
+    pages = synthetic_pages()
+    for p in argv:
+        pages.append((Path(p).name, Path(p).read_text(encoding="utf-8", errors="replace")))
+
+    print(f"{'page':<24}{'KB':>8}{'intervals':>11}{'bs4 ms':>10}{'fast ms':>10}{'x':>8}")
+    for r in run(pages):
+        print(
+            f"{r['page']:<24}{r['bytes'] / 1024:>8.0f}{r['intervals']:>11}"
+            f"{r['bs4_ms']:>10.2f}{r['fast_ms']:>10.2f}{r['speedup']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
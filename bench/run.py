@@ -0,0 +1,406 @@
+# run.py
+"""
+Набір бенчмарків гарячих шляхів бота з результатом у JSON.
+
+Що міряємо:
+- parse: _interval_re + BeautifulSoup (старий шлях) і extract + ScheduleSnapshot (поточний)
+  на синтетичних сторінках зростаючого розміру;
+- next: повний next_cmd (кеш, знімок, пошук, відповідь) на заглушках Update;
+- db: get_users_by_subgroup (SQLite і реєстр у пам'яті), was_notified / mark_notified
+  поштучно і пакетно, на синтетичних zap_bot.db з 10k..1M користувачів;
+  search_addr_map (точний запит і з опечаткою) на ADDRESSES синтетичних адрес;
+- notify: повний прохід check_and_notify проти фейкового бота (без мережі й лімітів);
+  .digest — те саме, коли частина користувачів у режимі дайджесту (менше повідомлень).
+
+Запуск з кореня репозиторію:
+    python -m bench.run                                    # 10k і 100k користувачів
+    python -m bench.run --users 10000,100000,1000000 --out bench/results/v1.json
+    python -m bench.run --baseline bench/results/v1.json   # вихід 1 при регресії > 20%
+
+Синтетичні БД створюються у тимчасовій папці; робочу database/zap_bot.db не чіпаємо.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from bench.bench_extract import intervals_bs4
+from bench.synthetic import make_addresses, make_page
+from database import db
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Розмір синтетичного addr_map для search_addr_map
+ADDRESSES = 20_000
+
+
+def _best(fn, number: int, repeat: int = 3) -> float:
+    """Найкращий середній час одного виклику, сек."""
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - t) / number)
+    return best
+
+
+async def _abest(coro_fn, number: int, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        for _ in range(number):
+            await coro_fn()
+        best = min(best, (time.perf_counter() - t) / number)
+    return best
+
+
+# ------------------------
+# Синтетична БД
+# ------------------------
+def make_db(path: Path, users: int, groups: int = 6, subgroups: int = 2, seed: int = 0):
+    """Створює zap_bot.db з users користувачами, рівномірно по підчергах."""
+    db.DB_PATH = path
+    db.init_db()
+    rnd = random.Random(seed)
+    rows = (
+        (
+            100_000_000 + i * 37 + rnd.randrange(37),
+            f"user{i}",
+            str(i % groups + 1),
+            f"{i % groups + 1}.{(i // groups) % subgroups + 1}",
+        )
+        for i in range(users)
+    )
+    with db.transaction() as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO users(chat_id, username, group_id, subgroup, verified) VALUES (?, ?, ?, ?, 1)",
+            rows,
+        )
+
+
+# ------------------------
+# Заглушки Telegram
+# ------------------------
+class _Chat:
+    def __init__(self, chat_id):
+        self.id = chat_id
+
+
+class _Message:
+    def __init__(self):
+        self.replies = 0
+
+    async def reply_text(self, text, **kwargs):
+        self.replies += 1
+
+
+class FakeUpdate:
+    callback_query = None
+
+    def __init__(self, chat_id):
+        self.effective_chat = _Chat(chat_id)
+        self.effective_message = _Message()
+        self.message = self.effective_message
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent += 1
+
+
+class FakeApp:
+    def __init__(self):
+        self.bot = FakeBot()
+
+
+class _Resp:
+    def __init__(self, body: str):
+        self.status_code = 200
+        self.text = body
+        self.content = body.encode()
+        self.headers = {}
+        self.url = "bench://zoe"
+        self.size = len(self.content)
+        self.elapsed = 0.0
+
+
+class FakeFetcher:
+    def __init__(self, body: str):
+        self.body = body
+
+    async def get(self, url, headers=None, timeout=None):
+        return _Resp(self.body)
+
+
+def _due_page(now: datetime, groups: int = 6, subgroups: int = 2) -> str:
+    """Сторінка, де кожна підчерга має інтервал через 10 хв (одразу потрапляє у вікно попередження)."""
+    start = now + timedelta(minutes=10)
+    end = start + timedelta(hours=2)
+    rows = "".join(
+        f"<p>{g}.{s} {start:%H:%M}–{end:%H:%M}</p>"
+        for g in range(1, groups + 1)
+        for s in range(1, subgroups + 1)
+    )
+    return f"<html><body><div class='entry-content'>{rows}</div></body></html>"
+
+
+# ------------------------
+# Бенчмарки
+# ------------------------
+def bench_parse(results: list):
+    import bot
+
+    sizes = [(50, 20, 1), (200, 150, 2), (800, 600, 4), (2000, 2000, 8)]
+    for menu_items, script_kb, days in sizes:
+        page = make_page(seed=menu_items, menu_items=menu_items, script_kb=script_kb, days=days)
+        number = max(1, int(3_000_000 / len(page)))
+        results.append({
+            "name": "parse.bs4_regex",
+            "bytes": len(page),
+            "sec_per_op": _best(lambda: intervals_bs4(page), max(1, number // 10)),
+        })
+        results.append({
+            "name": "parse.snapshot",
+            "bytes": len(page),
+            "sec_per_op": _best(lambda: bot._parse_schedule(page), number),
+        })
+
+
+async def bench_next(results: list, users: int):
+    import bot
+    from database.registry import REGISTRY
+
+    now = datetime.now(bot.TZ)
+    bot.SCHEDULE_CACHE.fetcher = FakeFetcher(_due_page(now))
+    bot.SCHEDULE_CACHE.url = bot.ZOE_LIST_URL = "bench://zoe"
+    await bot.SCHEDULE_CACHE.refresh()
+
+    chat_ids = [r[0] for r in db.get_conn().execute("SELECT chat_id FROM users LIMIT 1000")]
+    it = iter(chat_ids * 1000)
+    for label, loaded in (("sqlite", False), ("registry", True)):
+        REGISTRY.loaded = loaded
+        sec = await _abest(lambda: bot.next_cmd(FakeUpdate(next(it)), None), 500)
+        results.append({"name": f"next_cmd.{label}", "users": users, "sec_per_op": sec})
+
+
+async def bench_db(results: list, users: int):
+    from database import async_db
+    from database.registry import REGISTRY
+
+    t = time.perf_counter()
+    REGISTRY.load()
+    results.append({"name": "registry.load", "users": users, "sec_per_op": time.perf_counter() - t})
+
+    results.append({
+        "name": "db.get_users_by_subgroup",
+        "users": users,
+        "sec_per_op": _best(lambda: db.get_users_by_subgroup("1.1"), 5),
+    })
+    results.append({
+        "name": "registry.chat_ids_by_subgroup",
+        "users": users,
+        "sec_per_op": _best(lambda: REGISTRY.chat_ids_by_subgroup("1.1"), 5),
+    })
+
+    counter = iter(range(10**9))
+    results.append({
+        "name": "db.mark_notified",
+        "users": users,
+        "sec_per_op": _best(lambda: db.mark_notified(f"bench_{next(counter)}"), 500),
+    })
+    results.append({
+        "name": "db.was_notified",
+        "users": users,
+        "sec_per_op": _best(lambda: db.was_notified(f"bench_{random.randrange(1500)}"), 2000),
+    })
+    keys = [f"batch_{i}" for i in range(100)]
+    results.append({
+        "name": "db.mark_notified_many[100]",
+        "users": users,
+        "sec_per_op": _best(lambda: db.mark_notified_many(keys), 50),
+    })
+    results.append({
+        "name": "db.was_notified_many[100]",
+        "users": users,
+        "sec_per_op": _best(lambda: db.was_notified_many(keys), 200),
+    })
+    from database.addresses import normalize_address, street_names
+
+    addresses = [(raw, normalize_address(raw), g, sg) for raw, g, sg in make_addresses(ADDRESSES)]
+    with db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO addr_map(raw_address, norm_address, group_id, subgroup, source_url) VALUES (?, ?, ?, ?, 'bench')",
+            addresses,
+        )
+        db.replace_addr_streets("bench", street_names(norm for _raw, norm, _g, _sg in addresses))
+    for label, query in (("exact", "вул. Перемоги, буд. 12-А"), ("typo", "Перемги 12")):
+        results.append({
+            "name": f"db.search_addr_map.{label}",
+            "users": users,
+            "addresses": ADDRESSES,
+            "sec_per_op": _best(lambda: db.search_addr_map(query), 50),
+        })
+    results.append({
+        "name": "async_db.mark_notified",
+        "users": users,
+        "sec_per_op": await _abest(lambda: async_db.mark_notified(f"abench_{next(counter)}"), 200),
+    })
+
+
+async def bench_notify(results: list, users: int):
+    import bot
+    from database import async_db
+    from database.ledger import LEDGER
+    from notify.broadcast import Broadcaster
+    from notify.scheduler import DeadlineScheduler
+
+    from database.registry import REGISTRY
+
+    bot.BROADCASTER = Broadcaster(rate=1e9, workers=50, per_chat_interval=0)
+
+    async def full_pass(name: str, digest_keys=()):
+        best = float("inf")
+        sent = 0
+        for _ in range(3):
+            # Кожен прохід — «з нуля»: нові таймери і порожній журнал
+            bot.SCHEDULER = DeadlineScheduler()
+            bot._notify_state.update(version=0, snapshot=None)
+            LEDGER._recent.clear()
+            LEDGER.loaded = True
+            await LEDGER.mark(digest_keys)
+            app = FakeApp()
+            t = time.perf_counter()
+            await bot.check_and_notify(app)
+            await bot.SCHEDULER.drain()  # попередження розсилаються окремими задачами
+            best = min(best, time.perf_counter() - t)
+            sent = app.bot.sent
+        results.append({
+            "name": name,
+            "users": users,
+            "messages": sent,
+            "sec_per_op": best,
+            "msg_per_sec": sent / best if best else None,
+        })
+
+    await full_pass("check_and_notify.full_pass")
+
+    # Половина користувачів — лише ранковий дайджест, кожен десятий — дайджест + нагадування:
+    # попереджень (messages) має стати пропорційно менше
+    with db.transaction() as conn:
+        conn.execute(
+            "UPDATE users SET digest = CASE WHEN chat_id % 10 = 0 THEN ? WHEN chat_id % 2 = 1 THEN ? END",
+            (db.DIGEST_PINGS, db.DIGEST_ONLY),
+        )
+    REGISTRY.load()
+    # Дайджест за сьогодні й завтра вже надіслано — _fire_warning ділить одержувачів за режимами
+    now = datetime.now(bot.TZ)
+    digest_keys = [
+        bot._digest_key(day, region, sg)
+        for region, sg in await async_db.get_digest_users()
+        for day in (now, now + timedelta(days=1))
+    ]
+    await full_pass("check_and_notify.full_pass.digest", digest_keys)
+
+
+async def run_for_users(results: list, users: int, tmp: Path):
+    from database import async_db
+
+    path = tmp / f"zap_bot_{users}.db"
+    t = time.perf_counter()
+    make_db(path, users)
+    logging.getLogger("bench").info("БД на %s користувачів: %.1fs", users, time.perf_counter() - t)
+    try:
+        await bench_db(results, users)
+        await bench_next(results, users)
+        await bench_notify(results, users)
+    finally:
+        await asyncio.to_thread(async_db.stop)
+        db.close_conn()
+
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(results: list, baseline_path: str, threshold: float) -> list[str]:
+    """Повертає список регресій (повільніше за baseline більше ніж на threshold)."""
+    base = json.loads(Path(baseline_path).read_text(encoding="utf-8"))["results"]
+
+    def key(r):
+        return r["name"], r.get("users"), r.get("bytes")
+
+    base_by_key = {key(r): r for r in base}
+    regressions = []
+    for r in results:
+        b = base_by_key.get(key(r))
+        if b and b["sec_per_op"] and r["sec_per_op"] > b["sec_per_op"] * (1 + threshold):
+            regressions.append(
+                f"{r['name']} users={r.get('users')} bytes={r.get('bytes')}: "
+                f"{b['sec_per_op'] * 1e3:.3f}ms -> {r['sec_per_op'] * 1e3:.3f}ms"
+            )
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", default="10000,100000", help="розміри синтетичних БД через кому")
+    ap.add_argument("--out", default=None, help="JSON з результатами (за замовчуванням bench/results/<час>.json)")
+    ap.add_argument("--baseline", default=None, help="попередній JSON для порівняння")
+    ap.add_argument("--threshold", type=float, default=0.2, help="допустиме сповільнення (0.2 = 20%%)")
+    ap.add_argument("--skip-parse", action="store_true")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("bench").setLevel(logging.INFO)
+
+    results: list = []
+    if not args.skip_parse:
+        bench_parse(results)
+
+    with tempfile.TemporaryDirectory(prefix="zap_bench_") as tmp:
+        for users in (int(x) for x in args.users.split(",") if x.strip()):
+            asyncio.run(run_for_users(results, users, Path(tmp)))
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "git": _git_rev(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": results,
+    }
+    out = Path(args.out) if args.out else ROOT / "bench" / "results" / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    for r in results:
+        extra = f" users={r['users']}" if "users" in r else f" bytes={r['bytes']}" if "bytes" in r else ""
+        print(f"{r['name']:<34}{extra:<16}{r['sec_per_op'] * 1e3:>12.4f} ms")
+    print(f"\nРезультати: {out}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.threshold)
+        if regressions:
+            print("\nРЕГРЕСІЇ:")
+            for line in regressions:
+                print("  " + line)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
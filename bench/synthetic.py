@@ -0,0 +1,89 @@
+# synthetic.py
+"""Генератор синтетичних сторінок ZOE (схожих на WordPress-розмітку сайту) для бенчмарків."""
+import random
+
+_MENU_ITEMS = [
+    "Головна", "Споживачам", "Відключення", "Графіки", "Новини", "Тарифи",
+    "Контакти", "Про компанію", "Закупівлі", "Вакансії", "Звернення",
+]
+
+
+def _menu(rnd: random.Random, n: int) -> str:
+    items = "".join(
+        f'<li class="menu-item"><a href="/p/{i}">{rnd.choice(_MENU_ITEMS)}</a></li>'
+        for i in range(n)
+    )
+    return f'<nav class="main-menu"><ul>{items}</ul></nav>'
+
+
+def _script(rnd: random.Random, kb: int) -> str:
+    # Мінімізований JS, в якому трапляються й цифри з двокрапками
+    chunk = "var a={x:1.5,t:'12:30'};function f(b){return b*2};" * (kb * 1024 // 50 + 1)
+    return f"<script>{chunk[: kb * 1024]}</script>"
+
+
+def schedule_block(rnd: random.Random, groups: int, subgroups: int, day_label: str) -> str:
+    rows = []
+    for g in range(1, groups + 1):
+        for s in range(1, subgroups + 1):
+            h = rnd.randrange(0, 22)
+            rows.append(
+                f"<p><strong>{g}.{s}</strong>: {h:02d}:00&nbsp;&ndash;&nbsp;{h + 2:02d}:00</p>"
+            )
+    return f"<h3>Графік на {day_label}</h3>" + "".join(rows)
+
+
+def make_page(
+    seed: int = 0,
+    groups: int = 6,
+    subgroups: int = 2,
+    days: int = 2,
+    menu_items: int = 200,
+    script_kb: int = 150,
+    filler_paragraphs: int = 50,
+) -> str:
+    """Повертає HTML: шапка з меню і скриптами, контент з графіком, футер."""
+    rnd = random.Random(seed)
+    labels = ["17 жовтня", "18 жовтня", "19 жовтня", "20 жовтня"]
+    blocks = "".join(
+        schedule_block(rnd, groups, subgroups, labels[d % len(labels)]) for d in range(days)
+    )
+    filler = "".join(
+        f"<p>Новина {i}: роботи на лінії 10 кВ, орієнтовно з 9:00 до 17:00.</p>"
+        for i in range(filler_paragraphs)
+    )
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<style>body{{margin:0}}.a{{color:red}}</style>{_script(rnd, script_kb)}</head><body>"
+        f"<header>{_menu(rnd, menu_items)}</header>"
+        '<main id="main"><article class="post">'
+        '<div class="entry-content">'
+        "<p>ГПВ — графіки погодинних відключень.</p>"
+        f"{blocks}"
+        "</div></article>"
+        f'<aside class="sidebar">{filler}</aside></main>'
+        f"<footer>{_menu(rnd, menu_items // 4)}<!-- 1.1 00:00-01:00 --></footer>"
+        f"{_script(rnd, script_kb // 3)}</body></html>"
+    )
+
+
+
+_STREETS = [
+    "Перемоги", "Соборний", "Металургів", "Шевченка", "Гоголя", "Незалежної України",
+    "Запорізького козацтва", "Нижньодніпровська", "Чарівна", "Космічна", "Лермонтова",
+    "Дніпровські пороги", "Хортицьке", "Сталеварів", "Рекордна", "Бородинська",
+    "Північне", "Туристична", "Українська", "Героїв 93-ї бригади", "Іванова", "Складська",
+]
+_STREET_PREFIXES = ["", "Нова ", "Мала ", "Велика ", "Верхня ", "Нижня ", "Стара ", "Південна "]
+_STREET_KINDS = ["вул.", "просп.", "пров.", "бульв.", "ш."]
+
+
+def make_addresses(n: int, seed: int = 0, groups: int = 6, subgroups: int = 2, per_street: int = 2500):
+    """(raw_address, group_id, subgroup): по per_street записів на вулицю, будинки з літерами."""
+    rnd = random.Random(seed)
+    for i in range(n):
+        j = i // per_street
+        street = _STREET_PREFIXES[j // len(_STREETS) % len(_STREET_PREFIXES)] + _STREETS[j % len(_STREETS)]
+        house = f"{i % per_street // 3 + 1}{('', '-А', 'б')[i % 3]}"
+        g = rnd.randrange(groups) + 1
+        yield f"{_STREET_KINDS[j % len(_STREET_KINDS)]} {street}, буд. {house}", str(g), f"{g}.{rnd.randrange(subgroups) + 1}"
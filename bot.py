@@ -2,9 +2,11 @@
 import os
 import logging
 import asyncio
-from datetime import datetime, timedelta
+from datetime import datetime, time as dtime, timedelta
 import pytz
-import re
+import secrets
+import time
+from functools import wraps
 
 from dotenv import load_dotenv
 
@@ -19,17 +21,36 @@ from telegram.ext import (
 )
 
 # DB
-from database.db import (
-    init_db,
+from database.db import init_db, close_conn, DIGEST_OFF, DIGEST_ONLY, DIGEST_PINGS, MAX_LEAD_MINUTES, MAX_USER_LEADS
+from database import async_db
+from database.ledger import LEDGER
+from database.registry import REGISTRY
+from database.async_db import (
     save_user_hashed,
     get_user_by_chat,
     get_users_by_subgroup,
-    mark_notified,
-    was_notified,
+    get_warning_recipients,
+    get_digest_users,
+    set_user_leads,
+    set_user_region,
+    set_user_digest,
+    search_addr_map,
+    load_addr_map_by_id,
 )
 
-import requests
-from bs4 import BeautifulSoup
+from monitoring import metrics
+from monitoring.endpoint import start_metrics_server
+from monitoring.profiling import Profiler, tracemalloc_loop
+from notify.broadcast import Broadcaster
+from notify.scheduler import DeadlineScheduler
+from notify.shards import ShardedBroadcaster
+from schedule.fetcher import ZOE_FETCHER
+from schedule.poller import PollController
+from schedule.recorder import RecordingFetcher, ReplayFetcher
+from schedule.snapshot import ScheduleSnapshot, diff_snapshots
+from schedule.sources import PROFILES, MultiSourceSchedule, load_sources, parse_page
+from schedule.subgroups import format_subgroup
+from web.webhook import run_webhook
 
 # ------------------------
 # Конфігурація
@@ -44,7 +65,76 @@ ZOE_LIST_URL = os.getenv(
 )
 
 NOTIFY_MINUTES_BEFORE = int(os.getenv("NOTIFY_MINUTES_BEFORE", "30"))
+# Час(и) попередження за замовчуванням, хв; користувач може задати свої через /remind
+DEFAULT_LEADS = tuple(
+    int(x) for x in os.getenv("NOTIFY_LEAD_MINUTES", str(NOTIFY_MINUTES_BEFORE)).split(",") if x.strip()
+)
+# Ранковий дайджест (/digest): о котрій надсилати графік на день, HH:MM за Києвом
+DIGEST_TIME = dtime(*(int(x) for x in os.getenv("DIGEST_TIME", "07:00").split(":", 1)))
+# Пізніше за DIGEST_TIME + стільки годин дайджест за сьогодні вже не надсилаємо (бот запустився ввечері)
+DIGEST_LATE_HOURS = 12
 CHECK_INTERVAL_MINUTES = int(os.getenv("CHECK_INTERVAL_MINUTES", "5"))
+# Межі адаптивного періоду опитування ZOE (CHECK_INTERVAL_MINUTES — базовий період)
+POLL_MIN_SECONDS = int(os.getenv("POLL_MIN_SECONDS", "60"))
+POLL_MAX_SECONDS = int(os.getenv("POLL_MAX_SECONDS", "1800"))
+# Скільки днів зберігати записи «вже сповіщено»
+NOTIFIED_RETENTION_DAYS = float(os.getenv("NOTIFIED_RETENTION_DAYS", "7"))
+# Скільки секунд /next може віддавати закешовану сторінку без звернення до ZOE
+SCHEDULE_CACHE_TTL_SECONDS = int(os.getenv("SCHEDULE_CACHE_TTL_SECONDS", "60"))
+# Зберігати останній графік у БД (таблиця schedule_cache) і стартувати з нього, не чекаючи сайт
+SCHEDULE_PERSIST = os.getenv("SCHEDULE_PERSIST", "1") == "1"
+# Кілька джерел графіка: JSON-список або шлях до JSON-файлу (див. schedule/sources.py).
+# Не задано — одне джерело ZOE_LIST_URL.
+SCHEDULE_SOURCES = os.getenv("SCHEDULE_SOURCES")
+# Назва регіону ZOE_LIST_URL і користувачів, що регіон не обирали
+DEFAULT_REGION = os.getenv("DEFAULT_REGION", "zp").strip().lower()
+
+# Запис / відтворення відповідей ZOE (для навантажувальних тестів, див. loadtest/)
+ZOE_RECORD_DIR = os.getenv("ZOE_RECORD_DIR")
+ZOE_REPLAY_DIR = os.getenv("ZOE_REPLAY_DIR")
+
+# Режим отримання оновлень: "polling" (getUpdates) або "webhook" (вбудований HTTP-сервер)
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+# Скільки оновлень обробляти одночасно (1 — строго по черзі, як раніше)
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "1"))
+# Публічна https-адреса вебхука (на неї Telegram шле POST); локально слухаємо WEBHOOK_LISTEN:WEBHOOK_PORT
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+# Не задано — генеруємо при старті (його все одно передаємо в setWebhook самі)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or secrets.token_urlsafe(32)
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+# Верхня межа воркерів прийому; фактично їх не більше за CONCURRENT_UPDATES (див. web/webhook.py)
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "32"))
+WEBHOOK_DRAIN_SECONDS = float(os.getenv("WEBHOOK_DRAIN_SECONDS", "30"))
+
+# Метрики Prometheus: http://METRICS_HOST:METRICS_PORT/metrics (не задано — вимкнено)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+# Вибіркове профілювання: частка оновлень / циклів check_and_notify під cProfile (0 — вимкнено)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_CYCLE_SAMPLE_RATE = float(os.getenv("PROFILE_CYCLE_SAMPLE_RATE", str(PROFILE_SAMPLE_RATE)))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "15"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+# Профілі швидших викликів не зберігаємо і не логуємо
+PROFILE_MIN_MS = float(os.getenv("PROFILE_MIN_MS", "0"))
+# Знімки tracemalloc раз на N секунд (0 — вимкнено)
+TRACEMALLOC_INTERVAL_SECONDS = float(os.getenv("TRACEMALLOC_INTERVAL_SECONDS", "0"))
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "1"))
+
+# Розсилка: глобальний ліміт Telegram ~30 повідомлень/с і кількість паралельних відправок
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "28"))
+BROADCAST_WORKERS = int(os.getenv("BROADCAST_WORKERS", "20"))
+# >1 — розсилка в кількох процесах (chat_id % N), ліміти вище діляться між ними порівну
+BROADCAST_PROCESSES = int(os.getenv("BROADCAST_PROCESSES", "1"))
+# Скільки при зупинці чекати на попередження, що ще розсилаються (ключі вже в журналі надісланих)
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "60"))
+
+# Скільки знайдених адрес пропонувати кнопками (/address)
+ADDRESS_CANDIDATES = int(os.getenv("ADDRESS_CANDIDATES", "5"))
 
 # Посилання, де користувач може сам знайти свою чергу
 QUEUE_INFO_URL = (
@@ -64,14 +154,63 @@ if "перелік-%D0%B0%D0%B4%D1%80%D0%B5%D1%81" in ZOE_LIST_URL.lower() or "
         "Для коректної роботи бота встановіть ZOE_LIST_URL на сторінку з графіками."
     )
 
-# Regex інтервалів часу на сторінці ZOE: "1.2 07:00–09:00" або "1.2: 07:00 - 09:00"
-_interval_re = re.compile(
-    r"(\d+\.\d+)\s*[:\-–—]?\s*(\d{1,2}:\d{2})\s*[–\-—]\s*(\d{1,2}:\d{2})"
+
+def _parse_schedule(html: str, source=None) -> ScheduleSnapshot:
+    """Будує ScheduleSnapshot з HTML сторінки джерела (один раз на нове тіло сторінки)."""
+    if source is None:
+        snap = parse_page(html, PROFILES["zoe"], datetime.now(TZ))
+    else:
+        snap = parse_page(html, PROFILES[source.profile], datetime.now(TZ), source.region)
+    metrics.SNAPSHOT_INTERVALS.observe(len(snap.intervals))
+    return snap
+
+
+def _region_name(region) -> str:
+    return region or DEFAULT_REGION
+
+
+LEDGER.retention_days = NOTIFIED_RETENTION_DAYS
+if BROADCAST_PROCESSES > 1:
+    BROADCASTER = ShardedBroadcaster(BROADCAST_PROCESSES, rate=BROADCAST_RATE, workers=BROADCAST_WORKERS)
+else:
+    BROADCASTER = Broadcaster(rate=BROADCAST_RATE, workers=BROADCAST_WORKERS)
+SCHEDULER = DeadlineScheduler()
+PROFILER = Profiler(
+    sample_rate=PROFILE_SAMPLE_RATE,
+    directory=PROFILE_DIR,
+    top_n=PROFILE_TOP_N,
+    max_files=PROFILE_MAX_FILES,
+    min_ms=PROFILE_MIN_MS,
+)
+POLLER = PollController(
+    base=max(5, CHECK_INTERVAL_MINUTES * 60),
+    min_period=POLL_MIN_SECONDS,
+    max_period=POLL_MAX_SECONDS,
 )
 
-# Regex перевірки формату підчерги (наприклад "1.1", "  2 . 3 ")
-_subgroup_re = re.compile(r"^\s*(\d+)\s*\.\s*(\d+)\s*$")
+if ZOE_REPLAY_DIR:
+    _zoe_fetcher = ReplayFetcher(ZOE_REPLAY_DIR)
+elif ZOE_RECORD_DIR:
+    _zoe_fetcher = RecordingFetcher(ZOE_FETCHER, ZOE_RECORD_DIR)
+else:
+    _zoe_fetcher = ZOE_FETCHER
+
+# Один набір кешів на процес: і /next, і check_and_notify читають/оновлюють саме їх
+SCHEDULE = MultiSourceSchedule(
+    load_sources(SCHEDULE_SOURCES, ZOE_LIST_URL, DEFAULT_REGION),
+    _parse_schedule,
+    ttl_seconds=SCHEDULE_CACHE_TTL_SECONDS,
+    fetcher=_zoe_fetcher,
+)
+# Кеш основного джерела (перше в конфігурації) — для бенчмарків і навантажувальних тестів
+SCHEDULE_CACHE = next(iter(SCHEDULE.caches.values()), None)
+logger.info(
+    "Джерела графіка: %s",
+    ", ".join(f"{s.name} [{_region_name(s.region)}, {s.profile}]" for s in SCHEDULE.sources) or "немає",
+)
 
+metrics.SCHEDULE_AGE_SECONDS.set_function(SCHEDULE.age)
+metrics.SCHEDULE_VERSION.set_function(lambda: SCHEDULE.version)
 
 # ------------------------
 # Helpers
@@ -79,6 +218,7 @@ _subgroup_re = re.compile(r"^\s*(\d+)\s*\.\s*(\d+)\s*$")
 def main_menu_keyboard():
     kb = [
         [InlineKeyboardButton("🔔 Зареєструватися", callback_data="menu_register")],
+        [InlineKeyboardButton("🏠 За адресою", callback_data="menu_address")],
         [
             InlineKeyboardButton("ℹ️ Моя підчерга", callback_data="menu_getgroup"),
             InlineKeyboardButton("➡️ Наступне", callback_data="menu_next"),
@@ -87,17 +227,12 @@ def main_menu_keyboard():
     return InlineKeyboardMarkup(kb)
 
 
-def format_subgroup(raw: str) -> str | None:
-    """
-    Приводить введёну строку до вигляду 'X.Y', якщо формат валідний.
-    Інакше повертає None.
-    """
-    m = _subgroup_re.match(raw)
-    if not m:
-        return None
-    g = m.group(1)
-    s = m.group(2)
-    return f"{g}.{s}"
+def _fmt_interval(iv, now: datetime) -> str:
+    """'07:00 — 09:00', або з датою, якщо інтервал не сьогодні."""
+    s = iv.start.strftime("%H:%M")
+    if iv.start.date() != now.date():
+        s = iv.start.strftime("%d.%m ") + s
+    return f"{s} — {iv.end.strftime('%H:%M')}"
 
 
 async def _register_or_ask_confirm(
@@ -113,7 +248,7 @@ async def _register_or_ask_confirm(
     - якщо вже був зареєстрований — питаємо підтвердження
       «чи впевнені ви що хочете знову зареєструватися».
     """
-    user = get_user_by_chat(chat_id)
+    user = await get_user_by_chat(chat_id)
     group_id = canonical.split(".")[0]
 
     # Якщо користувач вже має підчергу — питаємо підтвердження
@@ -156,7 +291,7 @@ async def _register_or_ask_confirm(
         return
 
     # Інакше — новий користувач або без підчерги, просто зберігаємо
-    save_user_hashed(
+    await save_user_hashed(
         chat_id,
         username,
         hashed_address=None,
@@ -185,7 +320,8 @@ async def start_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "Привіт! Я надсилатиму повідомлення про заплановані відключення.\n\n"
         "1️⃣ Дізнайтесь свою чергу та підчергу тут:\n"
         f"{QUEUE_INFO_URL}\n\n"
-        "2️⃣ Потім поверніться сюди та введіть свою підчергу у форматі <b>1.1</b>, <b>2.3</b> тощо.",
+        "2️⃣ Потім поверніться сюди та введіть свою підчергу у форматі <b>1.1</b>, <b>2.3</b> тощо.\n\n"
+        "Або натисніть «🏠 За адресою» — і я знайду підчергу за вашою адресою.",
         reply_markup=main_menu_keyboard(),
         parse_mode="HTML",
     )
@@ -216,16 +352,34 @@ async def menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
+    # ---------- реєстрація за адресою ----------
+    if data == "menu_address":
+        context.user_data["awaiting_address"] = True
+        kb = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="menu_back")]])
+        await q.message.reply_text(
+            "Введіть свою адресу, наприклад: <b>вул. Перемоги, 12</b>.\n\n"
+            "Я знайду підчергу за адресою.",
+            reply_markup=kb,
+            parse_mode="HTML",
+        )
+        return
+
+    # ---------- обрано адресу зі знайдених ----------
+    if data.startswith("addr:"):
+        await address_chosen(update, context, data[len("addr:"):])
+        return
+
     # ---------- повернутись у меню ----------
     if data == "menu_back":
         context.user_data["awaiting_subgroup"] = False
+        context.user_data["awaiting_address"] = False
         await q.message.reply_text("Повернулись у головне меню.", reply_markup=main_menu_keyboard())
         return
 
     # ---------- показати свою підчергу ----------
     if data == "menu_getgroup":
         chat_id = q.message.chat.id
-        user = get_user_by_chat(chat_id)
+        user = await get_user_by_chat(chat_id)
         if not user:
             await q.message.reply_text("Ви не зареєстровані. Натисніть '🔔 Зареєструватися'.")
         elif user.get("subgroup"):
@@ -255,7 +409,7 @@ async def menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
 
-        save_user_hashed(
+        await save_user_hashed(
             chat_id,
             username,
             hashed_address=None,
@@ -299,6 +453,12 @@ async def text_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await subgroup_message(update, context)
         return
 
+    # Очікуємо адресу — шукаємо підчергу
+    if context.user_data.get("awaiting_address"):
+        context.user_data["awaiting_address"] = False
+        await address_search(update, context, update.message.text or "")
+        return
+
     # Якщо користувач просто щось пише — показуємо меню
     await update.message.reply_text("Скористайтесь меню нижче:", reply_markup=main_menu_keyboard())
 
@@ -355,12 +515,76 @@ async def register_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await _register_or_ask_confirm(update, context, chat_id, username, canonical)
 
 
+# ------------------------
+# Реєстрація за адресою (/address або кнопка «За адресою»)
+# ------------------------
+async def address_search(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str):
+    """Шукає адресу в addr_map і пропонує кнопки з кандидатами (адреса — підчерга)."""
+    text = text.strip()
+    if not text:
+        await update.message.reply_text(
+            "Введіть адресу, наприклад: <code>/address вул. Перемоги 12</code>",
+            parse_mode="HTML",
+        )
+        return
+
+    found = await search_addr_map(text, ADDRESS_CANDIDATES)
+    if not found:
+        await update.message.reply_text(
+            "Не вдалося знайти цю адресу.\n\n"
+            "Дізнайтесь свою чергу тут:\n"
+            f"➡️ {QUEUE_INFO_URL}\n\n"
+            "і введіть підчергу через /register 1.1",
+            reply_markup=main_menu_keyboard(),
+        )
+        return
+
+    kb = [
+        [
+            InlineKeyboardButton(
+                f"{rec['raw_address'] or rec['norm_address']} — {rec['subgroup']}",
+                callback_data=f"addr:{rec['id']}",
+            )
+        ]
+        for rec in found
+    ]
+    kb.append([InlineKeyboardButton("🔙 Назад", callback_data="menu_back")])
+    await update.message.reply_text("Оберіть свою адресу:", reply_markup=InlineKeyboardMarkup(kb))
+
+
+async def address_chosen(update: Update, context: ContextTypes.DEFAULT_TYPE, rec_id: str):
+    q = update.callback_query
+    rec = await load_addr_map_by_id(int(rec_id)) if rec_id.isdigit() else None
+    canonical = format_subgroup(rec.get("subgroup") or "") if rec else None
+    if not canonical:
+        await q.message.reply_text(
+            "Цієї адреси вже немає в довіднику. Спробуйте пошук ще раз.",
+            reply_markup=main_menu_keyboard(),
+        )
+        return
+
+    chat_id = q.message.chat.id
+    username = q.from_user.username or q.from_user.full_name or str(chat_id)
+    await _register_or_ask_confirm(update, context, chat_id, username, canonical)
+
+
+async def address_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not context.args:
+        context.user_data["awaiting_address"] = True
+        await update.message.reply_text(
+            "Введіть свою адресу, наприклад: <b>вул. Перемоги, 12</b>.",
+            parse_mode="HTML",
+        )
+        return
+    await address_search(update, context, " ".join(context.args))
+
+
 # ------------------------
 # Інформаційні команди
 # ------------------------
 async def getgroup_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
-    user = get_user_by_chat(chat_id)
+    user = await get_user_by_chat(chat_id)
     if not user:
         await update.message.reply_text("Ви не зареєстровані. Використайте /register або кнопку 'Зареєструватися'.")
         return
@@ -380,7 +604,7 @@ async def next_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if chat_id is None:
         return
 
-    user = get_user_by_chat(chat_id)
+    user = await get_user_by_chat(chat_id)
     if not user or not user.get("subgroup"):
         if update.effective_message:
             await update.effective_message.reply_text(
@@ -390,55 +614,47 @@ async def next_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     user_subgroup = (user.get("subgroup") or "").strip()
     user_group_id = (user.get("group_id") or "").strip() or user_subgroup.split(".")[0]
+    region = user.get("region") or ""
 
-    if not ZOE_LIST_URL:
+    if not SCHEDULE.sources:
         if update.effective_message:
-            await update.effective_message.reply_text("Не налаштовано ZOE_LIST_URL.")
+            await update.effective_message.reply_text("Не налаштовано ZOE_LIST_URL / SCHEDULE_SOURCES.")
+        return
+    if region not in SCHEDULE.regions:
+        if update.effective_message:
+            await update.effective_message.reply_text(
+                f"Для вашого регіону ({_region_name(region)}) зараз немає джерел графіка. Оберіть інший: /region"
+            )
         return
 
     try:
-        logger.info("Fetching ZOE_LIST_URL: %s", ZOE_LIST_URL)
-        resp = requests.get(ZOE_LIST_URL, timeout=15, headers={"User-Agent": "zap-bot/1.0"})
-        logger.info("ZOE response: status=%s url=%s", resp.status_code, resp.url)
-        resp.raise_for_status()
-
-        html = resp.text
-        logger.info("ZOE html head: %r", html[:300])
-
-        text = BeautifulSoup(html, "html.parser").get_text("\n")
-
-        intervals = []
-        for m in _interval_re.finditer(text):
-            sg = m.group(1).strip()
-            start_s = m.group(2)
-            end_s = m.group(3)
-            intervals.append((sg, start_s, end_s))
+        now = datetime.now(TZ)
+        view = await SCHEDULE.view(region, now.date())
+        if view is None:
+            raise RuntimeError(f"немає даних для регіону {_region_name(region)}")
+        snap = view.snapshot
 
         # Для отладки: які підчерги є на сторінці
-        subgroups_on_page = sorted(set(sg for (sg, _, _) in intervals))
+        subgroups_on_page = snap.subgroups
         logger.info("ZOE subgroups on page: %s", ", ".join(subgroups_on_page))
 
         # 1) Точне співпадіння по підчерзі, наприклад '1.2'
-        exact = [(s, e) for (sg, s, e) in intervals if sg == user_subgroup]
-
-        # 2) Якщо нічого не знайшли — шукаємо по черзі (всі підчерги, що починаються з '1.')
-        by_group = []
-        if not exact and user_group_id:
-            prefix = user_group_id + "."
-            by_group = [(sg, s, e) for (sg, s, e) in intervals if sg == user_group_id or sg.startswith(prefix)]
-
-        if exact:
-            s, e = exact[0]
-            msg = f"Наступне (приблизно) відключення для підчерги {user_subgroup}: {s} — {e}"
+        if user_subgroup in snap.by_subgroup:
+            iv = snap.next_for_subgroup(user_subgroup, now)
+            if iv:
+                msg = f"Наступне (приблизно) відключення для підчерги {user_subgroup}: {_fmt_interval(iv, now)}"
+            else:
+                msg = f"Для підчерги {user_subgroup} більше немає запланованих відключень у графіку."
             if update.effective_message:
                 await update.effective_message.reply_text(msg)
             return
 
-        if by_group:
-            sg0, s, e = by_group[0]
+        # 2) Якщо підчерги немає — шукаємо по черзі (всі підчерги, що починаються з '1.')
+        iv = snap.next_for_group(user_group_id, now) if user_group_id else None
+        if iv:
             msg = (
                 f"Не знайдено окремого запису саме для підчерги {user_subgroup}, "
-                f"але для черги {user_group_id} є інтервал ({sg0}): {s} — {e}"
+                f"але для черги {user_group_id} є інтервал ({iv.subgroup}): {_fmt_interval(iv, now)}"
             )
             if update.effective_message:
                 await update.effective_message.reply_text(msg)
@@ -457,122 +673,545 @@ async def next_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.effective_message.reply_text("Помилка отримання розкладу. Спробуйте пізніше.")
 
 
+async def remind_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/remind 60 15 — за скільки хвилин до відключення попереджати (кілька значень)."""
+    chat_id = update.effective_chat.id
+    user = await get_user_by_chat(chat_id)
+    if not user or not user.get("subgroup"):
+        await update.message.reply_text("Спершу зареєструйтесь: /register або кнопка 'Зареєструватися'.")
+        return
+
+    default_s = ", ".join(map(str, DEFAULT_LEADS))
+    if not context.args:
+        current = (user.get("lead_minutes") or "").replace(",", ", ") or f"{default_s} (за замовчуванням)"
+        await update.message.reply_text(
+            f"Попередження надходять за: {current} хв до відключення.\n\n"
+            "Щоб змінити, вкажіть до 5 значень у хвилинах, наприклад:\n"
+            "<code>/remind 60 15</code>\n"
+            "Повернути стандартне: <code>/remind default</code>",
+            parse_mode="HTML",
+        )
+        return
+
+    if context.args[0].lower() in ("default", "стандарт"):
+        leads = None
+    else:
+        try:
+            leads = sorted({int(a.strip(",")) for a in context.args}, reverse=True)
+        except ValueError:
+            leads = []
+        if not leads or len(leads) > MAX_USER_LEADS or not all(1 <= x <= MAX_LEAD_MINUTES for x in leads):
+            await update.message.reply_text(
+                f"Вкажіть від 1 до {MAX_USER_LEADS} чисел (хвилин) від 1 до {MAX_LEAD_MINUTES}, "
+                "наприклад: /remind 60 15"
+            )
+            return
+
+    await set_user_leads(chat_id, leads)
+    # Нові lead-часи — нові таймери
+    if _notify_state["snapshot"] is not None:
+        SCHEDULER.rearm(_notify_state["snapshot"], _active_leads())
+
+    shown = ", ".join(map(str, leads)) if leads else default_s
+    await update.message.reply_text(f"Готово. Попереджатиму за {shown} хв до відключення.")
+
+
+_DIGEST_ARGS = {"off": DIGEST_OFF, "on": DIGEST_ONLY, "pings": DIGEST_PINGS}
+_DIGEST_LABELS = {
+    DIGEST_OFF: "окреме попередження перед кожним відключенням",
+    DIGEST_ONLY: "ранковий графік на день",
+    DIGEST_PINGS: "ранковий графік + короткі нагадування перед відключеннями",
+}
+
+
+async def digest_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/digest on|pings|off — один ранковий графік на день замість попередження на кожен інтервал."""
+    chat_id = update.effective_chat.id
+    user = await get_user_by_chat(chat_id)
+    if not user or not user.get("subgroup"):
+        await update.message.reply_text("Спершу зареєструйтесь: /register або кнопка 'Зареєструватися'.")
+        return
+
+    choice = context.args[0].strip().lower() if context.args else None
+    if choice not in _DIGEST_ARGS:
+        current = _DIGEST_LABELS[user.get("digest") or DIGEST_OFF]
+        await update.message.reply_text(
+            f"Зараз: <b>{current}</b>.\n\n"
+            f"<code>/digest on</code> — графік на день о {DIGEST_TIME:%H:%M} "
+            "замість окремих попереджень\n"
+            "<code>/digest pings</code> — графік на день + короткі нагадування перед відключеннями\n"
+            "<code>/digest off</code> — окреме попередження перед кожним відключенням",
+            parse_mode="HTML",
+        )
+        return
+
+    mode = _DIGEST_ARGS[choice]
+    await set_user_digest(chat_id, mode)
+    await update.message.reply_text(f"Готово. Режим: {_DIGEST_LABELS[mode]}.")
+
+
+async def region_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/region zp — з якого регіону (джерел графіка) брати відключення для користувача."""
+    chat_id = update.effective_chat.id
+    user = await get_user_by_chat(chat_id)
+    if not user or not user.get("subgroup"):
+        await update.message.reply_text("Спершу зареєструйтесь: /register або кнопка 'Зареєструватися'.")
+        return
+
+    available = ", ".join(_region_name(r) for r in SCHEDULE.regions) or "немає"
+    if not context.args:
+        await update.message.reply_text(
+            f"Ваш регіон: <b>{_region_name(user.get('region'))}</b>.\n"
+            f"Доступні регіони: {available}\n\n"
+            "Щоб змінити: <code>/region назва</code>",
+            parse_mode="HTML",
+        )
+        return
+
+    choice = context.args[0].strip().lower()
+    region = "" if choice == DEFAULT_REGION else choice
+    if region not in SCHEDULE.regions:
+        await update.message.reply_text(f"Невідомий регіон «{choice}». Доступні: {available}")
+        return
+
+    await set_user_region(chat_id, region or None)
+    await update.message.reply_text(f"Готово. Регіон: {_region_name(region)}.")
+
+
 # ------------------------
 # Перевірка й нотифікація (періодично)
 # ------------------------
-async def check_and_notify(application):
-    """Періодично перевіряє сторінку ZOE і сповіщає за N хвилин до початку."""
-    if not ZOE_LIST_URL:
+# Знімок, з яким нотифікатор порівнював сторінку минулого разу (для diff змін графіка)
+# regions — знімки по регіонах, snapshot — усі регіони разом (для таймерів і PollController)
+_notify_state = {"version": 0, "snapshot": None, "regions": {}}
+
+
+async def _send_many(application, chat_ids, text_msg: str, kind: str):
+    """
+    Паралельна розсилка з лімітами Telegram (див. notify/broadcast.py).
+    kind — тип сповіщення для zap_notify_recipients_total (warning, ping, digest, change).
+    """
+    metrics.NOTIFY_RECIPIENTS.labels(kind).inc(len(chat_ids))
+    return await BROADCASTER.send(application.bot, chat_ids, text_msg, parse_mode="HTML")
+
+
+def _lead_key(iv, lead: int) -> str:
+    """Ключ notified для попередження за lead хвилин (для NOTIFY_MINUTES_BEFORE — старий формат)."""
+    return iv.key if lead == NOTIFY_MINUTES_BEFORE else f"{iv.key}_{lead}m"
+
+
+def _active_leads() -> set[int]:
+    return set(DEFAULT_LEADS) | REGISTRY.lead_set()
+
+
+async def _notify_schedule_changes(application, region: str, old: ScheduleSnapshot, new: ScheduleSnapshot, now):
+    """
+    Графік регіону змінився: одне повідомлення «графік змінено» лише підчергам, де змінились
+    майбутні інтервали. Ключі notified підлаштовуємо під новий графік.
+    """
+    changes = diff_snapshots(old, new, now)
+    if not changes:
         return
+    logger.info("Графік змінено (%s) для підчерг: %s", _region_name(region), ", ".join(sorted(changes)))
+    leads = _active_leads()
+
+    for sg, (removed, added) in changes.items():
+        # Прибрані/перенесені інтервали більше не вважаються «сповіщеними»
+        await LEDGER.unmark(_lead_key(iv, lead) for iv in removed for lead in leads)
+
+        users_chat_ids = await get_users_by_subgroup(sg, region or None)
+        if not users_chat_ids:
+            continue
+
+        upcoming = [iv for iv in new.by_subgroup.get(sg, ()) if iv.end > now]
+        lines = [f"• {_fmt_interval(iv, now)}" for iv in upcoming]
+        text_msg = (
+            f"🔄 <b>Графік змінено</b>\n"
+            f"Підчерга <b>{sg}</b>, актуальні відключення:\n"
+            + ("\n".join(lines) if lines else "більше не заплановано")
+            + f"\n\nДжерело: {SCHEDULE.url(region)}"
+        )
+        await _send_many(application, users_chat_ids, text_msg, "change")
+
+        # Нові інтервали, для яких час попередження вже настав, щойно були в цьому повідомленні
+        await LEDGER.mark(
+            _lead_key(iv, lead)
+            for iv in added
+            for lead in leads
+            if now <= iv.start <= now + timedelta(minutes=lead)
+        )
+
+
+def _digest_key(day: datetime, region, subgroup: str) -> str:
+    """Ключ журналу надісланих: дайджест дня day для підчерги subgroup регіону region."""
+    return f"digest_{day:%Y-%m-%d}_{region or ''}_{subgroup}"
+
+
+def _digest_due(dt: datetime) -> datetime:
+    """Момент ранкового дайджесту в день dt (localize, а не replace: у день переходу на літній час зсув інший)."""
+    return TZ.localize(datetime.combine(dt.date(), DIGEST_TIME))
+
+
+async def _fire_warning(application, iv, lead: int):
+    """
+    Спрацював таймер планувальника: попередження за lead хвилин до початку iv.
+    Користувачі в режимі дайджесту вже отримали графік дня зранку: повного попередження
+    їм не надсилаємо, а тим, хто просив нагадування (DIGEST_PINGS), — один короткий рядок.
+    Якщо ж дайджест цього дня для підчерги не надсилався (ще не час, бот запустився надто
+    пізно, помилка розсилки) — попереджаємо всіх.
+    """
+    key = _lead_key(iv, lead)
+    if not await LEDGER.filter_new([key]):
+        return
+    full, pings, digest_only = await get_warning_recipients(iv.subgroup, lead, DEFAULT_LEADS, iv.region or None)
+    if digest_only or pings:
+        if await LEDGER.filter_new([_digest_key(iv.start, iv.region, iv.subgroup)]):
+            full, pings, digest_only = full + pings + digest_only, [], []
+    if not (full or pings or digest_only):
+        return
+    # Позначаємо до розсилки: паралельне спрацювання не продублює повідомлення
+    await LEDGER.mark([key])
+    metrics.NOTIFY_DIGEST_SKIPPED.inc(len(digest_only))
+    logger.info(
+        "Попередження %s за %s хв: %s повних, %s коротких, %s лише в дайджесті",
+        iv.key, lead, len(full), len(pings), len(digest_only),
+    )
+    if full:
+        text_msg = (
+            f"⚡️ <b>Увага!</b>\n"
+            f"Наближається відключення для підчерги <b>{iv.subgroup}</b>\n"
+            f"Дата: {iv.start.strftime('%d.%m.%Y')}\n"
+            f"Час: {iv.start.strftime('%H:%M')} — {iv.end.strftime('%H:%M')}\n\n"
+            f"Джерело: {SCHEDULE.url(iv.region)}"
+        )
+        await _send_many(application, full, text_msg, "warning")
+    if pings:
+        text_msg = f"⚡️ {iv.subgroup}: відключення о {iv.start.strftime('%H:%M')} — {iv.end.strftime('%H:%M')}"
+        await _send_many(application, pings, text_msg, "ping")
+
+
+async def _send_digests(application, state, now: datetime) -> int:
+    """
+    Ранковий дайджест: одне повідомлення на підчергу з усіма інтервалами дня замість
+    окремого попередження на кожен. Повертає кількість отримувачів.
+    """
+    day_start = TZ.localize(datetime.combine(now.date(), dtime.min))
+    day_end = day_start + timedelta(days=1)
+    groups = await get_digest_users()
+    keys = {(region, sg): _digest_key(day_start, region, sg) for region, sg in groups}
+    new = set(await LEDGER.filter_new(keys.values()))
+    total = 0
+    for (region, sg), chat_ids in groups.items():
+        key = keys[(region, sg)]
+        view = state.views.get(region or "")
+        if key not in new or view is None or view.snapshot is None:
+            continue
+        intervals = [iv for iv in view.snapshot.by_subgroup.get(sg, ()) if iv.start < day_end and iv.end > day_start]
+        lines = [f"• {_fmt_interval(iv, now)}" for iv in intervals]
+        text_msg = (
+            f"🗓 <b>Графік на {day_start.strftime('%d.%m.%Y')}</b>\n"
+            f"Підчерга <b>{sg}</b>:\n"
+            + ("\n".join(lines) if lines else "відключень не заплановано")
+            + f"\n\nДжерело: {SCHEDULE.url(region or '')}"
+        )
+        await LEDGER.mark([key])
+        await _send_many(application, chat_ids, text_msg, "digest")
+        total += len(chat_ids)
+    return total
+
+
+async def _persist_schedule():
+    """Записує в schedule_cache джерела, що змінились (вміст або валідатори) з минулого збереження."""
+    if not SCHEDULE_PERSIST:
+        return
+    rows = SCHEDULE.dump()
+    if rows:
+        await async_db.save_schedule_cache(rows)
+
+
+async def _warm_start() -> bool:
+    """
+    Останній відомий графік з БД: /next і таймери працюють одразу після старту, а перший
+    check_and_notify ревалідує сторінки (умовний GET) і повідомить про зміни, що сталися,
+    поки бот не працював. True, якщо графік відновлено.
+    """
+    if not SCHEDULE_PERSIST or not SCHEDULE.sources:
+        return False
     try:
-        resp = requests.get(ZOE_LIST_URL, timeout=15, headers={"User-Agent": "zap-bot/1.0"})
-        resp.raise_for_status()
-        text = BeautifulSoup(resp.text, "html.parser").get_text("\n")
+        restored = SCHEDULE.restore(await async_db.load_schedule_cache(), TZ)
+        if not restored:
+            return False
+        state = SCHEDULE.state(datetime.now(TZ).date())
+        if state.snapshot is None:
+            return False
+        _notify_state.update(
+            version=state.version,
+            snapshot=state.snapshot,
+            regions={region: view.snapshot for region, view in state.views.items()},
+        )
+        SCHEDULER.rearm(state.snapshot, _active_leads())
+    except Exception as e:
+        logger.exception("Не вдалося відновити збережений графік: %s", e)
+        return False
+    logger.info("Теплий старт: графік із БД (%s), ревалідація у фоні", ", ".join(restored))
+    return True
 
-        now = datetime.now(TZ)
-        threshold = now + timedelta(minutes=NOTIFY_MINUTES_BEFORE)
 
-        intervals = []
-        for m in _interval_re.finditer(text):
-            sg = m.group(1).strip()
-            start_s = m.group(2)
-            end_s = m.group(3)
-            try:
-                start_dt = TZ.localize(
-                    datetime.combine(now.date(), datetime.strptime(start_s, "%H:%M").time())
-                )
-            except Exception:
-                continue
-            try:
-                end_dt = TZ.localize(
-                    datetime.combine(now.date(), datetime.strptime(end_s, "%H:%M").time())
-                )
-            except Exception:
-                end_dt = start_dt + timedelta(hours=2)
-            intervals.append((sg, start_dt, end_dt))
-
-        subgroups = set([i[0] for i in intervals])
-        for sg in subgroups:
-            users_chat_ids = get_users_by_subgroup(sg)
-            if not users_chat_ids:
-                continue
+async def check_and_notify(application):
+    """
+    Оновлює всі джерела графіка, повідомляє про зміни графіка по регіонах і переозброює
+    таймери планувальника. Самі попередження надсилає SCHEDULER точно у start - lead.
+    Повертає ScheduleState (або None, якщо даних немає).
+    """
+    if not SCHEDULE.sources:
+        return None
+    try:
+        # Примусова ревалідація всіх джерел паралельно: заодно освіжає кеш для /next
+        state = await SCHEDULE.refresh(datetime.now(TZ).date())
+        await _persist_schedule()
+        if state.snapshot is None:
+            return None
+        now = datetime.now(TZ)
 
-            for (_sg, start_dt, end_dt) in [it for it in intervals if it[0] == sg]:
-                key = f"{start_dt.date()}_{sg}_{start_dt.strftime('%H%M')}"
-                if start_dt <= threshold and start_dt >= now and not was_notified(key):
-                    text_msg = (
-                        f"⚡️ <b>Увага!</b>\n"
-                        f"Наближається відключення для підчерги <b>{sg}</b>\n"
-                        f"Дата: {start_dt.strftime('%d.%m.%Y')}\n"
-                        f"Час: {start_dt.strftime('%H:%M')} — {end_dt.strftime('%H:%M')}\n\n"
-                        f"Джерело: {ZOE_LIST_URL}"
-                    )
-                    for cid in users_chat_ids:
-                        try:
-                            await application.bot.send_message(
-                                chat_id=cid,
-                                text=text_msg,
-                                parse_mode="HTML",
-                            )
-                        except Exception as e:
-                            logger.warning("Не вдалося відправити повідомлення %s: %s", cid, e)
-                    mark_notified(key, datetime.now().timestamp())
+        # Вміст хоч одного джерела змінився — порівнюємо регіони з попередніми знімками.
+        # version=0 — перше завантаження (або скидання стану), порівнювати нема з чим.
+        previous = _notify_state["regions"] if _notify_state["version"] else {}
+        changed = state.version != _notify_state["version"]
+        _notify_state.update(
+            version=state.version,
+            snapshot=state.snapshot,
+            regions={region: view.snapshot for region, view in state.views.items()},
+        )
+        if changed:
+            for region, view in state.views.items():
+                old = previous.get(region)
+                if old is not None and old is not view.snapshot:
+                    await _notify_schedule_changes(application, region, old.rebase(now.date()), view.snapshot, now)
+
+        SCHEDULER.rearm(state.snapshot, _active_leads())
+        # Таймери, що вже настали (наприклад, одразу після старту), — не чекаючи циклу планувальника;
+        # розсилки йдуть окремими задачами, цикл опитування на них не чекає
+        await SCHEDULER.fire_due(fire=lambda iv, lead: _fire_warning(application, iv, lead))
+        return state
     except Exception as e:
         logger.exception("Помилка в check_and_notify: %s", e)
+        return None
 
 
 # ------------------------
 # Наш фоновий цикл (без JobQueue/APS)
 # ------------------------
 async def notifier_loop(application):
-    """Періодично запускає check_and_notify()."""
-    await asyncio.sleep(5)  # невелика затримка перед першим запуском
+    """
+    Запускає check_and_notify() з адаптивним періодом (див. schedule/poller.py).
+    Перший запуск — одразу: після теплого старту це ревалідація збереженого графіка.
+    """
     while True:
+        version = _notify_state["version"]
+        entry = None
         try:
-            await check_and_notify(application)
+            entry = await PROFILER.call(
+                "check_and_notify", check_and_notify, application, sample_rate=PROFILE_CYCLE_SAMPLE_RATE
+            )
         except Exception as e:
             logger.exception("notifier_loop error: %s", e)
-        await asyncio.sleep(max(5, CHECK_INTERVAL_MINUTES * 60))
+        ok = entry is not None and not entry.stale
+        # Перше завантаження після старту — не «зміна» сторінки
+        POLLER.record(ok, changed=ok and version != 0 and entry.version != version)
+        await asyncio.sleep(POLLER.next_delay(_notify_state["snapshot"], datetime.now(TZ)))
+
+
+async def digest_loop(application):
+    """Щодня о DIGEST_TIME — ранковий дайджест (див. _send_digests)."""
+    done_day = None
+    while True:
+        now = datetime.now(TZ)
+        due = _digest_due(now)
+        if done_day != now.date() and due <= now < due + timedelta(hours=DIGEST_LATE_HOURS):
+            try:
+                # Свіжий графік перед розсилкою; про зміни check_and_notify повідомить, як у звичайному циклі
+                state = await check_and_notify(application)
+                if state is not None:
+                    sent = await _send_digests(application, state, now)
+                    done_day = now.date()
+                    logger.info("Ранковий дайджест: %s отримувачів", sent)
+            except Exception as e:
+                logger.exception("digest_loop error: %s", e)
+            if done_day != now.date():
+                await asyncio.sleep(60)  # графіка ще немає — пробуємо за хвилину
+                continue
+        if due <= now:
+            due += timedelta(days=1)
+        # Не довше години: захист від стрибків системного годинника і переходу на літній час
+        await asyncio.sleep(min(3600.0, max(1.0, (due - datetime.now(TZ)).total_seconds())))
+
+
+async def retention_loop():
+    """Раз на годину чистить старі записи notified (старші за NOTIFIED_RETENTION_DAYS)."""
+    while True:
+        try:
+            await LEDGER.prune()
+        except Exception as e:
+            logger.exception("retention_loop error: %s", e)
+        await asyncio.sleep(3600)
 
 
 # ------------------------
 # post_init — старт фонового циклу в уже запущеному loop
 # ------------------------
+_services = {"metrics": None}
+
+
 async def _post_init(app):
+    await _warm_start()
     app.create_task(notifier_loop(app))
+    app.create_task(SCHEDULER.run(lambda iv, lead: _fire_warning(app, iv, lead)))
+    app.create_task(digest_loop(app))
+    app.create_task(retention_loop())
+    if METRICS_PORT:
+        _services["metrics"] = await start_metrics_server(METRICS_HOST, METRICS_PORT)
+    if TRACEMALLOC_INTERVAL_SECONDS > 0:
+        app.create_task(tracemalloc_loop(
+            TRACEMALLOC_INTERVAL_SECONDS, PROFILE_DIR, top_n=PROFILE_TOP_N, frames=TRACEMALLOC_FRAMES,
+        ))
+
+
+async def _post_stop(app):
+    # Бот ще може надсилати (app.shutdown() закриє його з'єднання) — дописуємо початі попередження:
+    # їхні ключі вже позначені в журналі, тож після перезапуску вони не повторяться
+    if SCHEDULER.in_flight():
+        logger.info("Зупинка: дописуємо %s попереджень (до %.0fs)", SCHEDULER.in_flight(), SHUTDOWN_DRAIN_SECONDS)
+        try:
+            await asyncio.wait_for(SCHEDULER.drain(), SHUTDOWN_DRAIN_SECONDS)
+        except asyncio.TimeoutError:
+            # wait_for скасовує drain(), а з ним і незавершені розсилки
+            logger.warning("Зупинка: за %.0fs попередження не дописано, розсилку перервано", SHUTDOWN_DRAIN_SECONDS)
+
+
+async def _post_shutdown(app):
+    if _services["metrics"] is not None:
+        await _services["metrics"].stop()
+    # Процеси розсилки дописують поточні завдання і завершуються
+    if isinstance(BROADCASTER, ShardedBroadcaster):
+        await asyncio.to_thread(BROADCASTER.close)
+    # Закриваємо пул з'єднань до джерел графіка (fetcher спільний для всіх)
+    if SCHEDULE_CACHE is not None:
+        await SCHEDULE_CACHE.fetcher.close()
+    # Дописуємо чергу записів і закриваємо з'єднання потоків БД
+    await asyncio.to_thread(async_db.stop)
+    close_conn()
 
 
 # ------------------------
 # Запуск бота
 # ------------------------
-def main():
-    if not BOT_TOKEN:
-        print("Помилка: вкажіть BOT_TOKEN у .env або в перемінних оточення.")
-        return
+# Відомі callback_data — інші значення йдуть у мітку "callback:other" (обмежена кардинальність)
+_CALLBACK_LABELS = frozenset({
+    "menu_register", "menu_address", "menu_getgroup", "menu_next", "menu_back",
+    "confirm_rereg_yes", "confirm_rereg_no", "addr",
+})
 
-    # Ініціалізація БД
-    init_db()
 
-    # Створюємо додаток (прикріпляємо post_init для фонового цикла)
-    app = ApplicationBuilder().token(BOT_TOKEN).post_init(_post_init).build()
+def _instrumented(name: str, callback):
+    """
+    Обгортка обробника: час у zap_handler_seconds, винятки в zap_handler_errors_total,
+    частка викликів — під cProfile (PROFILE_SAMPLE_RATE).
+    """
+
+    @wraps(callback)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        label = name
+        if name == "callback":
+            data = update.callback_query.data if update.callback_query else None
+            # "addr:<id>" -> "addr": id у мітці не потрібен
+            data = data.split(":", 1)[0] if data else data
+            label = f"callback:{data if data in _CALLBACK_LABELS else 'other'}"
+        t = time.perf_counter()
+        try:
+            return await PROFILER.call(label, callback, update, context)
+        except Exception:
+            metrics.HANDLER_ERRORS.labels(label).inc()
+            raise
+        finally:
+            metrics.HANDLER_SECONDS.labels(label).observe(time.perf_counter() - t)
+
+    return wrapper
+
+
+def build_application(
+    token: str,
+    base_url: str | None = None,
+    connection_pool_size: int | None = None,
+    concurrent_updates: int = CONCURRENT_UPDATES,
+):
+    """
+    Application з усіма обробниками. base_url — інший Bot API сервер
+    (наприклад, фейковий з loadtest/fake_api.py), у форматі "http://host:port/bot".
+    """
+    builder = (
+        ApplicationBuilder().token(token).post_init(_post_init).post_stop(_post_stop).post_shutdown(_post_shutdown)
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    if connection_pool_size:
+        builder = builder.connection_pool_size(connection_pool_size)
+    if concurrent_updates > 1:
+        builder = builder.concurrent_updates(concurrent_updates)
+    app = builder.build()
 
     # Команди
-    app.add_handler(CommandHandler("start", start_cmd))
-    app.add_handler(CommandHandler("menu", menu_cmd))
-    app.add_handler(CommandHandler("register", register_cmd))
-    app.add_handler(CommandHandler("getgroup", getgroup_cmd))
-    app.add_handler(CommandHandler("next", next_cmd))
+    app.add_handler(CommandHandler("start", _instrumented("start", start_cmd)))
+    app.add_handler(CommandHandler("menu", _instrumented("menu", menu_cmd)))
+    app.add_handler(CommandHandler("register", _instrumented("register", register_cmd)))
+    app.add_handler(CommandHandler("getgroup", _instrumented("getgroup", getgroup_cmd)))
+    app.add_handler(CommandHandler("next", _instrumented("next", next_cmd)))
+    app.add_handler(CommandHandler("remind", _instrumented("remind", remind_cmd)))
+    app.add_handler(CommandHandler("region", _instrumented("region", region_cmd)))
+    app.add_handler(CommandHandler("digest", _instrumented("digest", digest_cmd)))
+    app.add_handler(CommandHandler("address", _instrumented("address", address_cmd)))
     # /cancel просто вертає меню
-    app.add_handler(CommandHandler("cancel", menu_cmd))
+    app.add_handler(CommandHandler("cancel", _instrumented("cancel", menu_cmd)))
 
-    # Callback меню (реєстрація / отримати підчергу / next / back / підтвердження)
-    app.add_handler(CallbackQueryHandler(menu_callback, pattern=r"^(menu_|confirm_rereg_)"))
+    # Callback меню (реєстрація / адреса / отримати підчергу / next / back / підтвердження)
+    app.add_handler(CallbackQueryHandler(_instrumented("callback", menu_callback), pattern=r"^(menu_|confirm_rereg_|addr:)"))
 
     # Один універсальний обробник тексту
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, text_router))
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, _instrumented("text", text_router)))
+    return app
+
+
+def main():
+    if not BOT_TOKEN:
+        print("Помилка: вкажіть BOT_TOKEN у .env або в перемінних оточення.")
+        return
+    if BOT_MODE == "webhook" and not WEBHOOK_URL:
+        print("Помилка: для BOT_MODE=webhook вкажіть WEBHOOK_URL (публічна https-адреса).")
+        return
+
+    # Міграції схеми — один раз на старті (database/migrations.py)
+    init_db()
+    # Користувачі в пам'яті: кнопки й розсилки не ходять у БД за читанням
+    REGISTRY.load()
+    LEDGER.load()
+
+    # Створюємо додаток (post_init запускає фонові цикли)
+    app = build_application(BOT_TOKEN)
 
     print("Бот запущено. Натисни Ctrl+C для зупинки.")
-    app.run_polling()
+    if BOT_MODE == "webhook":
+        asyncio.run(run_webhook(
+            app,
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            path=WEBHOOK_PATH,
+            public_url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET,
+            queue_size=WEBHOOK_QUEUE_SIZE,
+            workers=WEBHOOK_WORKERS,
+            drain_timeout=WEBHOOK_DRAIN_SECONDS,
+        ))
+    else:
+        app.run_polling()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,422 @@
+# addr_ingest.py
+"""
+Потокове завантаження переліків адрес (HTML-таблиці або CSV) в addr_map.
+
+Пам'ять не залежить від розміру переліку, а бот весь час бачить цілий довідник:
+1) джерело (файл або URL) читається порціями: HTML — регулярними виразами без DOM
+   (рядок таблиці віддається, щойно почався наступний), CSV — рядок за рядком;
+2) кожен запис нормалізується (database/addresses.py) і пишеться пачками
+   executemany у тимчасову таблицю addr_stage — основну базу ця фаза не блокує;
+3) заміна — одна транзакція: з addr_map цього джерела видаляються адреси, яких
+   немає в новому переліку, і додаються нові. Незмінені рядки не чіпаються
+   (їхні id і записи в addr_fts лишаються), тож коміт коштує пропорційно змінам,
+   а не розміру переліку. Читачі (WAL) до коміту бачать старий довідник. У тій самій
+   транзакції оновлюється addr_streets — різні вулиці переліку, зібрані під час п.2
+   (словник для виправлення опечаток у пошуку).
+
+Джерело в addr_map ідентифікує source_url (за замовчуванням — сам шлях / URL).
+Колонки визначаються за заголовком (адреса / черга / підчерга), без заголовка —
+за вмістом: підчерга — клітинка формату X.Y, адреса — найдовша з решти.
+
+Запуск з кореня репозиторію:
+    python -m database.addr_ingest https://example.com/addresses.html
+    python -m database.addr_ingest addresses.csv --source-url https://example.com/addresses.csv
+    python -m database.addr_ingest addresses.csv --dry-run
+"""
+import argparse
+import csv
+import html
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+
+from database import db
+from database.addresses import normalize_address, street_names
+from schedule.extract import _skip_re, _tag_re
+from schedule.subgroups import format_subgroup
+
+# Розмір порції читання джерела
+_READ_CHUNK = 64 * 1024
+
+# Скільки помилок розбору показувати поіменно
+_MAX_ERRORS_SHOWN = 20
+
+# Ключові слова заголовків (нижній регістр, підрядок). Підчерга перевіряється раніше за чергу:
+# "підчерга" містить "черга"
+_ADDRESS_HEADERS = ("адрес", "address", "вулиц")
+_SUBGROUP_HEADERS = ("підчерг", "подочеред", "subgroup")
+_GROUP_HEADERS = ("черг", "очеред", "group")
+
+_number_re = re.compile(r"^\s*(\d+)\s*$")
+_tr_start_re = re.compile(r"<tr\b[^>]*>", re.I)
+_row_end_re = re.compile(r"</tr\s*>|</t(?:able|body|head|foot)\b", re.I)
+_cell_re = re.compile(r"<t([dh])\b[^>]*>(.*?)(?=<t[dh]\b|</t[dh]\s*>|$)", re.I | re.S)
+# script/style/коментар, відкритий і не закритий до кінця буфера
+_open_skip_re = re.compile(r"<(script|style|noscript|template)\b(?![\s\S]*?</\1\s*>)|<!--(?![\s\S]*?-->)", re.I)
+
+
+class IngestError(ValueError):
+    """Перелік не можна застосувати (невідомий формат, замало адрес) — addr_map не змінено."""
+
+
+def _progress(msg: str):
+    print(msg, file=sys.stderr, flush=True)
+
+
+def _detect_format(path: str, fmt: str | None) -> str:
+    if fmt:
+        return fmt
+    suffix = Path(path.split("?", 1)[0]).suffix.lower()
+    if suffix in (".csv", ".tsv"):
+        return "csv"
+    if suffix in (".html", ".htm", "") or path.startswith(("http://", "https://")):
+        return "html"
+    raise IngestError(f"Не вдалося визначити формат з '{path}', вкажіть --format html|csv")
+
+
+# ------------------------
+# Читання джерела
+# ------------------------
+def _read_chunks(path: str):
+    """Текст джерела порціями: файл, '-' (stdin) або http(s) URL."""
+    if path.startswith(("http://", "https://")):
+        import httpx
+
+        with httpx.stream("GET", path, timeout=60, follow_redirects=True) as resp:
+            resp.raise_for_status()
+            yield from resp.iter_text(_READ_CHUNK)
+        return
+    src = sys.stdin if path == "-" else open(path, encoding="utf-8-sig", newline="")
+    try:
+        while chunk := src.read(_READ_CHUNK):
+            yield chunk
+    finally:
+        if src is not sys.stdin:
+            src.close()
+
+
+def _lines(chunks):
+    """Порції тексту -> рядки (з '\\n' на кінці, як у файлі)."""
+    tail = ""
+    for chunk in chunks:
+        lines = (tail + chunk).splitlines(keepends=True)
+        tail = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        yield from lines
+    if tail:
+        yield tail
+
+
+def _cell_text(fragment: str) -> str:
+    return " ".join(html.unescape(_tag_re.sub(" ", fragment)).split())
+
+
+def _table_rows(fragment: str):
+    """
+    (заголовок?, клітинки) для кожного <tr> фрагмента (script/style/коментарі вже вирізані).
+    Рядок закінчується на </tr>, </table> або на наступному <tr> (</tr> в HTML необов'язковий).
+    """
+    for body in _tr_start_re.split(fragment)[1:]:
+        end = _row_end_re.search(body)
+        cells = _cell_re.findall(body[:end.start()] if end else body)
+        texts = [_cell_text(text) for _tag, text in cells]
+        if any(texts):
+            yield any(tag.lower() == "h" for tag, _text in cells), texts
+
+
+def _last_row_start(buf: str) -> int:
+    """Позиція останнього '<tr' у буфері (0, якщо немає): усе до неї — завершені рядки."""
+    low = buf.lower()
+    i = low.rfind("<tr")
+    while i > 0 and low[i + 3:i + 4].isalnum():  # <track>
+        i = low.rfind("<tr", 0, i)
+    return max(i, 0)
+
+
+def html_rows(chunks):
+    """
+    (заголовок?, клітинки) для кожного рядка кожної таблиці сторінки — без DOM, як
+    schedule/extract.py: буфер розбирається до початку останнього <tr>, решта чекає
+    наступної порції (script чи коментар, не закритий до цього місця, — теж).
+    """
+    buf = ""
+    for chunk in chunks:
+        buf += chunk
+        end = _last_row_start(buf)
+        opened = _open_skip_re.search(buf, 0, end)
+        if opened is not None:
+            end = opened.start()
+        if end:
+            yield from _table_rows(_skip_re.sub(" ", buf[:end]))
+            buf = buf[end:]
+    yield from _table_rows(_skip_re.sub(" ", buf))
+
+
+def csv_rows(chunks):
+    """(заголовок?, клітинки) для рядків CSV; роздільник — ',' ';' або TAB за першим рядком."""
+    lines = _lines(chunks)
+    first = next(lines, None)
+    if first is None:
+        return
+    delimiter = max(",;\t", key=first.count)
+    reader = csv.reader(_prepend(first, lines), delimiter=delimiter)
+    for cells in reader:
+        if any(c.strip() for c in cells):
+            yield False, [c.strip() for c in cells]
+
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
+
+
+# ------------------------
+# Рядки таблиці -> записи addr_map
+# ------------------------
+@dataclass
+class _Columns:
+    address: int
+    subgroup: int
+    group: int | None = None
+
+
+def _header_columns(cells: list[str]) -> _Columns | None:
+    if any(format_subgroup(cell) for cell in cells):
+        return None  # рядок даних (адреса може містити слово «вулиця»)
+    address = subgroup = group = None
+    for i, cell in enumerate(cells):
+        low = cell.lower()
+        if address is None and any(k in low for k in _ADDRESS_HEADERS):
+            address = i
+        elif subgroup is None and any(k in low for k in _SUBGROUP_HEADERS):
+            subgroup = i
+        elif group is None and any(k in low for k in _GROUP_HEADERS):
+            group = i
+    if address is None or (subgroup is None and group is None):
+        return None
+    if subgroup is None:
+        # Одна колонка «Черга» зі значеннями X.Y
+        subgroup, group = group, None
+    return _Columns(address, subgroup, group)
+
+
+def _by_content(cells: list[str]) -> tuple[str, str]:
+    """Рядок без відомого заголовка: підчерга — клітинка X.Y, адреса — найдовша з решти."""
+    for i, cell in enumerate(cells):
+        canonical = format_subgroup(cell)
+        if canonical:
+            rest = cells[:i] + cells[i + 1:]
+            address = max(rest, key=len, default="")
+            if address:
+                return address, canonical
+            break
+    raise ValueError("немає адреси або підчерги формату X.Y")
+
+
+def _from_columns(cells: list[str], cols: _Columns) -> tuple[str, str]:
+    if max(cols.address, cols.subgroup, cols.group or 0) >= len(cells):
+        raise ValueError(f"замало клітинок ({len(cells)})")
+    address, sub = cells[cols.address], cells[cols.subgroup]
+    canonical = format_subgroup(sub)
+    if canonical is None and cols.group is not None:
+        # Черга й підчерга в окремих колонках: "3" і "2" -> "3.2"
+        g, s = _number_re.match(cells[cols.group]), _number_re.match(sub)
+        if g and s:
+            canonical = f"{g.group(1)}.{s.group(1)}"
+    if canonical is None:
+        raise ValueError(f"підчерга: очікується формат X.Y, отримано {sub!r}")
+    if not address:
+        raise ValueError("порожня адреса")
+    return address, canonical
+
+
+def parse_records(rows, stats: "IngestStats"):
+    """
+    (raw_address, norm_address, group_id, subgroup) для кожного коректного рядка.
+    Заголовок може трапитись будь-де (кілька таблиць на сторінці) — колонки перевизначаються.
+    """
+    cols = None
+    for line_no, (is_header, cells) in enumerate(rows, 1):
+        header = _header_columns(cells)
+        if header is not None:
+            cols = header
+            continue
+        if is_header:
+            continue
+        stats.read += 1
+        try:
+            address, canonical = _from_columns(cells, cols) if cols else _by_content(cells)
+            norm = normalize_address(address)
+            if not norm:
+                raise ValueError(f"адреса без назви: {address!r}")
+        except ValueError as e:
+            stats.rejected += 1
+            if stats.rejected <= _MAX_ERRORS_SHOWN:
+                _progress(f"рядок {line_no}: {e}")
+            elif stats.rejected == _MAX_ERRORS_SHOWN + 1:
+                _progress("... далі помилки не показуються, лише рахуються")
+            continue
+        yield address, norm, canonical.split(".")[0], canonical
+
+
+# ------------------------
+# Завантаження
+# ------------------------
+@dataclass
+class IngestStats:
+    read: int = 0
+    staged: int = 0
+    rejected: int = 0
+    inserted: int = 0
+    deleted: int = 0
+    swap_seconds: float = 0.0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def rate(self) -> float:
+        return self.staged / max(1e-9, time.perf_counter() - self.started_at)
+
+
+# Порівняння рядка addr_map з addr_stage. Пошук — за norm_address (в addr_stage він не NULL);
+# "+" прибирає решту колонок з вибору індексу: інакше планувальник бере idx_addr_subgroup
+# (десяток значень на весь довідник) і заміна стає квадратичною
+_SAME_ROW = (
+    "{a}.norm_address = s.norm_address AND +{a}.raw_address IS s.raw_address "
+    "AND +{a}.subgroup IS s.subgroup AND +{a}.group_id IS s.group_id"
+)
+
+_DELETE_GONE_SQL = f"""
+    DELETE FROM addr_map
+    WHERE source_url = ?
+      AND NOT EXISTS (SELECT 1 FROM temp.addr_stage s WHERE {_SAME_ROW.format(a="addr_map")})
+"""
+
+_INSERT_NEW_SQL = f"""
+    INSERT INTO addr_map(raw_address, norm_address, group_id, subgroup, source_url)
+    SELECT DISTINCT s.raw_address, s.norm_address, s.group_id, s.subgroup, ?
+    FROM temp.addr_stage s
+    WHERE NOT EXISTS (SELECT 1 FROM addr_map a WHERE a.source_url = ? AND {_SAME_ROW.format(a="a")})
+"""
+
+
+def _chunks(rows, size: int):
+    it = iter(rows)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def stage_records(conn, records, stats: IngestStats, chunk: int = 5000, progress_every: int = 100_000) -> dict:
+    """
+    Пише записи в temp.addr_stage пачками. Тимчасова таблиця — основну базу не блокує.
+    Повертає різні вулиці переліку (street_names) — для addr_streets.
+    """
+    conn.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS addr_stage("
+        "raw_address TEXT, norm_address TEXT, group_id TEXT, subgroup TEXT)"
+    )
+    conn.execute("DROP INDEX IF EXISTS temp.idx_addr_stage_norm")
+    conn.execute("DELETE FROM temp.addr_stage")
+    next_report = progress_every
+    streets: dict[str, str] = {}
+    for rows in _chunks(records, chunk):
+        for street, label in street_names(r[1] for r in rows).items():
+            streets.setdefault(street, label)
+        # BEGIN (deferred) з записом лише в temp — без блокування zap_bot.db
+        conn.execute("BEGIN")
+        conn.executemany("INSERT INTO temp.addr_stage VALUES (?, ?, ?, ?)", rows)
+        conn.execute("COMMIT")
+        stats.staged += len(rows)
+        if stats.staged >= next_report:
+            _progress(f"stage: {stats.staged} рядків, {stats.rate:.0f} рядків/с")
+            next_report += progress_every
+    # Індекс після вставки — дешевше, ніж підтримувати його на кожній пачці
+    conn.execute("CREATE INDEX temp.idx_addr_stage_norm ON addr_stage(norm_address)")
+    return streets
+
+
+def swap_source(conn, source_url: str, stats: IngestStats, streets: dict):
+    """Одна транзакція: addr_map цього джерела стає рівним addr_stage (різницею), addr_streets — streets."""
+    t = time.perf_counter()
+    with db.transaction():
+        stats.deleted = conn.execute(_DELETE_GONE_SQL, (source_url,)).rowcount
+        stats.inserted = conn.execute(_INSERT_NEW_SQL, (source_url, source_url)).rowcount
+        db.replace_addr_streets(source_url, streets)
+    stats.swap_seconds = time.perf_counter() - t
+
+
+def ingest(rows, source_url: str, chunk: int = 5000, min_rows: int = 1, dry_run: bool = False) -> IngestStats:
+    """
+    Розбирає rows ((заголовок?, клітинки)) і атомарно замінює ними адреси джерела source_url.
+    IngestError, якщо розібрано менше min_rows адрес (addr_map тоді не змінюється).
+    """
+    stats = IngestStats()
+    records = parse_records(rows, stats)
+    if dry_run:
+        for _ in records:
+            stats.staged += 1
+        return stats
+
+    db.init_db()
+    conn = db.get_conn()
+    # addr_stage — у тимчасовому файлі, а не в пам'яті (з'єднання бота тримає temp_store=MEMORY)
+    conn.execute("PRAGMA temp_store=FILE")
+    try:
+        streets = stage_records(conn, records, stats, chunk=chunk)
+        if stats.staged < min_rows:
+            # Зламана сторінка чи порожній файл не повинні стерти довідник
+            raise IngestError(
+                f"Розібрано лише {stats.staged} адрес (мінімум {min_rows}) — addr_map не змінено"
+            )
+        swap_source(conn, source_url, stats, streets)
+    finally:
+        conn.execute("DROP TABLE IF EXISTS temp.addr_stage")
+        conn.execute("PRAGMA temp_store=MEMORY")
+    return stats
+
+
+# ------------------------
+# CLI
+# ------------------------
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("path", help="файл, '-' (stdin) або http(s) URL")
+    ap.add_argument("--format", choices=("html", "csv"))
+    ap.add_argument("--source-url", help="ідентифікатор джерела в addr_map (за замовчуванням — path)")
+    ap.add_argument("--db", help=f"шлях до бази (за замовчуванням {db.DB_PATH})")
+    ap.add_argument("--chunk", type=int, default=5000, help="рядків на executemany")
+    ap.add_argument("--min-rows", type=int, default=1, help="менше адрес — нічого не замінювати")
+    ap.add_argument("--dry-run", action="store_true", help="лише розібрати джерело, нічого не писати")
+    args = ap.parse_args(argv)
+    if args.db:
+        db.DB_PATH = Path(args.db)
+    source_url = args.source_url or args.path
+
+    t0 = time.perf_counter()
+    try:
+        fmt = _detect_format(args.path, args.format)
+        rows = (html_rows if fmt == "html" else csv_rows)(_read_chunks(args.path))
+        stats = ingest(rows, source_url, chunk=args.chunk, min_rows=args.min_rows, dry_run=args.dry_run)
+    except IngestError as e:
+        _progress(str(e))
+        return 1
+    finally:
+        db.close_conn()
+    elapsed = time.perf_counter() - t0
+    if args.dry_run:
+        _progress(
+            f"Розібрано {stats.staged} адрес з {stats.read} рядків, відхилено {stats.rejected}, "
+            f"{elapsed:.1f}s ({stats.rate:.0f} рядків/с)"
+        )
+    else:
+        _progress(
+            f"{source_url}: {stats.staged} адрес ({stats.rejected} рядків відхилено), "
+            f"+{stats.inserted} / -{stats.deleted} у addr_map; "
+            f"{elapsed:.1f}s ({stats.rate:.0f} рядків/с), заміна {stats.swap_seconds * 1000:.0f} ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+# addresses.py
+"""
+Нормалізація адрес для addr_map.norm_address і для пошуку за адресою.
+
+"вул. Перемоги, буд. 12-А" і "Перемоги вулиця 12а" дають одне й те саме:
+"вулиця перемоги 12а" — тип вулиці повним словом на початку, далі назва, номер будинку
+в кінці (літера приєднана до номера), без апострофів, розділових знаків і службових
+слів (буд., кв. з номером, м., обл. тощо).
+
+AddressQuery розкладає нормалізований рядок на частини для FTS5-пошуку (див. db.search_addr_map):
+- words — слова назви (від 3 символів: коротші триграмний індекс не шукає);
+- house — номер будинку;
+- street_type — тип вулиці (лише для ранжування: користувач часто його не пише або плутає).
+"""
+import re
+from dataclasses import dataclass
+from difflib import SequenceMatcher, get_close_matches
+
+_apostrophe_re = re.compile(r"[’ʼ'`´‘]")
+_cyrillic_re = re.compile(r"[а-яіїєґ]")
+_token_re = re.compile(r"[0-9a-zа-яіїєґё/-]+")
+_house_re = re.compile(r"^\d+(?:/\d+)?[а-яіїєґa-z]?$")
+_LETTERS = "абвгґдеєжзиіїйклмнопрстуфхцчшщьюяabcdefghijklmnopqrstuvwxyz"
+
+# Латинські літери, схожі на кириличні ("Пeремоги" з латинською e) — лише в словах з кирилицею
+_HOMOGLYPHS = str.maketrans("aceiopxykmthb", "асеіорхукмтнв")
+# Російське написання -> українські літери ("соборный")
+_RU_LETTERS = str.maketrans({"ё": "е", "ы": "и", "э": "е", "ъ": ""})
+
+# Скорочення -> повна назва типу вулиці (ключі — без крапок, у нижньому регістрі)
+_STREET_TYPES = {
+    "вулиця": ("вул", "вулиця", "вулиці", "ул", "улица"),
+    "проспект": ("пр", "просп", "пр-т", "пр-кт", "прт", "проспект"),
+    "провулок": ("пров", "пров-к", "провулок", "пер", "переулок"),
+    "бульвар": ("б-р", "бр", "бул", "бульв", "бульвар"),
+    "площа": ("пл", "площа", "площадь"),
+    "шосе": ("ш", "шосе", "шоссе"),
+    "набережна": ("наб", "набережна", "набережная"),
+    "узвіз": ("узв", "узвіз"),
+    "тупик": ("туп", "тупик"),
+    "проїзд": ("пр-д", "прд", "проїзд", "проезд"),
+    "мікрорайон": ("мкр", "мкрн", "м-н", "мікрорайон", "микрорайон"),
+    "квартал": ("кв-л", "квартал"),
+}
+_TYPE_OF = {abbr: full for full, abbrs in _STREET_TYPES.items() for abbr in abbrs}
+
+# Службові слова, які відкидаємо
+_DROP = {
+    "буд", "будинок", "б", "д", "дом", "м", "місто", "г", "город",
+    "обл", "область", "р-н", "район", "україна", "запорізька", "запоріжжя",
+}
+# Службове слово разом із наступним номером (квартира, під'їзд, корпус)
+_DROP_WITH_NUMBER = {"кв", "квартира", "під", "підїзд", "пiд", "корп", "корпус"}
+
+
+def normalize_address(raw: str) -> str:
+    """Канонічний вигляд адреси (див. опис модуля). Порожній рядок, якщо нічого не лишилось."""
+    text = _apostrophe_re.sub("", (raw or "").lower()).translate(_RU_LETTERS)
+    street_type = None
+    words: list[str] = []
+    skip_number = False
+    for token in _token_re.findall(text):
+        token = token.strip("-/")
+        if not token:
+            continue
+        if _cyrillic_re.search(token):
+            token = token.translate(_HOMOGLYPHS)
+        if token in _TYPE_OF:
+            street_type = street_type or _TYPE_OF[token]
+            continue
+        if token in _DROP_WITH_NUMBER:
+            skip_number = True
+            continue
+        if skip_number and token[0].isdigit():
+            skip_number = False
+            continue
+        skip_number = False
+        if token in _DROP:
+            continue
+        # "12-а" -> "12а", "нижньо-дніпровська" -> "нижньо дніпровська"
+        parts = [p for p in token.split("-") if p]
+        if len(parts) == 2 and parts[0].isdigit() and len(parts[1]) == 1:
+            parts = [parts[0] + parts[1]]
+        for part in parts:
+            # "12 а" -> "12а"
+            if len(part) == 1 and part.isalpha() and words and words[-1].isdigit():
+                words[-1] += part
+            elif part not in _DROP:
+                words.append(part)
+
+    # Номер будинку — в кінець. Шукаємо після останнього слова назви ("героїв 93ї бригади 5"),
+    # з кількох — перший (решта зазвичай корпус/квартира)
+    last_word = max((i for i, w in enumerate(words) if w.isalpha()), default=-1)
+    house = next((w for w in words[last_word + 1:] if _house_re.match(w)), None)
+    if house is None:
+        house = next((w for w in words if _house_re.match(w)), None)
+    if house is not None:
+        words.remove(house)
+        words.append(house)
+    if street_type:
+        words.insert(0, street_type)
+    return " ".join(words)
+
+
+@dataclass(frozen=True)
+class AddressQuery:
+    norm: str
+    words: tuple[str, ...]
+    house: str | None
+    street_type: str | None
+
+    @property
+    def searchable(self) -> bool:
+        return bool(self.words)
+
+    @property
+    def house_digits(self) -> str | None:
+        """'12а' -> '12': у БД будинок може бути записаний без літери (і навпаки)."""
+        return self.house.rstrip(_LETTERS) if self.house else None
+
+    def strict_match(self) -> str:
+        """
+        FTS5 MATCH: усі слова назви (підрядки), а номер будинку — фразою з останнім
+        словом ("перемоги 12"): окремий " 2" коротший за триграму і нічого б не знайшов.
+        """
+        terms = [f'"{w}"' for w in self.words]
+        if self.house:
+            terms[-1] = f'"{self.words[-1]} {self.house_digits}"'
+        return " AND ".join(terms)
+
+    def house_globs(self) -> tuple[str, str, str]:
+        """GLOB-шаблони norm_address для впорядкування кандидатів: точний будинок, з іншою літерою, без літери."""
+        digits = self.house_digits
+        return f"* {self.house}", f"* {digits}[!0-9]", f"* {digits}"
+
+    def with_street(self, street: str) -> "AddressQuery":
+        """Той самий будинок на іншій вулиці (виправлена опечатка в назві)."""
+        street_type, name, _house = street_part(street)
+        words = tuple(w for w in name.split() if len(w) >= 3 and not w.isdigit())
+        return AddressQuery(self.norm, words, self.house, self.street_type or street_type)
+
+    def without_house(self) -> "AddressQuery":
+        return AddressQuery(self.norm, self.words, None, self.street_type)
+
+
+def parse_query(raw: str) -> AddressQuery:
+    norm = normalize_address(raw)
+    tokens = norm.split()
+    street_type = tokens.pop(0) if tokens and tokens[0] in _STREET_TYPES else None
+    house = tokens.pop() if tokens and _house_re.match(tokens[-1]) else None
+    words = tuple(w for w in tokens if len(w) >= 3 and not w.isdigit())
+    return AddressQuery(norm, words, house, street_type)
+
+
+def street_part(norm: str) -> tuple[str | None, str, str | None]:
+    """'вулиця перемоги 12' -> ('вулиця', 'перемоги', '12')."""
+    tokens = norm.split()
+    street_type = tokens.pop(0) if tokens and tokens[0] in _STREET_TYPES else None
+    house = tokens.pop() if tokens and _house_re.match(tokens[-1]) else None
+    return street_type, " ".join(tokens), house
+
+
+def street_names(norms) -> dict[str, str]:
+    """Назва вулиці -> 'тип назва' для всіх різних вулиць з norm_address (словник для опечаток)."""
+    # Спершу відкидаємо номер будинку дешево (без regex): різних вулиць на порядки менше, ніж адрес
+    prefixes = set()
+    for norm in norms:
+        head, _, tail = (norm or "").rpartition(" ")
+        prefixes.add(head if tail[:1].isdigit() else norm)
+    streets: dict[str, str] = {}
+    for prefix in sorted(prefixes):
+        street_type, street, _house = street_part(prefix or "")
+        if street and street not in streets:
+            streets[street] = f"{street_type} {street}" if street_type else street
+    return streets
+
+
+def closest_street(query: AddressQuery, streets: dict[str, str]) -> str | None:
+    """Найближча до запиту вулиця (difflib) — для виправлення опечатки в назві."""
+    match = get_close_matches(" ".join(query.words), streets, n=1, cutoff=0.6)
+    return streets[match[0]] if match else None
+
+
+def rank_candidates(query: AddressQuery, rows, limit: int = 5) -> list[dict]:
+    """
+    Переранжування кандидатів з FTS (кілька десятків-сотень рядків):
+    схожість назви вулиці (difflib) + збіг номера будинку + збіг типу вулиці.
+    Повертає до limit різних (адреса, підчерга), найкращі першими.
+    """
+    name = " ".join(query.words)
+    matcher = SequenceMatcher(autojunk=False)
+    matcher.set_seq2(name)
+    scored = []
+    for r in rows:
+        street_type, street, house = street_part(r["norm_address"] or "")
+        matcher.set_seq1(street)
+        score = matcher.ratio()
+        if query.house and house:
+            if house == query.house:
+                score += 1.0
+            elif house.rstrip(_LETTERS) == query.house_digits:
+                # "12" і "12а" — сусідні корпуси, часто в одній підчерзі
+                score += 0.5
+        if query.street_type and street_type == query.street_type:
+            score += 0.1
+        scored.append((score, r))
+
+    scored.sort(key=lambda x: -x[0])
+    out, seen = [], set()
+    for score, r in scored:
+        key = (r["norm_address"], r["subgroup"])
+        if key in seen:
+            continue
+        seen.add(key)
+        out.append({
+            "id": r["id"],
+            "raw_address": r["raw_address"],
+            "norm_address": r["norm_address"],
+            "group_id": r["group_id"],
+            "subgroup": r["subgroup"],
+            "score": round(score, 3),
+        })
+        if len(out) >= limit:
+            break
+    return out
@@ -0,0 +1,257 @@
+# async_db.py
+"""
+Асинхронний фасад над database/db.py — хендлери бота ніколи не блокують event loop.
+
+- читання виконуються в пулі потоків (у кожного потоку своє WAL-з'єднання,
+  тож читачі працюють паралельно і не чекають на писача);
+- усі записи йдуть через один окремий потік-писач: він забирає з черги все,
+  що накопичилось, і виконує пачкою в одній транзакції (один коміт на пачку).
+  Кожен запис у пачці ізольований SAVEPOINT'ом: помилка одного не відкочує інші.
+"""
+import asyncio
+import concurrent.futures
+import logging
+import queue
+import threading
+from functools import partial
+
+from database import db
+from database.registry import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+READ_WORKERS = 4
+MAX_WRITE_BATCH = 256
+
+
+class _Writer(threading.Thread):
+    def __init__(self, max_batch: int = MAX_WRITE_BATCH):
+        super().__init__(name="db-writer", daemon=True)
+        self.max_batch = max_batch
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+
+    def submit(self, fn, *args, **kwargs) -> concurrent.futures.Future:
+        fut = concurrent.futures.Future()
+        self._queue.put((fut, fn, args, kwargs))
+        return fut
+
+    def stop(self):
+        self._queue.put(None)
+        self.join()
+
+    def run(self):
+        try:
+            while True:
+                job = self._queue.get()
+                if job is None:
+                    return
+                batch = [job]
+                stop = False
+                while len(batch) < self.max_batch:
+                    try:
+                        job = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if job is None:
+                        stop = True
+                        break
+                    batch.append(job)
+                self._run_batch(batch)
+                if stop:
+                    return
+        finally:
+            db.close_conn()
+
+    @staticmethod
+    def _run_batch(batch):
+        results = []
+        try:
+            with db.transaction() as conn:
+                for fut, fn, args, kwargs in batch:
+                    if not fut.set_running_or_notify_cancel():
+                        continue
+                    conn.execute("SAVEPOINT w")
+                    try:
+                        res = fn(*args, **kwargs)
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO w")
+                        conn.execute("RELEASE w")
+                        results.append((fut, None, e))
+                    else:
+                        conn.execute("RELEASE w")
+                        results.append((fut, res, None))
+        except Exception as e:
+            # Не вдався сам коміт — жоден запис пачки не збережено
+            logger.exception("Помилка пакетного запису в БД: %s", e)
+            for fut, _fn, _a, _kw in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        # Результати віддаємо лише після коміту: awaited запис гарантовано збережений
+        for fut, res, err in results:
+            if err is not None:
+                fut.set_exception(err)
+            else:
+                fut.set_result(res)
+
+
+_writer: _Writer | None = None
+_readers: concurrent.futures.ThreadPoolExecutor | None = None
+_lock = threading.Lock()
+
+
+def start():
+    """Запускає потік-писач і пул читачів (викликається ліниво при першому запиті)."""
+    global _writer, _readers
+    with _lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = _Writer()
+            _writer.start()
+        if _readers is None:
+            _readers = concurrent.futures.ThreadPoolExecutor(
+                max_workers=READ_WORKERS,
+                thread_name_prefix="db-read",
+            )
+
+
+def stop():
+    """Дописує чергу записів і зупиняє потоки (при зупинці бота)."""
+    global _writer, _readers
+    with _lock:
+        if _writer is not None:
+            _writer.stop()
+            _writer = None
+        if _readers is not None:
+            # Закриваємо з'єднання кожного потоку-читача
+            for _ in range(READ_WORKERS):
+                _readers.submit(db.close_conn)
+            _readers.shutdown(wait=True)
+            _readers = None
+
+
+async def _read(fn, *args, **kwargs):
+    if _readers is None:
+        start()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_readers, partial(fn, *args, **kwargs))
+
+
+async def _write(fn, *args, **kwargs):
+    if _writer is None:
+        start()
+    return await asyncio.wrap_future(_writer.submit(fn, *args, **kwargs))
+
+
+# =========================
+# users
+# =========================
+async def get_user_by_chat(chat_id):
+    # Якщо реєстр завантажено — відповідь з пам'яті, без БД
+    if REGISTRY.loaded:
+        return REGISTRY.get(chat_id)
+    return await _read(db.get_user_by_chat, chat_id)
+
+
+async def get_users_by_subgroup(subgroup, region=None):
+    if REGISTRY.loaded:
+        return REGISTRY.chat_ids_by_subgroup(subgroup, region)
+    return await _read(db.get_users_by_subgroup, subgroup, region)
+
+
+async def get_warning_recipients(subgroup, lead, default_leads, region=None):
+    if REGISTRY.loaded:
+        return REGISTRY.warning_recipients(subgroup, lead, default_leads, region)
+    return await _read(db.get_warning_recipients, subgroup, lead, tuple(default_leads), region)
+
+
+async def get_digest_users():
+    if REGISTRY.loaded:
+        return REGISTRY.digest_users()
+    return await _read(db.get_digest_users)
+
+
+async def list_all_users(limit=100):
+    return await _read(db.list_all_users, limit)
+
+
+async def save_user_hashed(chat_id, username, hashed_address, raw_address=None, group_id=None, subgroup=None, verified=0):
+    await _write(
+        db.save_user_hashed,
+        chat_id,
+        username,
+        hashed_address,
+        raw_address=raw_address,
+        group_id=group_id,
+        subgroup=subgroup,
+        verified=verified,
+    )
+    # Write-through: реєстр оновлюємо лише після коміту
+    if REGISTRY.loaded:
+        REGISTRY.put(chat_id, group_id=group_id, subgroup=subgroup, verified=verified)
+
+
+async def set_user_leads(chat_id, leads):
+    await _write(db.set_user_leads, chat_id, leads)
+    if REGISTRY.loaded:
+        REGISTRY.set_leads(chat_id, leads)
+
+
+async def set_user_region(chat_id, region):
+    await _write(db.set_user_region, chat_id, region)
+    if REGISTRY.loaded:
+        REGISTRY.set_region(chat_id, region)
+
+
+async def set_user_digest(chat_id, mode):
+    await _write(db.set_user_digest, chat_id, mode)
+    if REGISTRY.loaded:
+        REGISTRY.set_digest(chat_id, mode)
+
+
+# =========================
+# addr_map
+# =========================
+async def search_addr_map(query, limit=5):
+    return await _read(db.search_addr_map, query, limit)
+
+
+async def load_addr_map_by_id(rec_id):
+    return await _read(db.load_addr_map_by_id, rec_id)
+
+
+# =========================
+# notified
+# =========================
+async def was_notified(key):
+    return await _read(db.was_notified, key)
+
+
+async def mark_notified(key, ts=None):
+    return await _write(db.mark_notified, key, ts)
+
+
+async def unmark_notified(keys):
+    return await _write(db.unmark_notified, list(keys))
+
+
+async def was_notified_many(keys):
+    return await _read(db.was_notified_many, list(keys))
+
+
+async def mark_notified_many(keys, ts=None):
+    return await _write(db.mark_notified_many, list(keys), ts)
+
+
+async def prune_notified(older_than_ts):
+    return await _write(db.prune_notified, older_than_ts)
+
+
+# =========================
+# schedule_cache
+# =========================
+async def load_schedule_cache():
+    return await _read(db.load_schedule_cache)
+
+
+async def save_schedule_cache(rows):
+    return await _write(db.save_schedule_cache, list(rows))
@@ -1,227 +1,479 @@
 # db.py
+from contextlib import contextmanager
+from functools import wraps
 from pathlib import Path
 import sqlite3
+import threading
 import time
 
+from database.addresses import closest_street, normalize_address, parse_query, rank_candidates, street_names
+from database.migrations import ensure_addr_fts, migrate
+from monitoring.metrics import DB_QUERY_SECONDS
+
 BASE_DIR = Path(__file__).resolve().parent
 DB_PATH = BASE_DIR / "zap_bot.db"
 
-
-def get_conn():
-    """Повертає з'єднання з sqlite файлом (створить файл, якщо його не існує)."""
-    conn = sqlite3.connect(str(DB_PATH), timeout=30)
+# Довгоживуче з'єднання на кожен потік (sqlite3.Connection не можна ділити між потоками)
+_local = threading.local()
+
+# PRAGMA для кожного нового з'єднання:
+# WAL — читачі не блокують писача, коміт без fsync журналу на кожен запис;
+# synchronous=NORMAL — в режимі WAL безпечно (можлива втрата лише останніх транзакцій при падінні ОС);
+# cache_size < 0 — розмір кешу сторінок у KiB.
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL;",
+    "PRAGMA synchronous=NORMAL;",
+    "PRAGMA cache_size=-16000;",
+    "PRAGMA temp_store=MEMORY;",
+)
+
+
+def _timed(fn):
+    """Час виконання функції в гістограму zap_db_query_seconds{query=<ім'я функції>}."""
+    hist = DB_QUERY_SECONDS.labels(fn.__name__)
+    perf_counter = time.perf_counter
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        t = perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            hist.observe(perf_counter() - t)
+
+    return wrapper
+
+
+def _connect():
+    # isolation_level=None — автокоміт; групові записи робимо явно через transaction()
+    # cached_statements — кеш підготовлених запитів на з'єднання (повторне використання)
+    conn = sqlite3.connect(str(DB_PATH), timeout=30, isolation_level=None, cached_statements=256)
     conn.row_factory = sqlite3.Row
+    for pragma in _PRAGMAS:
+        conn.execute(pragma)
     return conn
 
 
-def init_db():
-    """Створює базові таблиці та виконує м'які міграції (безпечний багаторазовий виклик)."""
-    conn = get_conn()
-    cur = conn.cursor()
-
-    # ---- Базова схема
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS users(
-            chat_id INTEGER PRIMARY KEY,
-            username TEXT,
-            address TEXT,           -- залишено для зворотної сумісності (НЕ використовуємо)
-            hashed_address TEXT,    -- основне поле для адреси (хеш), зараз не використовується
-            group_id TEXT,
-            subgroup TEXT,
-            verified INTEGER DEFAULT 0
-        );
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS addr_map(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            raw_address TEXT,
-            norm_address TEXT,
-            group_id TEXT,
-            subgroup TEXT,
-            source_url TEXT
-        );
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS chats(
-            chat_id INTEGER PRIMARY KEY,
-            subgroup TEXT
-        );
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS notified(
-            id TEXT PRIMARY KEY,
-            ts INTEGER
-        );
-        """
-    )
-
-    # ---- Індекси
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_addr_norm ON addr_map(norm_address);")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_addr_subgroup ON addr_map(subgroup);")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_users_subgroup ON users(subgroup);")
+def get_conn():
+    """
+    Повертає довгоживуче з'єднання поточного потоку (створить файл, якщо його не існує).
+    З'єднання НЕ треба закривати після кожного запиту.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.path != str(DB_PATH):
+        if conn is not None:
+            conn.close()
+        conn = _connect()
+        _local.conn = conn
+        _local.path = str(DB_PATH)
+        _local.depth = 0
+    return conn
 
-    # ---- М'які міграції
-    ensure_hashed_column(cur)
 
-    conn.commit()
-    conn.close()
+def close_conn():
+    """Закриває з'єднання поточного потоку (при зупинці бота / в скриптах)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
 
 
-def ensure_hashed_column(cur_or_none=None):
+@contextmanager
+def transaction():
     """
-    Якщо в таблиці users немає колонки hashed_address — додає її.
-    Може бути викликано в контексті існуючого курсора або окремо.
-    """
-    if cur_or_none is None:
-        conn = get_conn()
-        cur = conn.cursor()
-        own_conn = True
-    else:
-        cur = cur_or_none
-        own_conn = False
+    Групує кілька записів в одну транзакцію (один коміт). Можна вкладати —
+    комітить лише зовнішній блок.
 
+        with transaction() as conn:
+            conn.execute(...)
+            mark_notified(...)
+    """
+    conn = get_conn()
+    if _local.depth:
+        _local.depth += 1
+        try:
+            yield conn
+        finally:
+            _local.depth -= 1
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
+    _local.depth = 1
     try:
-        cur.execute("PRAGMA table_info(users);")
-        cols = [r["name"] for r in cur.fetchall()]
-        if "hashed_address" not in cols:
-            try:
-                cur.execute("ALTER TABLE users ADD COLUMN hashed_address TEXT;")
-            except Exception:
-                # Ігноруємо помилку, якщо ALTER недоступний — код працюватиме з NULL у полі
-                pass
-        if own_conn:
-            conn.commit()
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    else:
+        conn.execute("COMMIT")
     finally:
-        if own_conn:
-            conn.close()
+        _local.depth = 0
+
+
+def init_db():
+    """
+    Доводить схему до останньої версії (database/migrations.py). Викликається один раз на
+    старті процесу; для актуальної бази це один PRAGMA user_version і перевірка, що є addr_fts
+    (його створюємо, щойно SQLite почне підтримувати FTS5 trigram).
+    """
+    conn = get_conn()
+    versions = migrate(conn)
+    ensure_addr_fts(conn)
+    return versions
 
 
 # =========================
-# Функції для addr_map (зараз не використовуються)
+# Функції для addr_map (масове оновлення з переліку — database/addr_ingest.py)
 # =========================
+@_timed
 def insert_addr_map_record(raw_address, norm_address, group_id, subgroup, source_url):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO addr_map(raw_address, norm_address, group_id, subgroup, source_url) VALUES (?, ?, ?, ?, ?)",
-        (raw_address, norm_address, group_id, subgroup, source_url),
-    )
-    conn.commit()
-    conn.close()
+    # norm_address — те, що індексує addr_fts; без нього адресу не знайти пошуком
+    norm_address = norm_address or normalize_address(raw_address)
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO addr_map(raw_address, norm_address, group_id, subgroup, source_url) VALUES (?, ?, ?, ?, ?)",
+            (raw_address, norm_address, group_id, subgroup, source_url),
+        )
+        _add_addr_streets(conn, source_url, street_names([norm_address]))
 
 
+@_timed
 def clear_addr_map_by_source(source_url):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM addr_map WHERE source_url=?", (source_url,))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("DELETE FROM addr_map WHERE source_url=?", (source_url,))
+        conn.execute("DELETE FROM addr_streets WHERE source_url=?", (source_url,))
+
+
+def _add_addr_streets(conn, source_url, streets):
+    conn.executemany(
+        "INSERT OR IGNORE INTO addr_streets(source_url, street, label) VALUES (?, ?, ?)",
+        ((source_url, street, label) for street, label in streets.items()),
+    )
 
 
+@_timed
+def replace_addr_streets(source_url, streets):
+    """Різні вулиці джерела (street_names) — замість попередніх. Вкладається в транзакцію викликача."""
+    with transaction() as conn:
+        conn.execute("DELETE FROM addr_streets WHERE source_url=?", (source_url,))
+        _add_addr_streets(conn, source_url, streets)
+
+
+@_timed
 def load_all_addr_map_records():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id, raw_address, norm_address, group_id, subgroup, source_url FROM addr_map")
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return rows
+    cur = get_conn().execute("SELECT id, raw_address, norm_address, group_id, subgroup, source_url FROM addr_map")
+    return [dict(r) for r in cur.fetchall()]
 
 
+@_timed
 def load_addr_map_by_id(rec_id):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
+    cur = get_conn().execute(
         "SELECT id, raw_address, norm_address, group_id, subgroup, source_url FROM addr_map WHERE id=?",
         (rec_id,),
     )
     r = cur.fetchone()
-    conn.close()
     return dict(r) if r else None
 
 
+_ADDR_COLUMNS = "a.id, a.raw_address, a.norm_address, a.group_id, a.subgroup"
+_ADDR_MATCH_SQL = (
+    f"SELECT {_ADDR_COLUMNS} FROM addr_fts JOIN addr_map a ON a.id = addr_fts.rowid "
+    "WHERE addr_fts MATCH ? LIMIT ?"
+)
+# Збіги номера будинку — першими: точний, з іншою літерою, без літери (див. AddressQuery.house_globs)
+_ADDR_MATCH_HOUSE_SQL = (
+    f"SELECT {_ADDR_COLUMNS} FROM addr_fts JOIN addr_map a ON a.id = addr_fts.rowid "
+    "WHERE addr_fts MATCH ? "
+    "ORDER BY 2 * (a.norm_address GLOB ?) + (a.norm_address GLOB ?) + (a.norm_address GLOB ?) DESC LIMIT ?"
+)
+# Скільки кандидатів переранжовувати в Python
+_ADDR_CANDIDATES = 50
+
+# Різні вулиці для виправлення опечаток — таблиця addr_streets (кілька тисяч рядків, а не
+# сотні тисяч адрес). Перечитується, коли змінюється max(id): кожна заміна вулиць джерела
+# вставляє рядки з новими id (AUTOINCREMENT), а max(id) — один крок по B-дереву rowid.
+# Після самих лише видалень у кеші лишаються зайві вулиці — пошук за ними просто нічого не знайде.
+_addr_streets = {"key": None, "streets": {}}
+
+
+def _addr_street_names(conn):
+    key = conn.execute("SELECT max(id) FROM addr_streets").fetchone()[0]
+    if key != _addr_streets["key"]:
+        cur = conn.execute("SELECT street, label FROM addr_streets")
+        _addr_streets.update(key=key, streets=dict(cur.fetchall()))
+    return _addr_streets["streets"]
+
+
+def _match_addr(conn, q):
+    if q.house:
+        return conn.execute(
+            _ADDR_MATCH_HOUSE_SQL, (q.strict_match(), *q.house_globs(), _ADDR_CANDIDATES)
+        ).fetchall()
+    return conn.execute(_ADDR_MATCH_SQL, (q.strict_match(), _ADDR_CANDIDATES)).fetchall()
+
+
+@_timed
+def search_addr_map(query, limit=5):
+    """
+    Кандидати (адреса -> підчерга) для введеної користувачем адреси, найкращі першими.
+    1) усі слова назви як підрядки + номер будинку (FTS5 trigram, індексний пошук);
+    2) такого будинку немає — будинки цієї вулиці;
+    3) вулиці немає — опечатка: найближча назва серед різних вулиць addr_map і повтор п.1;
+    далі — переранжування кандидатів у Python (database/addresses.py).
+    """
+    q = parse_query(query)
+    if not q.searchable:
+        return []
+    conn = get_conn()
+    try:
+        rows = _match_addr(conn, q)
+        if not rows and q.house:
+            rows = _match_addr(conn, q.without_house())
+        if not rows:
+            street = closest_street(q, _addr_street_names(conn))
+            if street:
+                fixed = q.with_street(street)
+                rows = _match_addr(conn, fixed) or (q.house and _match_addr(conn, fixed.without_house())) or []
+    except sqlite3.OperationalError:
+        # Немає addr_fts — префікс нормалізованої адреси по індексу idx_addr_norm
+        rows = conn.execute(
+            "SELECT id, raw_address, norm_address, group_id, subgroup FROM addr_map "
+            "WHERE norm_address >= ? AND norm_address < ? LIMIT ?",
+            (q.norm, q.norm + "\uffff", _ADDR_CANDIDATES),
+        ).fetchall()
+    return rank_candidates(q, rows, limit)
+
+
 # =========================
 # Функції для users
 # =========================
+@_timed
 def save_user_hashed(chat_id, username, hashed_address, raw_address=None, group_id=None, subgroup=None, verified=0):
     """
     Зберігає або оновлює користувача.
     raw_address за замовчуванням не зберігаємо (приватність) — залишено параметр для сумісності.
     hashed_address зараз може бути None, якщо не працюємо з адресами.
     """
-    conn = get_conn()
-    cur = conn.cursor()
-    # На випадок, якщо БД дуже стара і без міграцій — спробуємо додати колонку на льоту.
-    ensure_hashed_column(cur)
-
-    cur.execute(
-        """
-        INSERT OR REPLACE INTO users(chat_id, username, address, hashed_address, group_id, subgroup, verified)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """,
-        (chat_id, username, None, hashed_address, group_id, subgroup, verified),
-    )
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        cur = conn.cursor()
+        # UPSERT, а не INSERT OR REPLACE — щоб не затирати налаштування (lead_minutes тощо)
+        cur.execute(
+            """
+            INSERT INTO users(chat_id, username, address, hashed_address, group_id, subgroup, verified)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(chat_id) DO UPDATE SET
+                username=excluded.username,
+                address=excluded.address,
+                hashed_address=excluded.hashed_address,
+                group_id=excluded.group_id,
+                subgroup=excluded.subgroup,
+                verified=excluded.verified
+            """,
+            (chat_id, username, None, hashed_address, group_id, subgroup, verified),
+        )
+
+
+@_timed
+def set_user_leads(chat_id, leads):
+    """
+    Зберігає, за скільки хвилин до початку попереджати користувача ('30,10').
+    leads=None — повернутись до значення за замовчуванням.
+    """
+    value = ",".join(str(int(x)) for x in leads) if leads else None
+    get_conn().execute("UPDATE users SET lead_minutes=? WHERE chat_id=?", (value, chat_id))
+
+
+# Режим сповіщень (users.digest):
+# DIGEST_OFF — окреме попередження перед кожним інтервалом (як раніше, NULL у БД);
+# DIGEST_ONLY — лише ранковий дайджест з усіма інтервалами дня;
+# DIGEST_PINGS — дайджест + короткі нагадування перед початком.
+DIGEST_OFF, DIGEST_ONLY, DIGEST_PINGS = 0, 1, 2
+DIGEST_MODES = (DIGEST_OFF, DIGEST_ONLY, DIGEST_PINGS)
+
+
+@_timed
+def set_user_digest(chat_id, mode):
+    """Режим сповіщень користувача (DIGEST_*)."""
+    get_conn().execute("UPDATE users SET digest=? WHERE chat_id=?", (int(mode) or None, chat_id))
+
+
+@_timed
+def set_user_region(chat_id, region):
+    """Регіон (джерело графіка) користувача; None — регіон за замовчуванням."""
+    get_conn().execute("UPDATE users SET region=? WHERE chat_id=?", (region or None, chat_id))
+
 
+# Межі власних часів попередження (/remind, імпорт users_io)
+MAX_USER_LEADS = 5
+MAX_LEAD_MINUTES = 720
 
+
+def parse_leads(value):
+    """'30,10' -> (30, 10); None/'' -> None."""
+    if not value:
+        return None
+    return tuple(sorted({int(x) for x in str(value).split(",") if x.strip()}, reverse=True)) or None
+
+
+@_timed
 def get_user_by_chat(chat_id):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT chat_id, username, address, hashed_address, group_id, subgroup, verified FROM users WHERE chat_id=?",
+    cur = get_conn().execute(
+        "SELECT chat_id, username, address, hashed_address, group_id, subgroup, verified, lead_minutes, region, digest "
+        "FROM users WHERE chat_id=?",
         (chat_id,),
     )
     r = cur.fetchone()
-    conn.close()
     return dict(r) if r else None
 
 
-def get_users_by_subgroup(subgroup):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT chat_id FROM users WHERE subgroup=? AND verified=1", (subgroup,))
-
-    rows = [r["chat_id"] for r in cur.fetchall()]
-    conn.close()
-    return rows
+@_timed
+def get_users_by_subgroup(subgroup, region=None):
+    """Verified-користувачі підчерги в регіоні (None — регіон за замовчуванням)."""
+    cur = get_conn().execute(
+        "SELECT chat_id FROM users WHERE subgroup=? AND verified=1 AND region IS ?", (subgroup, region or None)
+    )
+    return [r["chat_id"] for r in cur.fetchall()]
 
 
+@_timed
+def get_warning_recipients(subgroup, lead, default_leads, region=None):
+    """
+    Verified-користувачі підчерги, що хочуть попередження за lead хвилин, за режимом:
+    (DIGEST_OFF — повне попередження, DIGEST_PINGS — коротке нагадування, DIGEST_ONLY — нічого).
+    """
+    cur = get_conn().execute(
+        "SELECT chat_id, lead_minutes, digest FROM users WHERE subgroup=? AND verified=1 AND region IS ?",
+        (subgroup, region or None),
+    )
+    full, pings, digest_only = [], [], []
+    for chat_id, lead_minutes, digest in cur:
+        if lead not in (parse_leads(lead_minutes) or default_leads):
+            continue
+        if not digest:
+            full.append(chat_id)
+        elif digest == DIGEST_PINGS:
+            pings.append(chat_id)
+        else:
+            digest_only.append(chat_id)
+    return full, pings, digest_only
+
+
+@_timed
+def get_digest_users():
+    """{(регіон, підчерга): [chat_id]} verified-користувачів у режимі дайджесту."""
+    cur = get_conn().execute("SELECT region, subgroup, chat_id FROM users WHERE verified=1 AND digest > 0")
+    out = {}
+    for region, subgroup, chat_id in cur:
+        if subgroup:
+            out.setdefault((region or None, subgroup), []).append(chat_id)
+    return out
+
+
+@_timed
 def list_all_users(limit=100):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
+    cur = get_conn().execute(
         "SELECT chat_id, username, group_id, subgroup, verified FROM users ORDER BY chat_id LIMIT ?",
         (limit,),
     )
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return rows
+    return [dict(r) for r in cur.fetchall()]
 
 
 # =========================
 # Функції для notified
 # =========================
+@_timed
 def mark_notified(key, ts=None):
     if ts is None:
         ts = int(time.time())
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("INSERT OR REPLACE INTO notified(id, ts) VALUES (?, ?)", (key, int(ts)))
-    conn.commit()
-    conn.close()
+    get_conn().execute("INSERT OR REPLACE INTO notified(id, ts) VALUES (?, ?)", (key, int(ts)))
+
+
+@_timed
+def unmark_notified(keys):
+    """Прибирає ключі (наприклад, коли ZOE прибрав або переніс інтервал)."""
+    keys = list(keys)
+    if not keys:
+        return
+    with transaction() as conn:
+        conn.executemany("DELETE FROM notified WHERE id=?", [(k,) for k in keys])
 
 
+@_timed
 def was_notified(key):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT 1 FROM notified WHERE id=?", (key,))
-    r = cur.fetchone()
-    conn.close()
+    r = get_conn().execute("SELECT 1 FROM notified WHERE id=?", (key,)).fetchone()
     return bool(r)
+
+
+# Ліміт параметрів в одному запиті SQLite (SQLITE_MAX_VARIABLE_NUMBER у старих збірках — 999)
+_IN_CHUNK = 500
+
+
+@_timed
+def was_notified_many(keys):
+    """Повертає підмножину keys, які вже є в notified (один SELECT на 500 ключів)."""
+    keys = list(keys)
+    found = set()
+    conn = get_conn()
+    for i in range(0, len(keys), _IN_CHUNK):
+        chunk = keys[i:i + _IN_CHUNK]
+        placeholders = ",".join("?" * len(chunk))
+        cur = conn.execute(f"SELECT id FROM notified WHERE id IN ({placeholders})", chunk)
+        found.update(r[0] for r in cur)
+    return found
+
+
+@_timed
+def mark_notified_many(keys, ts=None):
+    """Позначає всі keys однією транзакцією."""
+    if ts is None:
+        ts = int(time.time())
+    rows = [(k, int(ts)) for k in keys]
+    if not rows:
+        return
+    with transaction() as conn:
+        conn.executemany("INSERT OR REPLACE INTO notified(id, ts) VALUES (?, ?)", rows)
+
+
+@_timed
+def load_recent_notified(since_ts):
+    """{key: ts} для записів, новіших за since_ts (йде по індексу idx_notified_ts)."""
+    cur = get_conn().execute("SELECT id, ts FROM notified WHERE ts >= ?", (int(since_ts),))
+    return {r[0]: r[1] for r in cur}
+
+
+@_timed
+def prune_notified(older_than_ts):
+    """Видаляє записи, старші за older_than_ts. Повертає кількість видалених."""
+    with transaction() as conn:
+        cur = conn.execute("DELETE FROM notified WHERE ts < ?", (int(older_than_ts),))
+        return cur.rowcount
+
+
+# =========================
+# Функції для schedule_cache (теплий старт, див. MultiSourceSchedule.dump / restore)
+# =========================
+_SCHEDULE_CACHE_COLUMNS = (
+    "source", "url", "etag", "last_modified", "content_hash", "version", "validated_at", "base_date", "raw",
+)
+
+
+@_timed
+def save_schedule_cache(rows):
+    """UPSERT записів джерел (dict з ключами _SCHEDULE_CACHE_COLUMNS) однією транзакцією."""
+    rows = list(rows)
+    if not rows:
+        return
+    columns = ", ".join(_SCHEDULE_CACHE_COLUMNS)
+    values = ", ".join(f":{c}" for c in _SCHEDULE_CACHE_COLUMNS)
+    updates = ", ".join(f"{c}=excluded.{c}" for c in _SCHEDULE_CACHE_COLUMNS[1:])
+    with transaction() as conn:
+        conn.executemany(
+            f"INSERT INTO schedule_cache({columns}) VALUES ({values}) ON CONFLICT(source) DO UPDATE SET {updates}",
+            rows,
+        )
+
+
+@_timed
+def load_schedule_cache():
+    cur = get_conn().execute(f"SELECT {', '.join(_SCHEDULE_CACHE_COLUMNS)} FROM schedule_cache")
+    return [dict(zip(_SCHEDULE_CACHE_COLUMNS, r)) for r in cur]
@@ -0,0 +1,68 @@
+# ledger.py
+"""
+Журнал «вже сповіщено» (таблиця notified) з копією свіжих ключів у пам'яті.
+
+При старті завантажуємо всі ключі за останні retention_days днів. Ключі мають
+вигляд 'YYYY-MM-DD_X.Y_HHMM' і стосуються лише поточних/майбутніх інтервалів,
+тому для гарячого шляху нотифікатора відсутність ключа в пам'яті означає
+«ще не сповіщали» — без звернень до БД. Записи в БД ідуть пачками через async_db.
+"""
+import logging
+import time
+
+from database import async_db, db
+
+logger = logging.getLogger(__name__)
+
+
+class NotifiedLedger:
+    def __init__(self, retention_days: float = 7):
+        self.retention_days = retention_days
+        self.loaded = False
+        self._recent: dict[str, int] = {}
+
+    @property
+    def horizon_ts(self) -> int:
+        return int(time.time() - self.retention_days * 86400)
+
+    def load(self):
+        self._recent = db.load_recent_notified(self.horizon_ts)
+        self.loaded = True
+        logger.info("Журнал notified: %s свіжих ключів у пам'яті", len(self._recent))
+
+    async def filter_new(self, keys) -> list[str]:
+        """Ключі, за якими ще не сповіщали (порядок збережено)."""
+        keys = list(keys)
+        if self.loaded:
+            return [k for k in keys if k not in self._recent]
+        done = await async_db.was_notified_many(keys)
+        return [k for k in keys if k not in done]
+
+    async def mark(self, keys, ts=None):
+        keys = list(keys)
+        if not keys:
+            return
+        ts = int(ts if ts is not None else time.time())
+        # Спершу пам'ять — паралельний цикл не відправить повторно, поки йде запис
+        for k in keys:
+            self._recent[k] = ts
+        await async_db.mark_notified_many(keys, ts)
+
+    async def unmark(self, keys):
+        keys = list(keys)
+        for k in keys:
+            self._recent.pop(k, None)
+        await async_db.unmark_notified(keys)
+
+    async def prune(self) -> int:
+        """Видаляє записи, старші за горизонт, з БД і з пам'яті."""
+        horizon = self.horizon_ts
+        self._recent = {k: ts for k, ts in self._recent.items() if ts >= horizon}
+        deleted = await async_db.prune_notified(horizon)
+        if deleted:
+            logger.info("Журнал notified: видалено %s старих записів", deleted)
+        return deleted
+
+
+# Спільний екземпляр для бота
+LEDGER = NotifiedLedger()
@@ -0,0 +1,278 @@
+# migrations.py
+"""
+Версійні міграції схеми. Номер останнього застосованого кроку зберігається в PRAGMA user_version.
+
+MIGRATIONS — впорядкований список кроків. Крок N (рахуючи з 1) виконується рівно один раз
+у власній транзакції разом із PRAGMA user_version = N. Якщо запуск перервався, наступний
+продовжить із того самого кроку. migrate() викликається з db.init_db() на старті процесу (бот,
+CLI), а на шляху запитів схему більше не перевіряють.
+
+Бази, створені до появи версій, мають user_version = 0 і проходять усі кроки. Тому кроки
+ідемпотентні (IF NOT EXISTS, ensure_column): наявні таблиці й колонки їм не заважають.
+
+Новий крок — нова функція в кінці MIGRATIONS. Уже випущені кроки не змінюють.
+"""
+import logging
+import sqlite3
+
+from database.addresses import street_names
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_column(cur, table, column, decl):
+    """Додає колонку, якщо її ще немає."""
+    cur.execute(f"PRAGMA table_info({table});")
+    if column not in [r["name"] for r in cur.fetchall()]:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl};")
+
+
+# ------------------------
+# Кроки
+# ------------------------
+def _base_schema(cur):
+    """1: базові таблиці (як їх створював колишній create_db.py) та індекси."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users(
+            chat_id INTEGER PRIMARY KEY,
+            username TEXT,
+            address TEXT,           -- залишено для зворотної сумісності (НЕ використовуємо)
+            hashed_address TEXT,    -- основне поле для адреси (хеш), зараз не використовується
+            group_id TEXT,
+            subgroup TEXT,
+            verified INTEGER DEFAULT 0
+        );
+        """
+    )
+    # Зіставлення адрес із переліку ZOE (database/addr_ingest.py) для пошуку за адресою
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS addr_map(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            raw_address TEXT,
+            norm_address TEXT,
+            group_id TEXT,
+            subgroup TEXT,
+            source_url TEXT
+        );
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS chats(
+            chat_id INTEGER PRIMARY KEY,
+            subgroup TEXT
+        );
+        """
+    )
+    # Щоб не дублювати розсилки
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS notified(
+            id TEXT PRIMARY KEY,   -- наприклад: '2025-11-02_1.1_0730'
+            ts INTEGER             -- unix timestamp коли відправлено
+        );
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_addr_norm ON addr_map(norm_address);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_addr_subgroup ON addr_map(subgroup);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_users_subgroup ON users(subgroup);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_notified_ts ON notified(ts);")
+
+
+def _users_hashed_address(cur):
+    """2: hashed_address у дуже старих базах (раніше додавався на кожен save_user_hashed)."""
+    ensure_column(cur, "users", "hashed_address", "TEXT")
+
+
+def _users_lead_minutes(cur):
+    """3: за скільки хвилин попереджати ('30,10'); NULL — NOTIFY_LEAD_MINUTES."""
+    ensure_column(cur, "users", "lead_minutes", "TEXT")
+
+
+def _users_region(cur):
+    """4: регіон (джерело графіка); NULL — регіон за замовчуванням (див. schedule/sources.py)."""
+    ensure_column(cur, "users", "region", "TEXT")
+
+
+def _create_addr_fts(cur) -> bool:
+    """
+    FTS5-індекс з триграмами над addr_map.norm_address (external content: текст не
+    дублюється, індекс тримають в актуальному стані тригери). False — збірка SQLite
+    без FTS5 / trigram, індексу немає.
+    """
+    if cur.execute("SELECT 1 FROM sqlite_master WHERE name='addr_fts'").fetchone():
+        return True
+    try:
+        cur.execute(
+            "CREATE VIRTUAL TABLE addr_fts USING fts5("
+            "norm_address, content='addr_map', content_rowid='id', tokenize='trigram')"
+        )
+    except sqlite3.OperationalError:
+        return False
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS addr_map_ai AFTER INSERT ON addr_map BEGIN
+            INSERT INTO addr_fts(rowid, norm_address) VALUES (new.id, new.norm_address);
+        END;
+        """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS addr_map_ad AFTER DELETE ON addr_map BEGIN
+            INSERT INTO addr_fts(addr_fts, rowid, norm_address) VALUES ('delete', old.id, old.norm_address);
+        END;
+        """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS addr_map_au AFTER UPDATE OF norm_address ON addr_map BEGIN
+            INSERT INTO addr_fts(addr_fts, rowid, norm_address) VALUES ('delete', old.id, old.norm_address);
+            INSERT INTO addr_fts(rowid, norm_address) VALUES (new.id, new.norm_address);
+        END;
+        """
+    )
+    # Адреси, що вже є в addr_map, — в індекс
+    cur.execute("INSERT INTO addr_fts(addr_fts) VALUES ('rebuild')")
+    return True
+
+
+def _addr_fts(cur):
+    """
+    5: FTS5-індекс addr_fts (_create_addr_fts). Якщо збірка SQLite без FTS5 / trigram — індексу
+    не буде, db.search_addr_map шукатиме за префіксом; з'явиться підтримка — ensure_addr_fts створить.
+    """
+    if not _create_addr_fts(cur):
+        logger.warning("Міграція 5: SQLite без FTS5 / trigram — addr_fts не створено, пошук адрес за префіксом")
+
+
+def _schedule_cache(cur):
+    """6: останній відомий графік кожного джерела — для теплого старту (MultiSourceSchedule.restore)."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schedule_cache(
+            source TEXT PRIMARY KEY,    -- назва джерела (schedule/sources.py)
+            url TEXT,
+            etag TEXT,
+            last_modified TEXT,
+            content_hash TEXT,
+            version INTEGER,
+            validated_at REAL,          -- unix time останнього 200/304
+            base_date TEXT,             -- дата, від якої рахуються day_offset
+            raw TEXT                    -- сирі інтервали, ScheduleSnapshot.dump_raw()
+        );
+        """
+    )
+
+
+def _users_delivery_index(cur):
+    """
+    7: складений індекс під вибірку одержувачів розсилки
+    (WHERE subgroup=? AND verified=1 AND region IS ?, див. db.get_users_by_subgroup, db.get_warning_recipients):
+    усі три умови — у ключі, тож SQLite не читає рядки таблиці users. idx_users_subgroup
+    став його префіксом — прибираємо, щоб не оновлювати два індекси на кожен запис.
+    """
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_users_subgroup_verified ON users(subgroup, verified, region);"
+    )
+    cur.execute("DROP INDEX IF EXISTS idx_users_subgroup;")
+
+
+def _users_digest(cur):
+    """8: режим дайджесту (db.DIGEST_*); NULL — окреме попередження на кожен інтервал."""
+    ensure_column(cur, "users", "digest", "INTEGER")
+
+
+def _addr_streets(cur):
+    """
+    9: різні вулиці кожного джерела addr_map (словник для виправлення опечаток, db.search_addr_map).
+    Підтримують addr_ingest.swap_source і db.insert_addr_map_record / clear_addr_map_by_source;
+    наявні адреси переносимо сюди один раз.
+    """
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS addr_streets(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,   -- max(id) — ключ кешу в db._addr_street_names
+            source_url TEXT,
+            street TEXT,            -- назва без типу: 'перемоги'
+            label TEXT,             -- з типом: 'вулиця перемоги'
+            UNIQUE(source_url, street)
+        );
+        """
+    )
+    sources = [r[0] for r in cur.execute("SELECT DISTINCT source_url FROM addr_map").fetchall()]
+    for source_url in sources:
+        norms = cur.connection.execute("SELECT norm_address FROM addr_map WHERE source_url IS ?", (source_url,))
+        cur.executemany(
+            "INSERT OR IGNORE INTO addr_streets(source_url, street, label) VALUES (?, ?, ?)",
+            ((source_url, street, label) for street, label in street_names(n for (n,) in norms).items()),
+        )
+
+
+MIGRATIONS = (
+    _base_schema,
+    _users_hashed_address,
+    _users_lead_minutes,
+    _users_region,
+    _addr_fts,
+    _schedule_cache,
+    _users_delivery_index,
+    _users_digest,
+    _addr_streets,
+)
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+# ------------------------
+# Запуск
+# ------------------------
+def schema_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn) -> tuple[int, int]:
+    """
+    Застосовує кроки, яких ще не було (з'єднання в режимі autocommit, isolation_level=None).
+    Повертає (версія до, версія після). Якщо схема актуальна — один PRAGMA і все.
+    """
+    start = current = schema_version(conn)
+    if current > SCHEMA_VERSION:
+        logger.warning("Схема бази новіша (%s), ніж знає цей код (%s)", current, SCHEMA_VERSION)
+    while current < SCHEMA_VERSION:
+        conn.execute("BEGIN IMMEDIATE")
+        step = None
+        try:
+            # Інший процес (бот / CLI) міг застосувати крок, поки ми чекали на блокування
+            current = schema_version(conn)
+            if current < SCHEMA_VERSION:
+                step = MIGRATIONS[current]
+                step(conn.cursor())
+                current += 1
+                conn.execute(f"PRAGMA user_version = {current}")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        if step is not None:
+            logger.info("Міграція схеми: версія %s (%s)", current, step.__name__.lstrip("_"))
+    return start, current
+
+
+def ensure_addr_fts(conn) -> bool:
+    """
+    Створює addr_fts, якщо його немає, а SQLite вже підтримує FTS5 trigram (крок 5 пропустили
+    на старішій збірці, а версія схеми вже пішла далі). Для наявного індексу — один SELECT.
+    """
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name='addr_fts'").fetchone():
+        return True
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        created = _create_addr_fts(conn.cursor())
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    if created:
+        logger.info("Створено addr_fts: SQLite тепер підтримує FTS5 trigram")
+    return created
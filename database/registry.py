@@ -0,0 +1,141 @@
+# registry.py
+"""
+Реєстр користувачів у пам'яті: chat_id → запис і (регіон, підчерга) → множина chat_id.
+
+Завантажується з SQLite один раз при старті; save_user_hashed (async_db) пише
+в БД і одразу оновлює реєстр, тож get_user_by_chat / get_users_by_subgroup
+на гарячому шляху — це звичайні операції над dict/set без звернень до БД.
+
+Компактність: значення в словнику — спільні (інтерновані) кортежі
+(group_id, subgroup, verified, leads, region, digest); різних таких кортежів лише кілька десятків,
+тому на користувача припадає тільки запис у dict і (для verified) у set.
+Ключі в dict і в set — той самий об'єкт int, без дублювання.
+"""
+import logging
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+
+class UserRegistry:
+    def __init__(self):
+        self.loaded = False
+        self._users: dict[int, tuple] = {}
+        # Ключ — (регіон, підчерга); регіон None — регіон за замовчуванням
+        self._by_subgroup: dict[tuple, set[int]] = {}
+        self._profiles: dict[tuple, tuple] = {}
+
+    def _profile(self, group_id, subgroup, verified, leads=None, region=None, digest=None) -> tuple:
+        key = (group_id or None, subgroup or None, 1 if verified else 0, leads or None, region or None, digest or None)
+        return self._profiles.setdefault(key, key)
+
+    def load(self):
+        """Повне завантаження з таблиці users (потоково, без fetchall)."""
+        self._users.clear()
+        self._by_subgroup.clear()
+        cur = db.get_conn().execute(
+            "SELECT chat_id, group_id, subgroup, verified, lead_minutes, region, digest FROM users"
+        )
+        for chat_id, group_id, subgroup, verified, lead_minutes, region, digest in cur:
+            self._set(
+                chat_id, self._profile(group_id, subgroup, verified, db.parse_leads(lead_minutes), region, digest)
+            )
+        self.loaded = True
+        logger.info(
+            "Реєстр користувачів завантажено: %s користувачів, %s підчерг",
+            len(self._users), len(self._by_subgroup),
+        )
+
+    def _set(self, chat_id: int, prof: tuple):
+        old = self._users.get(chat_id)
+        if old is not None and old[2] and old[1]:
+            members = self._by_subgroup.get((old[4], old[1]))
+            if members is not None:
+                members.discard(chat_id)
+                if not members:
+                    del self._by_subgroup[(old[4], old[1])]
+        self._users[chat_id] = prof
+        if prof[2] and prof[1]:
+            self._by_subgroup.setdefault((prof[4], prof[1]), set()).add(chat_id)
+
+    def put(self, chat_id: int, group_id=None, subgroup=None, verified=0):
+        """Write-through після успішного запису в БД (налаштування користувача зберігаються)."""
+        old = self._users.get(chat_id)
+        leads, region, digest = (old[3], old[4], old[5]) if old is not None else (None, None, None)
+        self._set(chat_id, self._profile(group_id, subgroup, verified, leads, region, digest))
+
+    def set_leads(self, chat_id: int, leads):
+        old = self._users.get(chat_id)
+        if old is not None:
+            leads = tuple(sorted(set(leads), reverse=True)) if leads else None
+            self._set(chat_id, self._profile(old[0], old[1], old[2], leads, old[4], old[5]))
+
+    def set_region(self, chat_id: int, region):
+        old = self._users.get(chat_id)
+        if old is not None:
+            self._set(chat_id, self._profile(old[0], old[1], old[2], old[3], region, old[5]))
+
+    def set_digest(self, chat_id: int, mode):
+        old = self._users.get(chat_id)
+        if old is not None:
+            self._set(chat_id, self._profile(old[0], old[1], old[2], old[3], old[4], mode))
+
+    def get(self, chat_id: int) -> dict | None:
+        """Той самий формат, що й db.get_user_by_chat (без username/адрес)."""
+        prof = self._users.get(chat_id)
+        if prof is None:
+            return None
+        return {
+            "chat_id": chat_id,
+            "group_id": prof[0],
+            "subgroup": prof[1],
+            "verified": prof[2],
+            "lead_minutes": ",".join(map(str, prof[3])) if prof[3] else None,
+            "region": prof[4],
+            "digest": prof[5],
+        }
+
+    def chat_ids_by_subgroup(self, subgroup: str, region=None) -> list[int]:
+        """Verified-користувачі підчерги (копія — безпечно ітерувати під час розсилки)."""
+        return list(self._by_subgroup.get((region or None, subgroup), ()))
+
+    def warning_recipients(self, subgroup: str, lead: int, default_leads, region=None) -> tuple[list, list, list]:
+        """Те саме, що db.get_warning_recipients: (повне попередження, коротке нагадування, лише дайджест)."""
+        users = self._users
+        full, pings, digest_only = [], [], []
+        for cid in self._by_subgroup.get((region or None, subgroup), ()):
+            prof = users[cid]
+            if lead not in (prof[3] or default_leads):
+                continue
+            if not prof[5]:
+                full.append(cid)
+            elif prof[5] == db.DIGEST_PINGS:
+                pings.append(cid)
+            else:
+                digest_only.append(cid)
+        return full, pings, digest_only
+
+    def digest_users(self) -> dict[tuple, list[int]]:
+        """Те саме, що db.get_digest_users: {(регіон, підчерга): [chat_id]}."""
+        users = self._users
+        out = {}
+        for key, members in self._by_subgroup.items():
+            ids = [cid for cid in members if users[cid][5]]
+            if ids:
+                out[key] = ids
+        return out
+
+    def lead_set(self) -> set[int]:
+        """Усі індивідуальні lead-часи, які зараз хтось використовує."""
+        return {lead for prof in self._profiles.values() if prof[3] for lead in prof[3]}
+
+    def subgroups(self, region=None) -> list[str]:
+        return sorted(sg for r, sg in self._by_subgroup if r == (region or None))
+
+    def __len__(self):
+        return len(self._users)
+
+
+# Спільний екземпляр для бота
+REGISTRY = UserRegistry()
@@ -0,0 +1,323 @@
+# users_io.py
+"""
+Масовий експорт / імпорт таблиці users у CSV або JSONL (міграція, відновлення з копії).
+
+Пам'ять не залежить від розміру таблиці:
+- export читає курсором порціями (fetchmany) в одній транзакції читання —
+  в WAL це узгоджений знімок, бот тим часом може писати;
+- import читає файл рядок за рядком, перевіряє кожен запис і пише пачками
+  executemany; кілька пачок — одна транзакція (txn_rows рядків на коміт).
+
+Підчерга перевіряється format_subgroup (як у /register), group_id береться з неї.
+Некоректні рядки пропускаються, їх номери й причини — у stderr.
+Запис — UPSERT за chat_id, як save_user_hashed: повторний імпорт безпечний.
+
+Запуск з кореня репозиторію:
+    python -m database.users_io export users.csv
+    python -m database.users_io export - --format jsonl | gzip > users.jsonl.gz
+    python -m database.users_io import users.jsonl --dry-run
+    python -m database.users_io import users.csv --db /tmp/copy.db
+
+Бот тримає користувачів у реєстрі в пам'яті (database/registry.py), тож
+імпортовані записи він побачить після перезапуску.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+
+from database import db
+from schedule.subgroups import format_subgroup
+
+# Колонки, що переносяться (address не експортуємо — приватність, див. save_user_hashed)
+COLUMNS = (
+    "chat_id", "username", "hashed_address", "group_id", "subgroup", "verified", "lead_minutes", "region", "digest",
+)
+
+_UPSERT_SQL = """
+    INSERT INTO users(
+        chat_id, username, address, hashed_address, group_id, subgroup, verified, lead_minutes, region, digest
+    )
+    VALUES (?, ?, NULL, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(chat_id) DO UPDATE SET
+        username=excluded.username,
+        hashed_address=excluded.hashed_address,
+        group_id=excluded.group_id,
+        subgroup=excluded.subgroup,
+        verified=excluded.verified,
+        lead_minutes=excluded.lead_minutes,
+        region=excluded.region,
+        digest=excluded.digest
+"""
+
+_TRUE = {"1", "true", "yes", "y", "так"}
+_FALSE = {"0", "false", "no", "n", "ні"}
+
+# Скільки помилок валідації показувати поіменно
+_MAX_ERRORS_SHOWN = 20
+
+
+def _progress(msg: str):
+    print(msg, file=sys.stderr, flush=True)
+
+
+def _detect_format(path: str, fmt: str | None) -> str:
+    if fmt:
+        return fmt
+    suffix = Path(path).suffix.lower()
+    if suffix == ".csv":
+        return "csv"
+    if suffix in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise SystemExit(f"Не вдалося визначити формат з '{path}', вкажіть --format csv|jsonl")
+
+
+# ------------------------
+# Export
+# ------------------------
+def export_users(out, fmt: str, chunk: int = 5000, progress_every: int = 100_000) -> int:
+    """Пише всіх користувачів у out (текстовий файл). Повертає кількість рядків."""
+    conn = db.get_conn()
+    written = 0
+    t0 = time.perf_counter()
+    writer = csv.writer(out) if fmt == "csv" else None
+    if writer:
+        writer.writerow(COLUMNS)
+
+    # Одна транзакція читання — всі порції з одного знімка бази
+    conn.execute("BEGIN")
+    try:
+        # ORDER BY chat_id іде по первинному ключу — без сортування в пам'яті
+        cur = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM users ORDER BY chat_id")
+        next_report = progress_every
+        while rows := cur.fetchmany(chunk):
+            if writer:
+                writer.writerows(tuple("" if v is None else v for v in r) for r in rows)
+            else:
+                out.writelines(json.dumps(dict(zip(COLUMNS, r)), ensure_ascii=False) + "\n" for r in rows)
+            written += len(rows)
+            if written >= next_report:
+                _progress(f"export: {written} рядків, {written / (time.perf_counter() - t0):.0f} рядків/с")
+                next_report += progress_every
+    finally:
+        conn.execute("COMMIT")
+    return written
+
+
+# ------------------------
+# Import
+# ------------------------
+def _read_records(src, fmt: str):
+    """(номер рядка, dict) по одному запису; порожні значення CSV -> None."""
+    if fmt == "csv":
+        reader = csv.DictReader(src)
+        missing = {"chat_id", "subgroup"} - set(reader.fieldnames or ())
+        if missing:
+            raise SystemExit(f"CSV: немає обов'язкових колонок {sorted(missing)}")
+        for rec in reader:
+            yield reader.line_num, {k: (v if v != "" else None) for k, v in rec.items()}
+    else:
+        for line_no, line in enumerate(src, 1):
+            if not line.strip():
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError as e:
+                yield line_no, e
+                continue
+            yield line_no, rec
+
+
+def _to_bool(value, default: int) -> int:
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return int(value)
+    s = str(value).strip().lower()
+    if s in _TRUE:
+        return 1
+    if s in _FALSE:
+        return 0
+    raise ValueError(f"verified: очікується 0/1, отримано {value!r}")
+
+
+def validate_record(rec: dict) -> tuple:
+    """
+    dict з файлу -> кортеж параметрів для _UPSERT_SQL. ValueError, якщо запис некоректний.
+    verified за замовчуванням 1 — як у користувача, що зареєструвався через /register.
+    """
+    if not isinstance(rec, dict):
+        raise ValueError("запис не є об'єктом")
+    try:
+        chat_id = int(rec.get("chat_id"))
+    except (TypeError, ValueError):
+        raise ValueError(f"chat_id: очікується ціле число, отримано {rec.get('chat_id')!r}")
+
+    canonical = format_subgroup(str(rec.get("subgroup") or ""))
+    if canonical is None:
+        raise ValueError(f"subgroup: очікується формат X.Y, отримано {rec.get('subgroup')!r}")
+
+    try:
+        leads = db.parse_leads(rec.get("lead_minutes"))
+    except ValueError:
+        raise ValueError(f"lead_minutes: очікується список хвилин через кому, отримано {rec.get('lead_minutes')!r}")
+    # Ті самі межі, що й у /remind
+    if leads and (len(leads) > db.MAX_USER_LEADS or not all(1 <= x <= db.MAX_LEAD_MINUTES for x in leads)):
+        raise ValueError(
+            f"lead_minutes: до {db.MAX_USER_LEADS} значень від 1 до {db.MAX_LEAD_MINUTES}, "
+            f"отримано {rec.get('lead_minutes')!r}"
+        )
+
+    try:
+        digest = int(rec.get("digest") or 0)
+    except (TypeError, ValueError):
+        digest = None
+    if digest not in db.DIGEST_MODES:
+        raise ValueError(f"digest: очікується 0, 1 або 2, отримано {rec.get('digest')!r}")
+
+    username = rec.get("username")
+    hashed = rec.get("hashed_address")
+    region = str(rec.get("region") or "").strip().lower()
+    return (
+        chat_id,
+        str(username) if username is not None else None,
+        str(hashed) if hashed is not None else None,
+        canonical.split(".")[0],
+        canonical,
+        _to_bool(rec.get("verified"), 1),
+        ",".join(map(str, leads)) if leads else None,
+        region or None,
+        digest or None,
+    )
+
+
+@dataclass
+class ImportStats:
+    read: int = 0
+    imported: int = 0
+    rejected: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def rate(self) -> float:
+        return self.imported / max(1e-9, time.perf_counter() - self.started_at)
+
+
+def _valid_rows(records, stats: ImportStats):
+    for line_no, rec in records:
+        stats.read += 1
+        try:
+            if isinstance(rec, Exception):
+                raise ValueError(f"некоректний JSON: {rec}")
+            yield validate_record(rec)
+        except ValueError as e:
+            stats.rejected += 1
+            if stats.rejected <= _MAX_ERRORS_SHOWN:
+                _progress(f"рядок {line_no}: {e}")
+            elif stats.rejected == _MAX_ERRORS_SHOWN + 1:
+                _progress("... далі помилки не показуються, лише рахуються")
+
+
+def _chunks(rows, size: int):
+    it = iter(rows)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def import_users(src, fmt: str, chunk: int = 5000, txn_rows: int = 100_000, dry_run: bool = False) -> ImportStats:
+    """Читає src (текстовий файл) і пише користувачів пачками. Повертає статистику."""
+    stats = ImportStats()
+    chunks = _chunks(_valid_rows(_read_records(src, fmt), stats), chunk)
+    per_txn = max(1, txn_rows // chunk)
+
+    if dry_run:
+        for rows in chunks:
+            stats.imported += len(rows)
+        return stats
+
+    db.init_db()
+    while True:
+        done = 0
+        with db.transaction() as conn:
+            for rows in islice(chunks, per_txn):
+                conn.executemany(_UPSERT_SQL, rows)
+                stats.imported += len(rows)
+                done += 1
+        if done:
+            _progress(
+                f"import: {stats.imported} записано, {stats.rejected} відхилено, "
+                f"{stats.rate:.0f} рядків/с"
+            )
+        if done < per_txn:
+            return stats
+
+
+# ------------------------
+# CLI
+# ------------------------
+def _open(path: str, mode: str):
+    if path == "-":
+        return sys.stdout if "w" in mode else sys.stdin
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db", help=f"шлях до бази (за замовчуванням {db.DB_PATH})")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    ex = sub.add_parser("export", help="users -> CSV/JSONL")
+    ex.add_argument("path", help="файл або '-' для stdout")
+    ex.add_argument("--format", choices=("csv", "jsonl"))
+    ex.add_argument("--chunk", type=int, default=5000, help="рядків на fetchmany")
+
+    im = sub.add_parser("import", help="CSV/JSONL -> users (UPSERT за chat_id)")
+    im.add_argument("path", help="файл або '-' для stdin")
+    im.add_argument("--format", choices=("csv", "jsonl"))
+    im.add_argument("--chunk", type=int, default=5000, help="рядків на executemany")
+    im.add_argument("--txn-rows", type=int, default=100_000, help="рядків на транзакцію (коміт)")
+    im.add_argument("--dry-run", action="store_true", help="лише перевірити файл, нічого не писати")
+
+    args = ap.parse_args(argv)
+    if args.db:
+        db.DB_PATH = Path(args.db)
+    fmt = _detect_format(args.path, args.format)
+
+    t0 = time.perf_counter()
+    try:
+        if args.cmd == "export":
+            if not db.DB_PATH.exists():
+                raise SystemExit(f"Бази {db.DB_PATH} не існує")
+            db.init_db()  # стара база — спершу міграції схеми (колонки region тощо)
+            out = _open(args.path, "w")
+            try:
+                n = export_users(out, fmt, chunk=args.chunk)
+            finally:
+                if out is not sys.stdout:
+                    out.close()
+            elapsed = time.perf_counter() - t0
+            _progress(f"Експортовано {n} користувачів за {elapsed:.1f}s ({n / max(elapsed, 1e-9):.0f} рядків/с)")
+            return 0
+
+        src = _open(args.path, "r")
+        try:
+            stats = import_users(src, fmt, chunk=args.chunk, txn_rows=args.txn_rows, dry_run=args.dry_run)
+        finally:
+            if src is not sys.stdin:
+                src.close()
+        verb = "Перевірено" if args.dry_run else "Імпортовано"
+        _progress(
+            f"{verb} {stats.imported} з {stats.read} записів, відхилено {stats.rejected}, "
+            f"{time.perf_counter() - t0:.1f}s ({stats.rate:.0f} рядків/с)"
+        )
+        return 1 if stats.rejected else 0
+    finally:
+        db.close_conn()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,408 @@
+# driver.py
+"""
+Навантажувальний драйвер: справжній Application з bot.build_application() проти
+фейкового Bot API (loadtest/fake_api.py) і записаних / синтетичних сторінок ZOE.
+
+Що робить:
+1. створює тимчасову zap_bot.db з --users користувачами (робочу БД не чіпає);
+2. піднімає фейковий Bot API із заданими затримкою, лімітом 429 і часткою 403;
+3. подає --updates оновлень (/next, /register X.Y, callback-кнопки) одним зі
+   способів --mode: direct (app.process_update, паралельність --concurrency),
+   polling (через getUpdates фейкового API) або webhook (POST у web/webhook.py);
+   затримка — від подачі оновлення до завершення обробників;
+4. опційно (--broadcast) проганяє check_and_notify: для синтетичної сторінки —
+   один прохід «всім підчергам скоро відключення», для --replay — по кроку
+   на кожну записану відповідь ZOE (відтворення дня);
+5. друкує пропускну здатність, p50/p99 і помилки, за --out пише JSON.
+
+Приклади:
+    python -m loadtest.driver --users 20000 --updates 5000 --concurrency 200
+    python -m loadtest.driver --mode polling --rps 300 && python -m loadtest.driver --mode webhook --rps 300
+    python -m loadtest.driver --replay recordings/2024-11-28 --broadcast --blocked 0.03
+Записати день з живого сайту: запустити бота з ZOE_RECORD_DIR=recordings/<дата>.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+from telegram import Update
+from telegram.ext import TypeHandler
+
+from bench.run import FakeFetcher, _due_page, make_db
+from database import async_db, db
+from loadtest.fake_api import FakeBotAPI
+from web.server import HttpServer
+from web.webhook import SECRET_HEADER, WebhookIntake
+
+logger = logging.getLogger("loadtest")
+
+FAKE_TOKEN = "123456:LOADTEST"
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    i = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[i]
+
+
+def _latency_report(lat: list[float]) -> dict:
+    lat = sorted(lat)
+    return {
+        "count": len(lat),
+        "p50_ms": _percentile(lat, 0.50) * 1e3,
+        "p90_ms": _percentile(lat, 0.90) * 1e3,
+        "p99_ms": _percentile(lat, 0.99) * 1e3,
+        "max_ms": (lat[-1] if lat else 0.0) * 1e3,
+    }
+
+
+# ------------------------
+# Генерація оновлень
+# ------------------------
+class UpdateFactory:
+    def __init__(self, bot, registered: list[int], seed: int = 0, groups: int = 6, subgroups: int = 2):
+        self.bot = bot
+        self.registered = registered
+        self.rnd = random.Random(seed)
+        self.groups = groups
+        self.subgroups = subgroups
+        self._update_id = 0
+        self._new_chat = 900_000_000
+
+    def _user(self, chat_id: int) -> dict:
+        return {"id": chat_id, "is_bot": False, "first_name": "Load", "username": f"u{chat_id}"}
+
+    def _message(self, chat_id: int, text: str, from_bot: bool = False) -> dict:
+        msg = {
+            "message_id": self._update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": 1, "is_bot": True, "first_name": "Fake"} if from_bot else self._user(chat_id),
+            "text": text,
+        }
+        if text.startswith("/"):
+            msg["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return msg
+
+    def _wrap(self, payload: dict) -> dict:
+        self._update_id += 1
+        return {"update_id": self._update_id, **payload}
+
+    def command(self, chat_id: int, text: str) -> dict:
+        return self._wrap({"message": self._message(chat_id, text)})
+
+    def callback(self, chat_id: int, data: str) -> dict:
+        return self._wrap({"callback_query": {
+            "id": str(self._update_id),
+            "from": self._user(chat_id),
+            "chat_instance": str(chat_id),
+            "data": data,
+            "message": self._message(chat_id, "menu", from_bot=True),
+        }})
+
+    def make(self, kind: str) -> dict:
+        """Сире оновлення (JSON, як його надсилає Telegram)."""
+        if kind == "next":
+            return self.command(self.rnd.choice(self.registered), "/next")
+        if kind == "register":
+            # Нові користувачі — справжній запис у БД і реєстр
+            self._new_chat += 1
+            sg = f"{self.rnd.randint(1, self.groups)}.{self.rnd.randint(1, self.subgroups)}"
+            return self.command(self._new_chat, f"/register {sg}")
+        if kind == "callback":
+            data = self.rnd.choice(("menu_next", "menu_getgroup"))
+            return self.callback(self.rnd.choice(self.registered), data)
+        raise ValueError(f"Невідомий тип оновлення: {kind}")
+
+
+def _parse_mix(mix: str) -> tuple[list[str], list[float]]:
+    kinds, weights = [], []
+    for part in mix.split(","):
+        kind, _, w = part.partition("=")
+        kinds.append(kind.strip())
+        weights.append(float(w or 1))
+    return kinds, weights
+
+
+# ------------------------
+# Фази
+# ------------------------
+class CompletionTracker:
+    """
+    Час від подачі оновлення до завершення його обробки: TypeHandler у групі 1
+    спрацьовує після обробників групи 0 (і після їх помилок) — однаково для всіх режимів.
+    """
+
+    def __init__(self):
+        self.pending: dict[int, tuple[str, float]] = {}
+        self.latency: dict[str, list[float]] = defaultdict(list)
+        self.remaining = 0
+        self.last_done = 0.0
+        self._done = asyncio.Event()
+
+    def expect(self, n: int):
+        self.remaining = n
+        self._done.clear()
+
+    def submit(self, update_id: int, kind: str):
+        self.pending[update_id] = (kind, time.perf_counter())
+
+    async def on_update(self, update: Update, context):
+        item = self.pending.pop(update.update_id, None)
+        if item is None:
+            return
+        kind, t = item
+        self.last_done = time.perf_counter()
+        self.latency[kind].append(self.last_done - t)
+        self.remaining -= 1
+        if self.remaining <= 0:
+            self._done.set()
+
+    async def wait(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+async def _paced(items, rps: float):
+    """Ітерує items з темпом rps на секунду (0 — все одразу)."""
+    start = time.perf_counter()
+    for i, item in enumerate(items):
+        if rps > 0:
+            delay = start + i / rps - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        yield item
+
+
+async def run_updates(app, factory: UpdateFactory, tracker: CompletionTracker, args, api: FakeBotAPI) -> dict:
+    kinds, weights = _parse_mix(args.mix)
+    plan = factory.rnd.choices(kinds, weights, k=args.updates)
+    raws = [(kind, factory.make(kind)) for kind in plan]
+    tracker.expect(len(raws))
+    tasks = []
+    cleanup = []
+
+    if args.mode == "polling":
+        await app.start()
+        await app.updater.start_polling(poll_interval=0, timeout=10)
+        cleanup += [app.updater.stop, app.stop]
+    elif args.mode == "webhook":
+        secret = "loadtest-secret"
+        intake = WebhookIntake(app, secret, queue_size=max(1000, args.updates), workers=args.concurrency)
+        intake.start()
+        server = await HttpServer(intake.handle).start()
+        client = httpx.AsyncClient(
+            base_url=server.url,
+            headers={SECRET_HEADER: secret},
+            limits=httpx.Limits(max_connections=100),
+        )
+        cleanup += [client.aclose, lambda: intake.drain(10), server.stop]
+
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def direct(kind, raw):
+        async with sem:
+            tracker.submit(raw["update_id"], kind)
+            await app.process_update(Update.de_json(raw, app.bot))
+
+    async def post(kind, raw):
+        tracker.submit(raw["update_id"], kind)
+        resp = await client.post("/telegram", json=raw)
+        if resp.status_code != 200:
+            tracker.pending.pop(raw["update_id"], None)
+            tracker.remaining -= 1
+            logger.warning("Webhook відповів %s", resp.status_code)
+
+    t0 = time.perf_counter()
+    async for kind, raw in _paced(raws, args.rps):
+        if args.mode == "direct":
+            tasks.append(asyncio.create_task(direct(kind, raw)))
+        elif args.mode == "polling":
+            tracker.submit(raw["update_id"], kind)
+            api.push_update(raw)
+        else:
+            tasks.append(asyncio.create_task(post(kind, raw)))
+    await asyncio.gather(*tasks)
+    completed = await tracker.wait(timeout=300)
+    wall = (tracker.last_done or time.perf_counter()) - t0
+    for fn in cleanup:
+        await fn()
+
+    all_lat = [x for v in tracker.latency.values() for x in v]
+    return {
+        "mode": args.mode,
+        "updates": args.updates,
+        "completed": len(all_lat),
+        "timed_out": not completed,
+        "concurrency": args.concurrency,
+        "rps": args.rps,
+        "wall_sec": wall,
+        "updates_per_sec": len(all_lat) / wall if wall else None,
+        "latency": _latency_report(all_lat),
+        "by_kind": {k: _latency_report(v) for k, v in tracker.latency.items()},
+    }
+
+
+async def run_broadcast(app, steps: int) -> dict:
+    import bot
+
+    results = []
+    for step in range(steps):
+        t = time.perf_counter()
+        entry = await bot.check_and_notify(app)
+        await bot.SCHEDULER.drain()  # попередження розсилаються окремими задачами
+        results.append({
+            "step": step,
+            "sec": time.perf_counter() - t,
+            "version": entry.version if entry else None,
+            "recorded_at": getattr(bot.SCHEDULE_CACHE.fetcher, "recorded_at", None),
+        })
+    return {"steps": results}
+
+
+async def main_async(args) -> dict:
+    import bot
+    from database.ledger import LEDGER
+    from database.registry import REGISTRY
+    from schedule.recorder import ReplayFetcher
+
+    tmp = Path(tempfile.mkdtemp(prefix="zap_loadtest_"))
+    t = time.perf_counter()
+    make_db(tmp / "zap_bot.db", args.users)
+    REGISTRY.load()
+    LEDGER.load()
+    logger.info("БД на %s користувачів: %.1fs", args.users, time.perf_counter() - t)
+
+    if args.replay:
+        fetcher = ReplayFetcher(args.replay)
+        if bot.SCHEDULE_CACHE.url not in fetcher.urls:
+            bot.SCHEDULE_CACHE.url = bot.ZOE_LIST_URL = fetcher.urls[0]
+        steps = fetcher.steps(bot.SCHEDULE_CACHE.url)
+    else:
+        fetcher = FakeFetcher(_due_page(datetime.now(bot.TZ)))
+        steps = 1
+    bot.SCHEDULE_CACHE.fetcher = fetcher
+
+    api = await FakeBotAPI(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate=args.rate,
+        p429=args.p429,
+        blocked=args.blocked,
+        seed=args.seed,
+    ).start()
+
+    errors: Counter = Counter()
+
+    async def on_error(update, context):
+        errors[type(context.error).__name__] += 1
+
+    app = bot.build_application(
+        FAKE_TOKEN,
+        base_url=api.base_url,
+        connection_pool_size=args.pool,
+        concurrent_updates=args.concurrency,
+    )
+    app.add_error_handler(on_error)
+    tracker = CompletionTracker()
+    app.add_handler(TypeHandler(Update, tracker.on_update), group=1)
+    report: dict = {"users": args.users}
+    try:
+        await app.initialize()
+        registered = [r[0] for r in db.get_conn().execute("SELECT chat_id FROM users LIMIT 100000")]
+        factory = UpdateFactory(app.bot, registered, seed=args.seed)
+
+        # Прогрів: кеш сторінки і з'єднання до фейкового API
+        await bot.SCHEDULE_CACHE.refresh()
+        report["updates"] = await run_updates(app, factory, tracker, args, api)
+        report["update_errors"] = dict(errors)
+
+        if args.broadcast:
+            if args.replay:
+                fetcher.rewind()
+            bot._notify_state.update(version=0, snapshot=None)
+            t = time.perf_counter()
+            sent_before = api.calls["sendMessage"]
+            report["broadcast"] = await run_broadcast(app, steps)
+            wall = time.perf_counter() - t
+            sends = api.calls["sendMessage"] - sent_before
+            report["broadcast"].update(wall_sec=wall, send_calls=sends, send_calls_per_sec=sends / wall if wall else None)
+        report["api"] = api.stats()
+    finally:
+        await app.shutdown()
+        await api.stop()
+        await asyncio.to_thread(async_db.stop)
+        db.close_conn()
+        shutil.rmtree(tmp, ignore_errors=True)
+    return report
+
+
+def _print(report: dict):
+    u = report["updates"]
+    print(
+        f"Оновлень ({u['mode']}): {u['completed']}/{u['updates']} за {u['wall_sec']:.2f}s -> "
+        f"{u['updates_per_sec']:.0f}/s (паралельно {u['concurrency']}, темп {u['rps'] or 'без обмеження'})"
+    )
+    lat = u["latency"]
+    print(f"  усі        p50 {lat['p50_ms']:8.1f} ms   p99 {lat['p99_ms']:8.1f} ms   max {lat['max_ms']:8.1f} ms")
+    for kind, r in u["by_kind"].items():
+        print(f"  {kind:<10} p50 {r['p50_ms']:8.1f} ms   p99 {r['p99_ms']:8.1f} ms   n={r['count']}")
+    if report.get("update_errors"):
+        print(f"  помилки обробників: {report['update_errors']}")
+    if "broadcast" in report:
+        b = report["broadcast"]
+        print(
+            f"Розсилка: {len(b['steps'])} крок(ів), {b['send_calls']} викликів sendMessage за "
+            f"{b['wall_sec']:.1f}s ({b['send_calls_per_sec'] or 0:.1f}/s)"
+        )
+    print(f"API: {report['api']}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=10000, help="користувачів у синтетичній БД")
+    ap.add_argument("--updates", type=int, default=2000)
+    ap.add_argument("--mode", choices=("direct", "polling", "webhook"), default="direct")
+    ap.add_argument("--concurrency", type=int, default=200, help="одночасних оновлень у обробці")
+    ap.add_argument("--rps", type=float, default=0, help="темп подачі оновлень за секунду (0 — усі одразу)")
+    ap.add_argument("--pool", type=int, default=256, help="розмір пулу з'єднань PTB до Bot API")
+    ap.add_argument("--mix", default="next=6,register=2,callback=2", help="типи оновлень і їх ваги")
+    ap.add_argument("--replay", default=None, help="папка з записом ZOE (schedule/recorder.py)")
+    ap.add_argument("--broadcast", action="store_true", help="також прогнати check_and_notify")
+    ap.add_argument("--latency-ms", type=float, default=30)
+    ap.add_argument("--jitter-ms", type=float, default=20)
+    ap.add_argument("--rate", type=float, default=30, help="ліміт фейкового API, повідомлень/с")
+    ap.add_argument("--p429", type=float, default=0.0)
+    ap.add_argument("--blocked", type=float, default=0.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=None, help="JSON зі звітом")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+    report = asyncio.run(main_async(args))
+    _print(report)
+    if args.out:
+        out = Path(args.out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+# fake_api.py
+"""
+Локальний замінник Telegram Bot API для навантажувальних тестів.
+
+Розуміє запити python-telegram-bot (POST /bot<token>/<method>, form-urlencoded,
+значення — JSON) і відповідає як справжній API. Імітує:
+- затримку відповіді (latency + рівномірний jitter);
+- глобальний ліміт на повідомлення/с: понад нього — 429 з retry_after,
+  плюс випадкові 429 з ймовірністю p429;
+- заблокованих користувачів: детерміновано за chat_id, частка blocked — 403.
+getUpdates — long polling по черзі, яку наповнює push_update() (для порівняння з webhook).
+
+Окремо:
+    python -m loadtest.fake_api --port 8081 --latency-ms 40 --rate 30 --blocked 0.02
+і бот: build_application(token, base_url="http://127.0.0.1:8081/bot").
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+import zlib
+from collections import Counter, deque
+from itertools import islice
+
+from web.server import HttpServer, Request, Response
+
+logger = logging.getLogger(__name__)
+
+# Методи, що відправляють повідомлення і підпадають під ліміт
+_SEND_METHODS = {"sendMessage", "editMessageText", "sendPhoto", "sendDocument"}
+
+
+class FakeBotAPI:
+    def __init__(
+        self,
+        latency_ms: float = 30,
+        jitter_ms: float = 20,
+        rate: float = 30,
+        p429: float = 0.0,
+        blocked: float = 0.0,
+        retry_after: int = 1,
+        seed: int = 0,
+    ):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.rate = rate
+        self.p429 = p429
+        self.blocked = blocked
+        self.retry_after = retry_after
+        self._rnd = random.Random(seed)
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._message_id = 0
+        self._updates: deque = deque()
+        self._has_updates = asyncio.Event()
+        self.calls: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.server = HttpServer(self.handle)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> "FakeBotAPI":
+        self.server.host, self.server.port = host, port
+        await self.server.start()
+        return self
+
+    async def stop(self):
+        await self.server.stop()
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.server.url}/bot"
+
+    def is_blocked(self, chat_id: int) -> bool:
+        # crc32 — стабільно між запусками (hash() рандомізується)
+        return self.blocked > 0 and zlib.crc32(str(chat_id).encode()) % 10_000 < self.blocked * 10_000
+
+    def push_update(self, update: dict):
+        """Оновлення, яке бот отримає наступним getUpdates."""
+        self._updates.append(update)
+        self._has_updates.set()
+
+    async def _get_updates(self, params: dict) -> list[dict]:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        # offset підтверджує все, що менше за нього
+        while self._updates and self._updates[0]["update_id"] < offset:
+            self._updates.popleft()
+        if not self._updates and timeout > 0:
+            self._has_updates.clear()
+            try:
+                await asyncio.wait_for(self._has_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return list(islice(self._updates, limit))
+
+    def _over_rate(self) -> bool:
+        """Ліміт у вікні 1 с, як у Telegram (~30 повідомлень/с на бота)."""
+        if not self.rate:
+            return False
+        now = time.monotonic()
+        if now - self._window_start >= 1:
+            self._window_start, self._window_count = now, 0
+        self._window_count += 1
+        return self._window_count > self.rate
+
+    async def handle(self, req: Request) -> Response:
+        parts = req.path.strip("/").split("/")
+        if len(parts) != 2 or not parts[0].startswith("bot"):
+            return Response.json({"ok": False, "error_code": 404, "description": "Not Found"}, 404)
+        method = parts[1]
+        params = {k: _decode(v) for k, v in req.form().items()}
+        self.calls[method] += 1
+
+        await asyncio.sleep(max(0.0, self.latency + self._rnd.uniform(-self.jitter, self.jitter)))
+
+        if method in _SEND_METHODS:
+            if self._over_rate() or (self.p429 and self._rnd.random() < self.p429):
+                self.errors[429] += 1
+                return Response.json({
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                }, 429)
+            if self.is_blocked(params.get("chat_id")):
+                self.errors[403] += 1
+                return Response.json({
+                    "ok": False,
+                    "error_code": 403,
+                    "description": "Forbidden: bot was blocked by the user",
+                }, 403)
+
+        if method == "getUpdates":
+            return Response.json({"ok": True, "result": await self._get_updates(params)})
+
+        result = self._result(method, params)
+        if result is None:
+            return Response.json({"ok": False, "error_code": 404, "description": "Not Found: method not found"}, 404)
+        return Response.json({"ok": True, "result": result})
+
+    def _result(self, method: str, params: dict):
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_zap_bot"}
+        if method in ("sendMessage", "editMessageText"):
+            self._message_id += 1
+            return {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": params.get("chat_id"), "type": "private"},
+                "text": params.get("text", ""),
+            }
+        if method in ("answerCallbackQuery", "deleteWebhook", "setWebhook", "setMyCommands"):
+            return True
+        return None
+
+    def stats(self) -> dict:
+        return {"calls": dict(self.calls), "errors": {str(k): v for k, v in self.errors.items()}}
+
+
+def _decode(value: str):
+    """PTB кодує не-рядкові значення як JSON, рядки — як є."""
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+async def _serve(args):
+    api = await FakeBotAPI(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate=args.rate,
+        p429=args.p429,
+        blocked=args.blocked,
+    ).start(args.host, args.port)
+    print(f"Fake Bot API: {api.base_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await api.stop()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8081)
+    ap.add_argument("--latency-ms", type=float, default=30)
+    ap.add_argument("--jitter-ms", type=float, default=20)
+    ap.add_argument("--rate", type=float, default=30, help="повідомлень/с до 429 (0 — без ліміту)")
+    ap.add_argument("--p429", type=float, default=0.0, help="ймовірність випадкового 429")
+    ap.add_argument("--blocked", type=float, default=0.0, help="частка користувачів, що заблокували бота")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+# endpoint.py
+"""
+HTTP-ендпоінт /metrics для Prometheus. Вмикається лише якщо задано METRICS_PORT;
+за замовчуванням слухає 127.0.0.1, назовні не відкриваємо.
+"""
+import logging
+
+from monitoring import metrics
+from web.server import HttpServer, Request, Response
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+async def _handle(req: Request) -> Response:
+    if req.method != "GET":
+        return Response(405)
+    if req.path == "/metrics":
+        return Response.text(metrics.render(), content_type=CONTENT_TYPE)
+    if req.path == "/healthz":
+        return Response.text("ok\n")
+    return Response(404)
+
+
+async def start_metrics_server(host: str, port: int) -> HttpServer:
+    server = await HttpServer(_handle, host, port).start()
+    logger.info("Метрики: http://%s:%s/metrics", host, server.port)
+    return server
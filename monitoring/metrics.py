@@ -0,0 +1,234 @@
+# metrics.py
+"""
+Легкі метрики у текстовому форматі Prometheus (без prometheus_client).
+
+Запис — це кілька операцій над списком/числом без блокувань: під GIL
+інкременти з потоків БД можуть зрідка загубити одиницю, для метрик це прийнятно.
+Дочірні серії за мітками кешуються, тож на гарячому шляху — лише пошук у dict.
+
+Віддача назовні — monitoring/endpoint.py (вмикається METRICS_PORT).
+"""
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable
+
+# Межі за замовчуванням, секунди: від 1 мс до 30 с
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_METRICS: list["_Metric"] = []
+
+
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+        # Кеш пошуку за «сирими» значеннями (int, None...) — без str() на гарячому шляху
+        self._lookup: dict[tuple, object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        _METRICS.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Серія з заданими значеннями міток (позиційно, у порядку labelnames)."""
+        child = self._lookup.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: очікуються мітки {self.labelnames}")
+            key = tuple(str(v) for v in values)
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+            self._lookup[values] = child
+        return child
+
+    def _label_str(self, values: tuple, extra: str = "") -> str:
+        parts = [f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, values)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values, child) -> list[str]:
+        raise NotImplementedError
+
+
+class _Value:
+    __slots__ = ("value", "fn")
+
+    def __init__(self):
+        self.value = 0.0
+        self.fn: Callable[[], float] | None = None
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, fn: Callable[[], float]):
+        """Значення обчислюється в момент віддачі метрик (наприклад, вік даних)."""
+        self.fn = fn
+
+    def get(self) -> float:
+        if self.fn is not None:
+            try:
+                return float(self.fn())
+            except Exception:
+                return float("nan")
+        return self.value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1):
+        self._children[()].value += amount
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{self._label_str(values)} {_fmt(child.get())}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float):
+        self._children[()].value = value
+
+    def set_function(self, fn: Callable[[], float]):
+        self._children[()].fn = fn
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+    def time(self):
+        return self._children[()].time()
+
+    def _render_child(self, values, child):
+        lines = []
+        acc = 0
+        for bound, n in zip(self.buckets + (float("inf"),), child.counts):
+            acc += n
+            le = 'le="%s"' % _fmt(bound)
+            lines.append(f"{self.name}_bucket{self._label_str(values, le)} {acc}")
+        lines.append(f"{self.name}_sum{self._label_str(values)} {_fmt(child.sum)}")
+        lines.append(f"{self.name}_count{self._label_str(values)} {child.count}")
+        return lines
+
+
+def render() -> str:
+    """Усі зареєстровані метрики у форматі Prometheus text 0.0.4."""
+    lines = []
+    for m in _METRICS:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+# ------------------------
+# Метрики бота
+# ------------------------
+ZOE_FETCH_SECONDS = Histogram(
+    "zap_zoe_fetch_seconds", "Тривалість запиту сторінки ZOE", ("status",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 15, 30),
+)
+ZOE_FETCH_BYTES = Histogram(
+    "zap_zoe_fetch_bytes", "Розмір тіла відповіді ZOE",
+    buckets=(0, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6),
+)
+ZOE_FETCH_ERRORS = Counter("zap_zoe_fetch_errors_total", "Невдалі оновлення сторінки ZOE")
+PARSE_SECONDS = Histogram("zap_parse_seconds", "Розбір сторінки ZOE у знімок")
+SNAPSHOT_INTERVALS = Histogram(
+    "zap_snapshot_intervals", "Кількість інтервалів у знімку",
+    buckets=(0, 10, 25, 50, 100, 200, 500, 1000),
+)
+SCHEDULE_AGE_SECONDS = Gauge("zap_schedule_age_seconds", "Вік поточних даних графіка (з останньої ревалідації)")
+SCHEDULE_VERSION = Gauge("zap_schedule_version", "Версія вмісту сторінки ZOE в кеші")
+
+DB_QUERY_SECONDS = Histogram(
+    "zap_db_query_seconds", "Тривалість функцій database/db.py", ("query",),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1, 5),
+)
+
+HANDLER_SECONDS = Histogram("zap_handler_seconds", "Тривалість обробки команди / callback", ("handler",))
+HANDLER_ERRORS = Counter("zap_handler_errors_total", "Винятки в обробниках", ("handler",))
+
+SEND_TOTAL = Counter("zap_send_total", "Результати send_message у розсилках", ("result",))
+SEND_RETRIES = Counter("zap_send_retries_total", "Повтори send_message", ("reason",))
+SEND_SECONDS = Histogram("zap_send_seconds", "Тривалість одного send_message (без очікування лімітів)")
+BROADCAST_SECONDS = Histogram(
+    "zap_broadcast_seconds", "Тривалість однієї розсилки",
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+BROADCAST_RATE = Gauge("zap_broadcast_messages_per_second", "Пропускна здатність останньої розсилки")
+NOTIFY_RECIPIENTS = Counter(
+    "zap_notify_recipients_total", "Отримувачі сповіщень за типом (warning, ping, digest, change)", ("kind",)
+)
+NOTIFY_DIGEST_SKIPPED = Counter(
+    "zap_notify_digest_skipped_total", "Окремі попередження, не надіслані користувачам у режимі дайджесту"
+)
+
+WEBHOOK_QUEUE_DEPTH = Gauge("zap_webhook_queue_depth", "Оновлення в черзі webhook")
+WEBHOOK_QUEUE_WAIT = Histogram("zap_webhook_queue_wait_seconds", "Час оновлення в черзі webhook до обробки")
+WEBHOOK_REJECTED = Counter("zap_webhook_rejected_total", "Відхилені webhook-запити", ("reason",))
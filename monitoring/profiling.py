@@ -0,0 +1,134 @@
+# profiling.py
+"""
+Вибіркове профілювання в продакшені (вмикається змінними оточення, див. bot.py).
+
+- Profiler.call(name, fn, *args): з імовірністю sample_rate виконує корутину під
+  cProfile, пише .prof у папку (старі файли ротуються) і логує top-N функцій.
+  Одночасно профілюється лише один виклик: cProfile глобальний на потік, і в
+  профіль потрапляє все, що event loop виконував за цей час (включно з іншими
+  корутинами). Роботу в asyncio.to_thread (парсинг, БД) cProfile не бачить.
+- tracemalloc_loop(): раз на interval секунд знімок tracemalloc, у лог — top-N
+  рядків за приростом пам'яті з попереднього знімка, знімок — у файл.
+
+.prof відкривається через `python -m pstats file.prof` або snakeviz.
+"""
+import asyncio
+import cProfile
+import io
+import logging
+import pstats
+import random
+import re
+import time
+import tracemalloc
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+_unsafe_re = re.compile(r"[^\w.-]+")
+
+
+def _rotate(directory: Path, pattern: str, keep: int):
+    files = sorted(directory.glob(pattern), key=lambda p: p.stat().st_mtime)
+    for old in files[:-keep] if keep > 0 else files:
+        try:
+            old.unlink()
+        except OSError:
+            pass
+
+
+class Profiler:
+    def __init__(
+        self,
+        sample_rate: float = 0.0,
+        directory: str | Path = "profiles",
+        top_n: int = 15,
+        max_files: int = 50,
+        min_ms: float = 0.0,
+    ):
+        self.sample_rate = sample_rate
+        self.dir = Path(directory)
+        self.top_n = top_n
+        self.max_files = max_files
+        self.min_ms = min_ms
+        self._active = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    async def call(self, name: str, fn, *args, sample_rate: float | None = None, **kwargs):
+        """await fn(*args, **kwargs), з імовірністю sample_rate — під cProfile."""
+        rate = self.sample_rate if sample_rate is None else sample_rate
+        if rate <= 0 or self._active or random.random() >= rate:
+            return await fn(*args, **kwargs)
+
+        self._active = True
+        prof = cProfile.Profile()
+        t = time.perf_counter()
+        prof.enable()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            prof.disable()
+            self._active = False
+            elapsed_ms = (time.perf_counter() - t) * 1e3
+            if elapsed_ms >= self.min_ms:
+                try:
+                    self._dump(name, prof, elapsed_ms)
+                except Exception as e:
+                    logger.warning("Не вдалося зберегти профіль %s: %s", name, e)
+
+    def _dump(self, name: str, prof: cProfile.Profile, elapsed_ms: float):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        safe = _unsafe_re.sub("_", name)
+        path = self.dir / f"{time.strftime('%Y%m%d-%H%M%S')}_{int(time.time() * 1e3) % 1000:03d}_{safe}.prof"
+        prof.dump_stats(str(path))
+        _rotate(self.dir, "*.prof", self.max_files)
+
+        out = io.StringIO()
+        stats = pstats.Stats(prof, stream=out)
+        stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top_n)
+        # Порожні рядки звіту pstats у лог не тягнемо
+        summary = "\n".join(line for line in out.getvalue().splitlines() if line.strip())
+        logger.info("Профіль %s: %.1f ms -> %s\n%s", name, elapsed_ms, path.name, summary)
+
+
+async def tracemalloc_loop(
+    interval: float,
+    directory: str | Path = "profiles",
+    top_n: int = 15,
+    frames: int = 1,
+    max_files: int = 24,
+):
+    """Періодичні знімки tracemalloc з різницею до попереднього в лозі."""
+    directory = Path(directory)
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    logger.info("tracemalloc увімкнено: знімок кожні %gs", interval)
+    prev = None
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            snap = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            ))
+            current, peak = tracemalloc.get_traced_memory()
+            if prev is None:
+                top = snap.statistics("lineno")[:top_n]
+                title = "top за розміром"
+            else:
+                top = snap.compare_to(prev, "lineno")[:top_n]
+                title = "top за приростом"
+            lines = "\n".join(f"  {stat}" for stat in top)
+            logger.info(
+                "tracemalloc: зараз %.1f MiB, пік %.1f MiB, %s:\n%s",
+                current / 2**20, peak / 2**20, title, lines,
+            )
+            directory.mkdir(parents=True, exist_ok=True)
+            await asyncio.to_thread(snap.dump, str(directory / f"{time.strftime('%Y%m%d-%H%M%S')}.tracemalloc"))
+            _rotate(directory, "*.tracemalloc", max_files)
+            prev = snap
+        except Exception as e:
+            logger.exception("tracemalloc_loop error: %s", e)
@@ -0,0 +1,197 @@
+# broadcast.py
+"""
+Розсилка одного повідомлення багатьом чатам з дотриманням лімітів Telegram.
+
+- обмежений пул воркерів (asyncio), а не послідовний await на кожен чат;
+- глобальний token bucket (~30 повідомлень/с на бота);
+- ліміт на чат (не частіше ніж раз на per_chat_interval секунд);
+- RetryAfter пригальмовує всю розсилку на вказаний Telegram час і повторює запит;
+- мережеві помилки повторюються з експоненційною затримкою;
+- Forbidden (користувач заблокував бота) / BadRequest — без повторів.
+"""
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+from monitoring.metrics import BROADCAST_RATE, BROADCAST_SECONDS, SEND_RETRIES, SEND_SECONDS, SEND_TOTAL
+
+logger = logging.getLogger(__name__)
+
+# Серії метрик наперед — на кожну відправку лише інкремент
+_SENT = SEND_TOTAL.labels("sent")
+_FAILED = SEND_TOTAL.labels("failed")
+_BLOCKED = SEND_TOTAL.labels("blocked")
+_RETRY_AFTER = SEND_RETRIES.labels("retry_after")
+_RETRY_NETWORK = SEND_RETRIES.labels("network")
+
+
+class TokenBucket:
+    """Асинхронний token bucket: rate токенів/с, не більше capacity за раз."""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Повна пауза (RetryAfter): жоден токен не видається до закінчення."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+        # Поповнення — лише з кінця паузи: інакше acquire() зарахує всю паузу і видасть capacity разом
+        self._updated = self._paused_until
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class BroadcastStats:
+    total: int = 0
+    sent: int = 0
+    failed: int = 0
+    blocked: int = 0       # Forbidden: бот заблокований / чат видалено
+    retries: int = 0
+    retry_after_waits: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    duration: float = 0.0  # секунди від старту до останньої відправки
+    failed_chat_ids: list = field(default_factory=list)
+
+    @property
+    def rate(self) -> float:
+        return self.sent / self.duration if self.duration else 0.0
+
+
+class Broadcaster:
+    """
+    Один екземпляр на бота: token bucket і ліміти на чат спільні для всіх розсилок,
+    тому паралельні розсилки (попередження + «графік змінено») не перевищують ліміт разом.
+    """
+
+    def __init__(
+        self,
+        rate: float = 30,
+        workers: int = 20,
+        per_chat_interval: float = 1.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+    ):
+        self.bucket = TokenBucket(rate)
+        self.workers = workers
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self._chat_next: dict[int, float] = {}
+
+    async def _wait_chat(self, chat_id):
+        now = time.monotonic()
+        ready = self._chat_next.get(chat_id, 0.0)
+        self._chat_next[chat_id] = max(now, ready) + self.per_chat_interval
+        if ready > now:
+            await asyncio.sleep(ready - now)
+
+    def _prune_chats(self):
+        now = time.monotonic()
+        if len(self._chat_next) > 10_000:
+            self._chat_next = {k: v for k, v in self._chat_next.items() if v > now}
+
+    async def _send_one(self, bot, chat_id, text: str, kwargs: dict, stats: BroadcastStats):
+        attempt = 0
+        while True:
+            await self._wait_chat(chat_id)
+            await self.bucket.acquire()
+            t = time.perf_counter()
+            try:
+                await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+                SEND_SECONDS.observe(time.perf_counter() - t)
+                stats.sent += 1
+                _SENT.inc()
+                return
+            except RetryAfter as e:
+                # Flood control — гальмуємо всю розсилку, а не лише цей чат
+                stats.retry_after_waits += 1
+                _RETRY_AFTER.inc()
+                # PTB 21: секунди (int) або timedelta — залежно від налаштування
+                retry_after = e.retry_after
+                delay = retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+                logger.warning("RetryAfter %.0fs під час розсилки", delay)
+                self.bucket.pause(delay)
+            except Forbidden:
+                stats.blocked += 1
+                _BLOCKED.inc()
+                stats.failed_chat_ids.append(chat_id)
+                return
+            except BadRequest as e:
+                logger.warning("Не вдалося відправити повідомлення %s: %s", chat_id, e)
+                stats.failed += 1
+                _FAILED.inc()
+                stats.failed_chat_ids.append(chat_id)
+                return
+            except (NetworkError, asyncio.TimeoutError) as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    logger.warning("Не вдалося відправити повідомлення %s: %s", chat_id, e)
+                    stats.failed += 1
+                    _FAILED.inc()
+                    stats.failed_chat_ids.append(chat_id)
+                    return
+                stats.retries += 1
+                _RETRY_NETWORK.inc()
+                await asyncio.sleep(self.backoff_base * 2 ** (attempt - 1) * (1 + random.random()))
+            except Exception as e:
+                logger.warning("Не вдалося відправити повідомлення %s: %s", chat_id, e)
+                stats.failed += 1
+                _FAILED.inc()
+                stats.failed_chat_ids.append(chat_id)
+                return
+
+    async def send(self, bot, chat_ids, text: str, **kwargs) -> BroadcastStats:
+        """Надсилає text усім chat_ids; повертає статистику після завершення."""
+        chat_ids = list(chat_ids)
+        stats = BroadcastStats(total=len(chat_ids))
+        if not chat_ids:
+            return stats
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for cid in chat_ids:
+            queue.put_nowait(cid)
+
+        async def worker():
+            while True:
+                try:
+                    cid = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await self._send_one(bot, cid, text, kwargs, stats)
+
+        n = min(self.workers, len(chat_ids))
+        await asyncio.gather(*(worker() for _ in range(n)))
+
+        stats.duration = time.monotonic() - stats.started_at
+        BROADCAST_SECONDS.observe(stats.duration)
+        BROADCAST_RATE.set(stats.rate)
+        self._prune_chats()
+        logger.info(
+            "Розсилка: %s/%s доставлено, %s помилок, %s заблокували бота, %s повторів, "
+            "%s RetryAfter, %.2fs (%.1f msg/s)",
+            stats.sent, stats.total, stats.failed, stats.blocked, stats.retries,
+            stats.retry_after_waits, stats.duration, stats.rate,
+        )
+        return stats
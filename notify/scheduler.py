@@ -0,0 +1,116 @@
+# scheduler.py
+"""
+Планувальник попереджень за дедлайнами замість опитування «чи є щось у вікні».
+
+Для кожного інтервалу знімка і кожного часу попередження (lead, хвилин) у купі
+лежить таймер на момент start - lead. Цикл run() спить рівно до найближчого
+дедлайну (або до rearm(), якщо графік змінився) і запускає fire(interval, lead)
+окремою задачею: довга розсилка однієї підчерги не відсуває інші попередження
+(загальний темп тримає Broadcaster). Частота завантаження сторінки більше не впливає
+на точність попереджень.
+"""
+import asyncio
+import heapq
+import logging
+import time
+from typing import Awaitable, Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Довше не спимо навіть без дедлайнів — захист від стрибків системного годинника
+MAX_SLEEP_SECONDS = 60
+
+
+class DeadlineScheduler:
+    def __init__(self):
+        self._heap: list[tuple[float, int, object, int]] = []
+        self._seq = 0
+        self._snapshot = None
+        self._leads: frozenset[int] = frozenset()
+        self._changed = asyncio.Event()
+        self._fire: Callable[[object, int], Awaitable] | None = None
+        # (ключ інтервалу, lead) -> задача, що ще розсилає
+        self._tasks: dict[tuple[str, int], asyncio.Task] = {}
+
+    def rearm(self, snapshot, leads: Iterable[int], now: float | None = None) -> bool:
+        """
+        Перебудовує купу під новий знімок / набір lead-часів. Таймери, дедлайн яких
+        вже минув, але інтервал ще не почався, спрацюють одразу (надолужуємо).
+        Повертає False, якщо нічого не змінилось.
+        """
+        leads = frozenset(leads)
+        if snapshot is self._snapshot and leads == self._leads:
+            return False
+        now = time.time() if now is None else now
+        heap = []
+        seq = self._seq
+        for iv in snapshot.intervals:
+            start = iv.start.timestamp()
+            if start < now:
+                continue
+            for lead in leads:
+                seq += 1
+                heap.append((start - lead * 60, seq, iv, lead))
+        heapq.heapify(heap)
+        self._heap, self._seq = heap, seq
+        self._snapshot, self._leads = snapshot, leads
+        self._changed.set()
+        logger.info("Планувальник: %s таймерів, lead=%s", len(heap), sorted(leads))
+        return True
+
+    def next_deadline(self) -> float | None:
+        return self._heap[0][0] if self._heap else None
+
+    def pending(self) -> int:
+        return len(self._heap)
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    async def fire_due(self, now: float | None = None, fire=None) -> int:
+        """
+        Запускає fire() окремою задачею для всіх таймерів з дедлайном <= now і не чекає
+        на розсилку (див. drain()). Повертає кількість таймерів.
+        """
+        fire = fire or self._fire
+        now = time.time() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap))
+        for _deadline, _seq, iv, lead in due:
+            if iv.start.timestamp() < now:
+                continue  # вже почалось — попереджати пізно
+            key = (iv.key, lead)
+            if key in self._tasks:
+                continue  # rearm() повернув таймер, поки попередження ще розсилається
+            task = asyncio.create_task(self._fire_one(fire, iv, lead))
+            self._tasks[key] = task
+            task.add_done_callback(lambda _t, key=key: self._tasks.pop(key, None))
+        return len(due)
+
+    @staticmethod
+    async def _fire_one(fire, iv, lead: int):
+        try:
+            await fire(iv, lead)
+        except Exception as e:
+            logger.exception("Помилка попередження %s (lead %s): %s", iv.key, lead, e)
+
+    async def drain(self):
+        """Чекає, доки завершаться всі запущені попередження."""
+        while self._tasks:
+            await asyncio.gather(*self._tasks.values())
+
+    async def run(self, fire: Callable[[object, int], Awaitable]):
+        """Основний цикл: спить до найближчого дедлайну або до rearm()."""
+        self._fire = fire
+        while True:
+            self._changed.clear()
+            await self.fire_due()
+            deadline = self.next_deadline()
+            timeout = MAX_SLEEP_SECONDS
+            if deadline is not None:
+                timeout = min(timeout, max(0.0, deadline - time.time()))
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
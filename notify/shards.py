@@ -0,0 +1,241 @@
+# shards.py
+"""
+Розсилка в кількох процесах: для дуже великих підчерг одного ядра мало
+(JSON, TLS і логування розсилки виконуються в тому ж event loop, що й бот).
+
+ShardedBroadcaster має той самий інтерфейс, що й Broadcaster (send -> BroadcastStats):
+- чати розподіляються між N процесами за chat_id % N — один чат завжди в одному
+  процесі, тож ліміт «раз на per_chat_interval» лишається коректним;
+- кожен процес — власний event loop, Bot з окремим пулом з'єднань і Broadcaster
+  з часткою загального бюджету (rate / N повідомлень/с, workers / N відправок);
+- координатор (процес бота) збирає BroadcastStats з усіх шардів в одну.
+
+Журнал notified і БД воркери не чіпають: позначає лише координатор, як і раніше.
+Якщо процес шарда впав, координатор перезапускає його і один раз повторює
+незавершене завдання (можливий дубль для частини чатів — краще, ніж пропуск).
+"""
+import asyncio
+import itertools
+import logging
+import multiprocessing as mp
+import signal
+import threading
+import time
+from collections import defaultdict
+
+from monitoring.metrics import BROADCAST_RATE, BROADCAST_SECONDS, SEND_RETRIES, SEND_TOTAL
+from notify.broadcast import BroadcastStats, Broadcaster
+
+logger = logging.getLogger(__name__)
+
+# Як часто перевіряти, чи живий процес шарда, поки чекаємо результат
+_LIVENESS_CHECK_SECONDS = 1.0
+
+
+# ------------------------
+# Процес-воркер
+# ------------------------
+def _worker_main(index, token, base_url, rate, workers, per_chat_interval, max_retries, jobs, results):
+    # Зупинкою керує координатор (close()), а не Ctrl+C усієї групи процесів
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f"%(asctime)s [shard {index}] %(levelname)s %(name)s: %(message)s",
+    )
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    asyncio.run(_worker_loop(token, base_url, rate, workers, per_chat_interval, max_retries, jobs, results))
+
+
+async def _worker_loop(token, base_url, rate, workers, per_chat_interval, max_retries, jobs, results):
+    from telegram import Bot
+    from telegram.request import HTTPXRequest
+
+    bot = Bot(token, base_url=base_url, request=HTTPXRequest(connection_pool_size=workers + 2))
+    broadcaster = Broadcaster(
+        rate=rate, workers=workers, per_chat_interval=per_chat_interval, max_retries=max_retries
+    )
+    loop = asyncio.get_running_loop()
+    tasks: set[asyncio.Task] = set()
+
+    async def run(job_id, chat_ids, text, kwargs):
+        try:
+            stats = await broadcaster.send(bot, chat_ids, text, **kwargs)
+        except Exception as e:
+            logger.exception("Помилка розсилки в шарді: %s", e)
+            stats = BroadcastStats(total=len(chat_ids), failed=len(chat_ids), failed_chat_ids=list(chat_ids))
+        results.put((job_id, stats))
+
+    async with bot:
+        while True:
+            job = await loop.run_in_executor(None, jobs.get)
+            if job is None:
+                break
+            task = asyncio.create_task(run(*job))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+
+
+# ------------------------
+# Координатор
+# ------------------------
+class _Shard:
+    def __init__(self, index: int, process, jobs):
+        self.index = index
+        self.process = process
+        self.jobs = jobs
+
+
+class ShardedBroadcaster:
+    def __init__(
+        self,
+        processes: int,
+        rate: float = 30,
+        workers: int = 20,
+        per_chat_interval: float = 1.0,
+        max_retries: int = 3,
+    ):
+        self.processes = max(1, processes)
+        self.rate = rate
+        self.workers = workers
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self._ctx = mp.get_context("spawn")  # fork процесу з потоками й event loop небезпечний
+        self._shards: list[_Shard] = []
+        self._results = None
+        self._reader: threading.Thread | None = None
+        self._pending: dict[int, tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+        self._job_ids = itertools.count(1)
+        self._bot_args: tuple[str, str] | None = None
+
+    def shard_of(self, chat_id) -> int:
+        return int(chat_id) % self.processes
+
+    # --- життєвий цикл процесів ---
+    def _start_shard(self, index: int) -> _Shard:
+        token, base_url = self._bot_args
+        jobs = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(
+                index, token, base_url,
+                self.rate / self.processes,
+                max(1, self.workers // self.processes),
+                self.per_chat_interval,
+                self.max_retries,
+                jobs, self._results,
+            ),
+            name=f"broadcast-shard-{index}",
+            daemon=True,
+        )
+        process.start()
+        return _Shard(index, process, jobs)
+
+    def _ensure_started(self, bot):
+        if self._shards:
+            return
+        base_url = bot.base_url
+        if base_url.endswith(bot.token):
+            base_url = base_url[: -len(bot.token)]
+        self._bot_args = (bot.token, base_url)
+        self._results = self._ctx.Queue()
+        self._shards = [self._start_shard(i) for i in range(self.processes)]
+        self._reader = threading.Thread(target=self._read_results, name="broadcast-results", daemon=True)
+        self._reader.start()
+        logger.info(
+            "Розсилка: %s процесів, по %.1f msg/s і %s відправок на процес",
+            self.processes, self.rate / self.processes, max(1, self.workers // self.processes),
+        )
+
+    def _restart(self, index: int):
+        shard = self._shards[index]
+        if shard.process.is_alive():
+            return  # вже перезапущено іншим очікувачем
+        logger.error("Шард розсилки %s завершився (exitcode %s), перезапуск", index, shard.process.exitcode)
+        self._shards[index] = self._start_shard(index)
+
+    def _read_results(self):
+        while True:
+            item = self._results.get()
+            if item is None:
+                return
+            job_id, stats = item
+            waiter = self._pending.pop(job_id, None)
+            if waiter is not None:
+                loop, fut = waiter
+                loop.call_soon_threadsafe(lambda f=fut, s=stats: f.done() or f.set_result(s))
+
+    # --- розсилка ---
+    async def _run_job(self, index: int, chat_ids: list, text: str, kwargs: dict) -> BroadcastStats:
+        loop = asyncio.get_running_loop()
+        for _attempt in range(2):
+            shard = self._shards[index]
+            job_id = next(self._job_ids)
+            fut = loop.create_future()
+            self._pending[job_id] = (loop, fut)
+            shard.jobs.put((job_id, chat_ids, text, kwargs))
+            while not fut.done():
+                await asyncio.wait({fut}, timeout=_LIVENESS_CHECK_SECONDS)
+                if not fut.done() and not shard.process.is_alive():
+                    break
+            if fut.done():
+                return fut.result()
+            self._pending.pop(job_id, None)
+            self._restart(index)
+        return BroadcastStats(total=len(chat_ids), failed=len(chat_ids), failed_chat_ids=list(chat_ids))
+
+    async def send(self, bot, chat_ids, text: str, **kwargs) -> BroadcastStats:
+        """Розбиває chat_ids по шардах, чекає всі і повертає сумарну статистику."""
+        chat_ids = list(chat_ids)
+        stats = BroadcastStats(total=len(chat_ids))
+        if not chat_ids:
+            return stats
+        self._ensure_started(bot)
+
+        by_shard: dict[int, list] = defaultdict(list)
+        for cid in chat_ids:
+            by_shard[self.shard_of(cid)].append(cid)
+        parts = await asyncio.gather(
+            *(self._run_job(i, ids, text, kwargs) for i, ids in by_shard.items())
+        )
+
+        for part in parts:
+            stats.sent += part.sent
+            stats.failed += part.failed
+            stats.blocked += part.blocked
+            stats.retries += part.retries
+            stats.retry_after_waits += part.retry_after_waits
+            stats.failed_chat_ids.extend(part.failed_chat_ids)
+        stats.duration = time.monotonic() - stats.started_at
+
+        # Метрики процесів-шардів до /metrics не доходять — рахуємо тут
+        SEND_TOTAL.labels("sent").inc(stats.sent)
+        SEND_TOTAL.labels("failed").inc(stats.failed)
+        SEND_TOTAL.labels("blocked").inc(stats.blocked)
+        SEND_RETRIES.labels("network").inc(stats.retries)
+        SEND_RETRIES.labels("retry_after").inc(stats.retry_after_waits)
+        BROADCAST_SECONDS.observe(stats.duration)
+        BROADCAST_RATE.set(stats.rate)
+        logger.info(
+            "Розсилка (%s шардів): %s/%s доставлено, %s помилок, %s заблокували бота, %s повторів, "
+            "%s RetryAfter, %.2fs (%.1f msg/s)",
+            len(by_shard), stats.sent, stats.total, stats.failed, stats.blocked, stats.retries,
+            stats.retry_after_waits, stats.duration, stats.rate,
+        )
+        return stats
+
+    def close(self, timeout: float = 30):
+        """Дочікується завершення поточних завдань у шардах і зупиняє процеси."""
+        for shard in self._shards:
+            shard.jobs.put(None)
+        deadline = time.monotonic() + timeout
+        for shard in self._shards:
+            shard.process.join(max(0.1, deadline - time.monotonic()))
+            if shard.process.is_alive():
+                shard.process.terminate()
+        if self._results is not None:
+            self._results.put(None)
+        if self._reader is not None:
+            self._reader.join(5)
+        self._shards = []
+        self._reader = None
@@ -0,0 +1,167 @@
+# cache.py
+"""
+Спільний (на весь процес) кеш сторінки з графіками ZOE.
+
+- TTL: поки запис свіжий, мережевих запитів немає взагалі;
+- ревалідація через ETag / Last-Modified (умовний GET, відповідь 304 — без парсингу);
+- single-flight: паралельні запити чекають на одне і те саме завантаження;
+- хеш тіла: якщо сервер віддав 200, але сторінка не змінилась — парсинг пропускаємо.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from monitoring.metrics import PARSE_SECONDS, ZOE_FETCH_BYTES, ZOE_FETCH_ERRORS, ZOE_FETCH_SECONDS
+from schedule.fetcher import ZOE_FETCHER, ZoeFetcher
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ScheduleEntry:
+    """Останній успішно отриманий і розібраний стан сторінки."""
+
+    url: str
+    data: Any                      # результат parse(html)
+    etag: str | None = None
+    last_modified: str | None = None
+    fetched_at: float = 0.0        # time.monotonic() останнього 200
+    validated_at: float = 0.0      # time.monotonic() останнього 200/304
+    checked_at: float = 0.0        # time.monotonic() останньої спроби (навіть невдалої)
+    stale: bool = False            # True, якщо останнє оновлення завершилось помилкою
+    content_hash: str = ""         # sha256 тіла сторінки
+    version: int = 0               # +1 при кожній зміні вмісту
+
+    def age(self) -> float:
+        return time.monotonic() - self.validated_at
+
+
+class ScheduleCache:
+    """
+    Кеш однієї сторінки. parse(html) викликається лише коли сервер віддав нове тіло.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        parse: Callable[[str], Any],
+        ttl_seconds: float = 60,
+        timeout: float = 15,
+        fetcher: ZoeFetcher | None = None,
+    ):
+        self.url = url
+        self.parse = parse
+        self.ttl_seconds = ttl_seconds
+        self.timeout = timeout
+        self.fetcher = fetcher or ZOE_FETCHER
+        self._entry: ScheduleEntry | None = None
+        self._inflight: asyncio.Task | None = None
+
+    @property
+    def entry(self) -> ScheduleEntry | None:
+        return self._entry
+
+    def restore(self, entry: ScheduleEntry):
+        """
+        Запис зі збереженого стану (теплий старт після перезапуску). Його ETag /
+        Last-Modified підуть в умовний GET, тож незмінна сторінка — це 304 без парсингу.
+        """
+        if self._entry is None:
+            self._entry = entry
+
+    def is_fresh(self, max_age: float | None = None) -> bool:
+        """True, якщо get(max_age) віддасть запис з кешу без звернення до сайту."""
+        if max_age is None:
+            max_age = self.ttl_seconds
+        entry = self._entry
+        # Після помилки теж чекаємо max_age, щоб не смикати сайт, який і так лежить
+        return entry is not None and time.monotonic() - entry.checked_at < max_age
+
+    async def get(self, max_age: float | None = None) -> ScheduleEntry:
+        """
+        Повертає запис з кешу, якщо він молодший за max_age (за замовчуванням — TTL),
+        інакше ревалідує сторінку. Кидає виняток лише якщо даних немає взагалі.
+        """
+        if self.is_fresh(max_age):
+            return self._entry
+        return await self.refresh()
+
+    async def refresh(self) -> ScheduleEntry:
+        """Примусова ревалідація (умовний GET). Паралельні виклики ділять один запит."""
+        task = self._inflight
+        if task is None or task.done():
+            task = asyncio.get_running_loop().create_task(self._refresh())
+            self._inflight = task
+        # shield — щоб скасування одного з очікувачів не скасувало спільний запит
+        return await asyncio.shield(task)
+
+    async def _refresh(self) -> ScheduleEntry:
+        prev = self._entry
+        headers = {}
+        if prev is not None:
+            if prev.etag:
+                headers["If-None-Match"] = prev.etag
+            if prev.last_modified:
+                headers["If-Modified-Since"] = prev.last_modified
+
+        try:
+            logger.info("Fetching ZOE page: %s", self.url)
+            resp = await self.fetcher.get(self.url, headers=headers, timeout=self.timeout)
+            logger.info(
+                "ZOE response: status=%s url=%s size=%s elapsed=%.2fs",
+                resp.status_code, resp.url, resp.size, resp.elapsed,
+            )
+            ZOE_FETCH_SECONDS.labels(resp.status_code).observe(resp.elapsed)
+            ZOE_FETCH_BYTES.observe(resp.size)
+
+            now = time.monotonic()
+            if resp.status_code == 304:
+                if prev is None:
+                    # Валідаторів не надсилали (кешу немає) — порожнє тіло не можна прийняти за графік
+                    raise RuntimeError("ZOE HTTP 304 без кешованої сторінки")
+                prev.validated_at = prev.checked_at = now
+                prev.stale = False
+                return prev
+
+            if resp.status_code >= 400:
+                raise RuntimeError(f"ZOE HTTP {resp.status_code}")
+
+            content_hash = hashlib.sha256(resp.content).hexdigest()
+            if prev is not None and prev.content_hash == content_hash:
+                # Сервер не підтримує умовні запити, але сторінка та сама
+                prev.etag = resp.headers.get("ETag")
+                prev.last_modified = resp.headers.get("Last-Modified")
+                prev.validated_at = prev.checked_at = now
+                prev.stale = False
+                return prev
+
+            # Розбір HTML — чиста CPU-робота, виносимо з event loop
+            t = time.perf_counter()
+            data = await asyncio.to_thread(self.parse, resp.text)
+            PARSE_SECONDS.observe(time.perf_counter() - t)
+            self._entry = ScheduleEntry(
+                url=self.url,
+                data=data,
+                etag=resp.headers.get("ETag"),
+                last_modified=resp.headers.get("Last-Modified"),
+                fetched_at=now,
+                validated_at=now,
+                checked_at=now,
+                content_hash=content_hash,
+                version=(prev.version + 1) if prev is not None else 1,
+            )
+            if prev is not None:
+                logger.info("Сторінка ZOE змінилась (версія %s)", self._entry.version)
+            return self._entry
+        except Exception as ex:
+            ZOE_FETCH_ERRORS.inc()
+            if prev is None:
+                raise
+            # Краще показати трохи застарілий графік, ніж нічого
+            logger.warning("Не вдалося оновити сторінку ZOE, віддаємо кеш: %s", ex)
+            prev.stale = True
+            prev.checked_at = time.monotonic()
+            return prev
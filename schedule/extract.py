@@ -0,0 +1,57 @@
+# extract.py
+"""
+Швидке витягання тексту графіка з HTML сторінки ZOE без побудови DOM.
+
+Замість BeautifulSoup(html).get_text("\\n") по всій сторінці (меню, футер, скрипти):
+1) знаходимо область контенту (entry-content / article / main) і обрізаємо до футера;
+2) вирізаємо script/style/коментарі;
+3) замінюємо теги на "\\n" і розкодовуємо HTML-сутності.
+
+Результат еквівалентний get_text("\\n") для regex інтервалів, але в рази дешевший.
+"""
+import html
+import re
+
+from schedule.snapshot import _interval_re
+
+# Початок області контенту WordPress-сторінки, у порядку пріоритету
+_region_start_res = (
+    re.compile(r"<div\b[^>]*\bclass\s*=\s*[\"'][^\"']*\bentry-content\b", re.I),
+    re.compile(r"<article\b", re.I),
+    re.compile(r"<main\b", re.I),
+)
+_region_end_re = re.compile(r"<footer\b", re.I)
+
+_skip_re = re.compile(
+    r"<(script|style|noscript|template)\b.*?</\1\s*>|<!--.*?-->",
+    re.I | re.S,
+)
+_tag_re = re.compile(r"<[^>]*>")
+
+
+def _content_region(page: str) -> str | None:
+    for rx in _region_start_res:
+        m = rx.search(page)
+        if m:
+            end = _region_end_re.search(page, m.start())
+            return page[m.start():end.start() if end else len(page)]
+    return None
+
+
+def html_to_text(fragment: str) -> str:
+    """Текст фрагмента HTML: теги → '\\n', сутності розкодовані."""
+    fragment = _skip_re.sub("\n", fragment)
+    return html.unescape(_tag_re.sub("\n", fragment))
+
+
+def extract_schedule_text(page: str) -> str:
+    """
+    Повертає текст лише з області графіка. Якщо область не знайдено або в ній
+    немає жодного інтервалу — відкочуємось на текст усієї сторінки.
+    """
+    region = _content_region(page)
+    if region is not None:
+        text = html_to_text(region)
+        if _interval_re.search(text):
+            return text
+    return html_to_text(page)
@@ -0,0 +1,92 @@
+# fetcher.py
+"""
+Неблокуючий HTTP-клієнт для сторінок ZOE.
+
+Один httpx.AsyncClient на процес: пул з'єднань + keep-alive, gzip/deflate
+(httpx розпаковує сам), а на кожен запит — загальний бюджет часу,
+щоб повільний сайт ніколи не тримав event loop бота.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "zap-bot/1.0"
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status_code: int
+    text: str
+    content: bytes
+    headers: httpx.Headers
+    elapsed: float     # секунди від початку запиту до отримання тіла
+    size: int          # байт тіла (вже розпакованого)
+
+
+class ZoeFetcher:
+    """
+    Пул з'єднань живе поки живе бот; close() викликається при зупинці Application.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 15,
+        connect_timeout: float = 5,
+        max_connections: int = 10,
+        max_keepalive: int = 5,
+        keepalive_expiry: float = 60,
+    ):
+        self.timeout = timeout
+        self._timeouts = httpx.Timeout(timeout, connect=connect_timeout)
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._client: httpx.AsyncClient | None = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self._timeouts,
+                limits=self._limits,
+                headers={"User-Agent": USER_AGENT, "Accept-Encoding": "gzip, deflate"},
+                follow_redirects=True,
+            )
+        return self._client
+
+    async def get(self, url: str, headers: dict | None = None, timeout: float | None = None) -> FetchResult:
+        """
+        GET з загальним бюджетом часу (timeout) на весь запит: з'єднання, заголовки і тіло.
+        Статус не перевіряється — 304 і помилки обробляє викликач.
+        """
+        budget = self.timeout if timeout is None else timeout
+        client = self._get_client()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        async with asyncio.timeout(budget):
+            resp = await client.get(url, headers=headers)
+        elapsed = loop.time() - started
+        return FetchResult(
+            url=str(resp.url),
+            status_code=resp.status_code,
+            text=resp.text,
+            content=resp.content,
+            headers=resp.headers,
+            elapsed=elapsed,
+            size=len(resp.content),
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Спільний екземпляр для всього бота
+ZOE_FETCHER = ZoeFetcher()
@@ -0,0 +1,90 @@
+# poller.py
+"""
+Адаптивний період опитування сторінки ZOE замість фіксованого sleep.
+
+- часто — за годину до відомих інтервалів і одразу після зміни сторінки;
+- рідше — вночі та коли сторінка не змінювалась кілька годин;
+- при помилках / 5xx — експоненційний backoff з jitter.
+
+Поточний період і причина доступні в period / reason (логуються при зміні).
+"""
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+class PollController:
+    def __init__(
+        self,
+        base: float,
+        min_period: float = 60,
+        max_period: float = 1800,
+        pre_window: float = 3600,
+        recent_change: float = 1800,
+        stable_after: float = 3 * 3600,
+        night_hours: tuple[int, int] = (1, 6),
+        night_factor: float = 3,
+        jitter: float = 0.1,
+    ):
+        self.base = base
+        self.min_period = min(min_period, base)
+        self.max_period = max(max_period, base)
+        self.pre_window = pre_window
+        self.recent_change = recent_change
+        self.stable_after = stable_after
+        self.night_hours = night_hours
+        self.night_factor = night_factor
+        self.jitter = jitter
+
+        self.errors = 0
+        # Старт не вважаємо «нещодавньою зміною», інакше перші півгодини опитуємо на максимумі
+        self.last_change = time.monotonic() - recent_change
+        self.period = base
+        self.reason = "start"
+
+    def record(self, ok: bool, changed: bool = False):
+        """Результат чергового опитування."""
+        if not ok:
+            self.errors += 1
+            return
+        self.errors = 0
+        if changed:
+            self.last_change = time.monotonic()
+
+    def _target(self, snapshot, now: datetime) -> tuple[float, str]:
+        if self.errors:
+            # Full jitter: випадково в [base, base * 2^n], щоб не бити в сайт синхронно
+            cap = min(self.max_period, self.base * 2 ** self.errors)
+            return random.uniform(self.base, max(self.base, cap)), f"помилки ({self.errors} поспіль)"
+
+        if snapshot is not None:
+            upcoming = snapshot.starting_between(now, now + timedelta(seconds=self.pre_window))
+            if upcoming:
+                return self.min_period, f"скоро інтервал ({upcoming[0].start:%H:%M})"
+
+        since_change = time.monotonic() - self.last_change
+        if since_change < self.recent_change:
+            return self.min_period, "сторінка нещодавно змінилась"
+
+        start_h, end_h = self.night_hours
+        if start_h <= now.hour < end_h:
+            return self.base * self.night_factor, "ніч"
+
+        if since_change > self.stable_after:
+            return self.base * 2, f"без змін {since_change / 3600:.0f} год"
+
+        return self.base, "звичайний режим"
+
+    def next_delay(self, snapshot, now: datetime) -> float:
+        """Обчислює наступну затримку (сек) і оновлює period / reason."""
+        target, reason = self._target(snapshot, now)
+        if not self.errors:
+            target *= 1 + random.uniform(-self.jitter, self.jitter)
+        period = max(self.min_period, min(self.max_period, target))
+        if reason != self.reason:
+            logger.info("Період опитування ZOE: %.0fs (%s)", period, reason)
+        self.period, self.reason = period, reason
+        return period
@@ -0,0 +1,124 @@
+# recorder.py
+"""
+Запис і відтворення відповідей ZOE для детермінованих прогонів без мережі.
+
+Формат папки запису:
+    index.jsonl   — по рядку на запит: seq, ts, url, status, headers, body
+    000001.html   — тіло відповіді (для 304 тіла немає)
+
+RecordingFetcher обгортає справжній фетчер і дописує кожну відповідь у папку.
+ReplayFetcher віддає записані відповіді по черзі для кожного URL; коли записи
+закінчуються — повторює останню. Записаний 304 без валідатора в запиті
+(наприклад, кеш ще порожній) підміняється останньою записаною 200-кою.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+from schedule.fetcher import FetchResult, ZoeFetcher
+
+logger = logging.getLogger(__name__)
+
+# Заголовки, які впливають на поведінку кешу; решту не зберігаємо
+_KEPT_HEADERS = ("etag", "last-modified", "content-type", "retry-after")
+
+
+class RecordingFetcher:
+    def __init__(self, inner: ZoeFetcher, directory: str | Path):
+        self.inner = inner
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._index = self.dir / "index.jsonl"
+        # Продовжуємо нумерацію, якщо папка вже містить запис
+        self._seq = sum(1 for _ in self._index.open(encoding="utf-8")) if self._index.exists() else 0
+
+    async def get(self, url: str, headers: dict | None = None, timeout: float | None = None) -> FetchResult:
+        res = await self.inner.get(url, headers=headers, timeout=timeout)
+        await asyncio.to_thread(self._write, url, res)
+        return res
+
+    def _write(self, url: str, res: FetchResult):
+        self._seq += 1
+        body = None
+        if res.status_code != 304:
+            body = f"{self._seq:06d}.html"
+            (self.dir / body).write_bytes(res.content)
+        rec = {
+            "seq": self._seq,
+            "ts": time.time(),
+            "url": url,
+            "status": res.status_code,
+            "headers": {k: res.headers[k] for k in _KEPT_HEADERS if k in res.headers},
+            "body": body,
+        }
+        with self._index.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+    async def close(self):
+        await self.inner.close()
+
+
+class ReplayFetcher:
+    def __init__(self, directory: str | Path):
+        self.dir = Path(directory)
+        self._records: dict[str, list[dict]] = defaultdict(list)
+        with (self.dir / "index.jsonl").open(encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    rec = json.loads(line)
+                    self._records[rec["url"]].append(rec)
+        self._pos: dict[str, int] = defaultdict(int)
+        self._last_ok: dict[str, dict] = {}
+        # ts запису, відданого останнім, — щоб драйвер міг показати «записаний час»
+        self.recorded_at: float | None = None
+        logger.info(
+            "ZOE replay: %s записів для %s URL з %s",
+            sum(map(len, self._records.values())), len(self._records), self.dir,
+        )
+
+    @property
+    def urls(self) -> list[str]:
+        return list(self._records)
+
+    def steps(self, url: str) -> int:
+        return len(self._records.get(url, ()))
+
+    def _next(self, url: str) -> dict:
+        recs = self._records.get(url)
+        if not recs:
+            raise RuntimeError(f"Немає записаних відповідей для {url}")
+        i = self._pos[url]
+        if i < len(recs):
+            self._pos[url] = i + 1
+        return recs[min(i, len(recs) - 1)]
+
+    async def get(self, url: str, headers: dict | None = None, timeout: float | None = None) -> FetchResult:
+        rec = self._next(url)
+        conditional = headers and ("If-None-Match" in headers or "If-Modified-Since" in headers)
+        if rec["status"] == 304 and not conditional and url in self._last_ok:
+            rec = self._last_ok[url]
+        if rec["body"]:
+            self._last_ok[url] = rec
+        content = (self.dir / rec["body"]).read_bytes() if rec["body"] else b""
+        self.recorded_at = rec["ts"]
+        return FetchResult(
+            url=url,
+            status_code=rec["status"],
+            text=content.decode("utf-8", errors="replace"),
+            content=content,
+            headers=httpx.Headers(rec["headers"]),
+            elapsed=0.0,
+            size=len(content),
+        )
+
+    def rewind(self):
+        self._pos.clear()
+        self._last_ok.clear()
+
+    async def close(self):
+        pass
@@ -0,0 +1,271 @@
+# snapshot.py
+"""
+Розібраний графік однієї сторінки ZOE.
+
+ScheduleSnapshot будується один раз на кожне нове тіло сторінки: інтервали
+переводяться у tz-aware datetime (з урахуванням переходу через північ і розділів
+«сьогодні/завтра» чи явних дат) і складаються у відсортовані масиви по підчергах
+та чергах, тож «наступний інтервал після now» — це bisect, а не лінійний пошук.
+"""
+import bisect
+import json
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+
+# Regex інтервалів часу на сторінці ZOE: "1.2 07:00–09:00" або "1.2: 07:00 - 09:00"
+_interval_re = re.compile(
+    r"(\d+\.\d+)\s*[:\-–—]?\s*(\d{1,2}:\d{2})\s*[–\-—]\s*(\d{1,2}:\d{2})"
+)
+
+_MONTHS = {
+    "січня": 1, "лютого": 2, "березня": 3, "квітня": 4, "травня": 5, "червня": 6,
+    "липня": 7, "серпня": 8, "вересня": 9, "жовтня": 10, "листопада": 11, "грудня": 12,
+}
+
+# Маркери розділів: "17.10.2025", "17 жовтня", "завтра", "сьогодні"
+_date_marker_re = re.compile(
+    r"(?P<num>\b\d{1,2}\.\d{1,2}\.\d{4}\b)"
+    r"|(?P<word>\b\d{1,2}\s+(?:" + "|".join(_MONTHS) + r")\b)"
+    r"|(?P<rel>\b(?:сьогодні|завтра)\b)",
+    re.IGNORECASE,
+)
+
+
+@dataclass(frozen=True, order=True)
+class Interval:
+    start: datetime
+    end: datetime
+    subgroup: str
+    region: str = ""    # "" — регіон за замовчуванням (див. schedule/sources.py)
+
+    @property
+    def group_id(self) -> str:
+        return self.subgroup.split(".")[0]
+
+    @property
+    def key(self) -> str:
+        """Ключ для таблиці notified: 'YYYY-MM-DD_X.Y_HHMM' (для інших регіонів — з префіксом 'region:')."""
+        key = f"{self.start.date()}_{self.subgroup}_{self.start.strftime('%H%M')}"
+        return f"{self.region}:{key}" if self.region else key
+
+
+@dataclass(frozen=True)
+class RawInterval:
+    """Інтервал як він записаний на сторінці, до прив'язки до календаря."""
+
+    subgroup: str
+    start: str          # "HH:MM"
+    end: str            # "HH:MM"
+    day: date | None    # явна дата розділу (якщо була)
+    day_offset: int     # 0 — сьогодні, 1 — «завтра» (коли явної дати немає)
+
+
+def _parse_hm(s: str) -> tuple[int, int] | None:
+    try:
+        h, m = s.split(":")
+        h, m = int(h), int(m)
+    except ValueError:
+        return None
+    if not (0 <= h <= 24 and 0 <= m <= 59) or (h == 24 and m):
+        return None
+    return h, m
+
+
+def _marker_date(m: re.Match, today: date) -> tuple[date | None, int]:
+    if m.group("num"):
+        d, mo, y = (int(x) for x in m.group("num").split("."))
+        try:
+            return date(y, mo, d), 0
+        except ValueError:
+            return None, 0
+    if m.group("word"):
+        d_s, month_s = m.group("word").split()
+        try:
+            d = date(today.year, _MONTHS[month_s.lower()], int(d_s))
+        except ValueError:
+            return None, 0
+        # Графік «на 1 січня», опублікований 31 грудня
+        if (d - today).days < -180:
+            d = d.replace(year=d.year + 1)
+        return d, 0
+    return None, (1 if m.group("rel").lower() == "завтра" else 0)
+
+
+def extract_raw_intervals(text: str, today: date, day_offset: int = 0) -> list[RawInterval]:
+    """
+    Проходить текст сторінки один раз, запам'ятовуючи поточний розділ (дату).
+    day_offset — день інтервалів до першого маркера (1 — оголошення «на завтра»).
+    """
+    markers = [(m.start(), m) for m in _date_marker_re.finditer(text)]
+    out = []
+    mi = 0
+    day, offset = None, day_offset
+    for m in _interval_re.finditer(text):
+        while mi < len(markers) and markers[mi][0] < m.start():
+            day, offset = _marker_date(markers[mi][1], today)
+            mi += 1
+        out.append(RawInterval(m.group(1).strip(), m.group(2), m.group(3), day, offset))
+    return out
+
+
+@dataclass
+class ScheduleSnapshot:
+    """
+    Незмінний (після побудови) знімок графіка.
+    intervals — всі інтервали, відсортовані за початком;
+    by_subgroup / by_group — ті самі інтервали, згруповані і відсортовані;
+    *_starts — паралельні масиви timestamp'ів початку для bisect.
+    region — регіон, якому належать інтервали ("" — за замовчуванням).
+    """
+
+    base_date: date
+    raw: list[RawInterval]
+    tz: object = field(default=None, repr=False)
+    intervals: list[Interval] = field(default_factory=list)
+    by_subgroup: dict[str, list[Interval]] = field(default_factory=dict)
+    by_group: dict[str, list[Interval]] = field(default_factory=dict)
+    dated: bool = False     # True, якщо на сторінці були явні дати
+    region: str = ""
+    _starts: list[float] = field(default_factory=list, repr=False)
+    _sg_starts: dict[str, list[float]] = field(default_factory=dict, repr=False)
+    _group_starts: dict[str, list[float]] = field(default_factory=dict, repr=False)
+
+    # ---------- побудова ----------
+    @classmethod
+    def from_text(cls, text: str, now: datetime, region: str = "", day_offset: int = 0) -> "ScheduleSnapshot":
+        today = now.date()
+        return cls.from_raw(extract_raw_intervals(text, today, day_offset), today, now.tzinfo, region)
+
+    @classmethod
+    def from_raw(cls, raw: list[RawInterval], base_date: date, tz, region: str = "") -> "ScheduleSnapshot":
+        snap = cls(base_date=base_date, raw=raw, tz=tz, dated=any(r.day for r in raw), region=region)
+        intervals = set()
+        for r in raw:
+            iv = snap._materialize(r)
+            if iv is not None:
+                intervals.add(iv)  # сторінка часто дублює графік — прибираємо повтори
+        snap._index(sorted(intervals))
+        return snap
+
+    @classmethod
+    def from_intervals(cls, intervals, base_date: date, tz, region: str = "") -> "ScheduleSnapshot":
+        """
+        Зведений знімок з готових інтервалів (кілька джерел). Сирого тексту в нього
+        немає, тож rebase() його не перебудовує — зводимо заново з уже зсунутих знімків.
+        """
+        snap = cls(base_date=base_date, raw=[], tz=tz, dated=True, region=region)
+        snap._index(sorted(set(intervals)))
+        return snap
+
+    def _materialize(self, r: RawInterval) -> Interval | None:
+        tz = self.tz
+        s, e = _parse_hm(r.start), _parse_hm(r.end)
+        if s is None:
+            return None
+        day = r.day or (self.base_date + timedelta(days=r.day_offset))
+        start = _localize(tz, datetime.combine(day, time(s[0] % 24, s[1])) + timedelta(days=s[0] // 24))
+        if e is None:
+            end = start + timedelta(hours=2)
+        else:
+            end_naive = datetime.combine(day, time(e[0] % 24, e[1])) + timedelta(days=e[0] // 24)
+            end = _localize(tz, end_naive)
+            if end <= start:
+                # "22:00–02:00" — інтервал переходить через північ
+                end = _localize(tz, end_naive + timedelta(days=1))
+        return Interval(start, end, r.subgroup, self.region)
+
+    def _index(self, intervals: list[Interval]):
+        self.intervals = intervals
+        self._starts = [iv.start.timestamp() for iv in intervals]
+        by_sg: dict[str, list[Interval]] = {}
+        by_g: dict[str, list[Interval]] = {}
+        for iv in intervals:  # вже відсортовані — групи теж будуть відсортовані
+            by_sg.setdefault(iv.subgroup, []).append(iv)
+            by_g.setdefault(iv.group_id, []).append(iv)
+        self.by_subgroup = by_sg
+        self.by_group = by_g
+        self._sg_starts = {k: [iv.start.timestamp() for iv in v] for k, v in by_sg.items()}
+        self._group_starts = {k: [iv.start.timestamp() for iv in v] for k, v in by_g.items()}
+
+    def rebase(self, today: date) -> "ScheduleSnapshot":
+        """
+        Якщо на сторінці немає дат, інтервали означають «сьогодні».
+        Після півночі той самий (не змінений) текст треба прив'язати до нової дати.
+        """
+        if self.dated or today == self.base_date:
+            return self
+        return ScheduleSnapshot.from_raw(self.raw, today, self.tz, self.region)
+
+    # ---------- збереження ----------
+    def dump_raw(self) -> str:
+        """Сирі інтервали компактним JSON: з них знімок відновлюється через from_raw (і rebase працює)."""
+        return json.dumps(
+            [[r.subgroup, r.start, r.end, r.day.isoformat() if r.day else None, r.day_offset] for r in self.raw],
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+
+    # ---------- запити ----------
+    @property
+    def subgroups(self) -> list[str]:
+        return sorted(self.by_subgroup)
+
+    @staticmethod
+    def _current_or_next(items: list[Interval], starts: list[float], now: datetime) -> Interval | None:
+        ts = now.timestamp()
+        i = bisect.bisect_right(starts, ts)
+        # Інтервал, що вже йде, теж вважаємо «найближчим»
+        if i > 0 and items[i - 1].end.timestamp() > ts:
+            return items[i - 1]
+        return items[i] if i < len(items) else None
+
+    def next_for_subgroup(self, subgroup: str, now: datetime) -> Interval | None:
+        items = self.by_subgroup.get(subgroup)
+        if not items:
+            return None
+        return self._current_or_next(items, self._sg_starts[subgroup], now)
+
+    def next_for_group(self, group_id: str, now: datetime) -> Interval | None:
+        items = self.by_group.get(group_id)
+        if not items:
+            return None
+        return self._current_or_next(items, self._group_starts[group_id], now)
+
+    def starting_between(self, since: datetime, until: datetime) -> list[Interval]:
+        """Інтервали з початком у [since, until] — для розсилки попереджень."""
+        lo = bisect.bisect_left(self._starts, since.timestamp())
+        hi = bisect.bisect_right(self._starts, until.timestamp())
+        return self.intervals[lo:hi]
+
+
+def load_raw(payload: str) -> list[RawInterval]:
+    """Зворотне до ScheduleSnapshot.dump_raw()."""
+    return [
+        RawInterval(sg, start, end, date.fromisoformat(day) if day else None, int(offset))
+        for sg, start, end, day, offset in json.loads(payload)
+    ]
+
+
+def _localize(tz, dt: datetime) -> datetime:
+    # pytz потребує localize(), звичайні tzinfo — replace()
+    if hasattr(tz, "localize"):
+        return tz.localize(dt)
+    return dt.replace(tzinfo=tz)
+
+
+def diff_snapshots(
+    old: ScheduleSnapshot, new: ScheduleSnapshot, since: datetime
+) -> dict[str, tuple[list[Interval], list[Interval]]]:
+    """
+    Порівнює два знімки по підчергах, враховуючи лише інтервали, що ще не закінчились.
+    Повертає {підчерга: (прибрані, додані)} тільки для підчерг, де щось змінилось.
+    """
+    ts = since.timestamp()
+    changes = {}
+    for sg in set(old.by_subgroup) | set(new.by_subgroup):
+        before = {iv for iv in old.by_subgroup.get(sg, ()) if iv.end.timestamp() > ts}
+        after = {iv for iv in new.by_subgroup.get(sg, ()) if iv.end.timestamp() > ts}
+        if before != after:
+            changes[sg] = (sorted(before - after), sorted(after - before))
+    return changes
@@ -0,0 +1,325 @@
+# sources.py
+"""
+Кілька джерел графіка: сторінки різних обленерго, окремі оголошення
+«на сьогодні» / «на завтра».
+
+- кожне джерело — власний ScheduleCache (ETag, хеш тіла, версія, stale) і власний
+  профіль парсера (PROFILES);
+- refresh() опитує всі джерела одночасно: цикл триває стільки, скільки найповільніше
+  джерело (а не сума), і обмежений тайм-аутом fetcher'а; помилка одного джерела
+  не зачіпає інших — воно віддає свій кеш або просто пропускається;
+- знімки джерел зводяться в один ScheduleSnapshot на регіон: для кожного дня беремо
+  інтервали джерел з найвищим priority, у яких цей день є (оголошення «на завтра»
+  перекриває загальну сторінку), при однаковому priority — об'єднання.
+
+Регіон "" — регіон за замовчуванням: до нього належать користувачі без region у БД,
+і ключі notified для нього ті самі, що й до появи кількох джерел.
+
+Теплий старт: dump() віддає записи джерел, що змінились з минулого разу (бот зберігає їх
+у таблицю schedule_cache), restore() після перезапуску кладе їх назад у кеші — /next і
+таймери працюють одразу, а перший refresh() ревалідує сторінки умовним GET.
+"""
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from functools import partial
+from pathlib import Path
+from typing import Callable
+
+from schedule.cache import ScheduleCache, ScheduleEntry
+from schedule.extract import extract_schedule_text, html_to_text
+from schedule.snapshot import ScheduleSnapshot, load_raw
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ParserProfile:
+    whole_page: bool = False    # True — текст усієї сторінки, без пошуку області контенту
+    day_offset: int = 0         # день інтервалів без явної дати: 0 — сьогодні, 1 — завтра
+
+
+PROFILES = {
+    "zoe": ParserProfile(),
+    "today": ParserProfile(day_offset=0),
+    "tomorrow": ParserProfile(day_offset=1),
+    "page": ParserProfile(whole_page=True),
+}
+
+
+@dataclass(frozen=True)
+class Source:
+    name: str
+    url: str
+    region: str = ""
+    profile: str = "zoe"
+    priority: int = 0
+
+
+def load_sources(spec: str | None, default_url: str | None, default_region: str = "") -> list[Source]:
+    """
+    spec — JSON-список джерел або шлях до JSON-файлу з ним:
+        [{"name": "zoe", "url": "https://...", "region": "zp"},
+         {"name": "zoe-tomorrow", "url": "https://...", "region": "zp", "profile": "tomorrow", "priority": 1}]
+    Порожній spec — одне джерело default_url (як до появи кількох джерел).
+    Регіон default_region (або не вказаний) зберігається як "".
+    """
+    if not spec or not spec.strip():
+        return [Source("zoe", default_url)] if default_url else []
+    spec = spec.strip()
+    if not spec.startswith("["):
+        spec = Path(spec).read_text(encoding="utf-8")
+
+    default_region = default_region.strip().lower()
+    sources, names = [], set()
+    for i, item in enumerate(json.loads(spec)):
+        name = str(item.get("name") or f"source{i + 1}")
+        url = item.get("url")
+        profile = item.get("profile", "zoe")
+        if not url:
+            raise ValueError(f"Джерело {name}: не вказано url")
+        if profile not in PROFILES:
+            raise ValueError(f"Джерело {name}: невідомий профіль {profile!r} (є: {', '.join(PROFILES)})")
+        if name in names:
+            raise ValueError(f"Джерело {name} вказано двічі")
+        names.add(name)
+        region = str(item.get("region") or "").strip().lower()
+        sources.append(Source(
+            name=name,
+            url=url,
+            region="" if region == default_region else region,
+            profile=profile,
+            priority=int(item.get("priority", 0)),
+        ))
+    return sources
+
+
+def parse_page(html: str, profile: ParserProfile, now: datetime, region: str = "") -> ScheduleSnapshot:
+    """HTML сторінки -> ScheduleSnapshot за профілем джерела."""
+    text = html_to_text(html) if profile.whole_page else extract_schedule_text(html)
+    return ScheduleSnapshot.from_text(text, now, region=region, day_offset=profile.day_offset)
+
+
+def merge_snapshots(parts: list[tuple[int, ScheduleSnapshot]], base_date: date, region: str = "") -> ScheduleSnapshot:
+    """Зводить знімки одного регіону: по кожному дню — джерела з найвищим priority."""
+    if len(parts) == 1:
+        return parts[0][1]
+    best: dict[date, int] = {}
+    for prio, snap in parts:
+        for day in {iv.start.date() for iv in snap.intervals}:
+            if prio > best.get(day, prio - 1):
+                best[day] = prio
+    intervals = [iv for prio, snap in parts for iv in snap.intervals if best[iv.start.date()] == prio]
+    return ScheduleSnapshot.from_intervals(intervals, base_date, parts[0][1].tz, region)
+
+
+@dataclass
+class RegionView:
+    region: str
+    snapshot: ScheduleSnapshot
+    sources: list[str]          # джерела регіону, що мають дані
+    stale: bool = False         # хоч одне джерело регіону без свіжих даних
+
+
+@dataclass
+class ScheduleState:
+    """Результат опитування всіх джерел (аналог ScheduleEntry для одного джерела)."""
+
+    views: dict[str, RegionView]
+    snapshot: ScheduleSnapshot | None   # усі регіони разом — для планувальника і PollController
+    version: int                        # +1 при кожній зміні вмісту будь-якого джерела
+    stale: bool                         # жодне джерело не оновилось
+    failed: list[str] = field(default_factory=list)
+
+
+class MultiSourceSchedule:
+    def __init__(
+        self,
+        sources: list[Source],
+        parse: Callable[..., ScheduleSnapshot],
+        ttl_seconds: float = 60,
+        fetcher=None,
+    ):
+        """parse(html, source=Source) викликається кешем джерела лише для нового тіла сторінки."""
+        self.sources = list(sources)
+        self.caches: dict[str, ScheduleCache] = {
+            s.name: ScheduleCache(s.url, partial(parse, source=s), ttl_seconds=ttl_seconds, fetcher=fetcher)
+            for s in self.sources
+        }
+        self._by_region: dict[str, list[Source]] = {}
+        for s in self.sources:
+            self._by_region.setdefault(s.region, []).append(s)
+        self.version = 0
+        self._dumped: dict[str, tuple] = {}
+        self._versions: tuple = ()
+        self._built_key = None
+        self._views: dict[str, RegionView] = {}
+        self._snapshot: ScheduleSnapshot | None = None
+
+    @property
+    def regions(self) -> list[str]:
+        return list(self._by_region)
+
+    def url(self, region: str = "") -> str | None:
+        """Адреса основного (першого в конфігурації) джерела регіону — для «Джерело: ...»."""
+        sources = self._by_region.get(region) or self.sources
+        return self.caches[sources[0].name].url if sources else None
+
+    def age(self) -> float:
+        """Вік найстаршого з успішно отриманих джерел, сек."""
+        ages = [c.entry.age() for c in self.caches.values() if c.entry is not None]
+        return max(ages) if ages else float("nan")
+
+    async def _fetch(self, source: Source, force: bool) -> bool:
+        cache = self.caches[source.name]
+        try:
+            entry = await (cache.refresh() if force else cache.get())
+        except Exception as e:
+            # Даних від цього джерела ще немає — решта працює без нього
+            logger.warning("Джерело %s недоступне: %s", source.name, e)
+            return False
+        return not entry.stale
+
+    async def refresh(self, today: date) -> ScheduleState:
+        """Примусова ревалідація всіх джерел одночасно."""
+        ok = await asyncio.gather(*(self._fetch(s, True) for s in self.sources))
+        state = self.state(today)
+        state.failed = [s.name for s, good in zip(self.sources, ok) if not good]
+        if state.failed:
+            logger.warning("Джерела без свіжих даних: %s", ", ".join(state.failed))
+        return state
+
+    async def view(self, region: str, today: date) -> RegionView | None:
+        """Зведений графік регіону (джерела регіону — з кешу, поки не минув TTL)."""
+        caches = [self.caches[s.name] for s in self._by_region.get(region, ())]
+        has_data = any(c.entry is not None for c in caches)
+        # Джерело, яке ще жодного разу не відповіло, не тримає /next, якщо дані регіону вже є:
+        # його підхопить наступний refresh() з фонового циклу
+        due = [
+            s for s, c in zip(self._by_region.get(region, ()), caches)
+            if not c.is_fresh() and (c.entry is not None or not has_data)
+        ]
+        if due:
+            await asyncio.gather(*(self._fetch(s, False) for s in due))
+        return self.state(today).views.get(region)
+
+    # ---------- збереження між перезапусками ----------
+    @staticmethod
+    def _dump_mark(entry: ScheduleEntry) -> tuple:
+        return entry.version, entry.content_hash, entry.etag, entry.last_modified
+
+    def dump(self) -> list[dict]:
+        """Записи джерел, що змінились з попереднього dump() / restore() — рядки schedule_cache."""
+        rows = []
+        wall_now, mono_now = time.time(), time.monotonic()
+        for s in self.sources:
+            entry = self.caches[s.name].entry
+            if entry is None or entry.data is None:
+                continue
+            mark = self._dump_mark(entry)
+            if self._dumped.get(s.name) == mark:
+                continue
+            self._dumped[s.name] = mark
+            rows.append({
+                "source": s.name,
+                "url": s.url,
+                "etag": entry.etag,
+                "last_modified": entry.last_modified,
+                "content_hash": entry.content_hash,
+                "version": entry.version,
+                # monotonic не переживає перезапуск — зберігаємо час стінного годинника
+                "validated_at": wall_now - (mono_now - entry.validated_at),
+                "base_date": entry.data.base_date.isoformat(),
+                "raw": entry.data.dump_raw(),
+            })
+        return rows
+
+    def restore(self, rows, tz) -> list[str]:
+        """
+        Теплий старт: рядки schedule_cache -> кеші джерел. Запис вважається свіжим на
+        TTL (/next не чекає на сайт), але stale, поки сайт його не підтвердить.
+        Рядки джерел, яких уже немає в конфігурації (або з іншим url), пропускаються.
+        Повертає назви відновлених джерел.
+        """
+        by_name = {s.name: s for s in self.sources}
+        wall_now, mono_now = time.time(), time.monotonic()
+        restored = []
+        for row in rows:
+            source = by_name.get(row["source"])
+            if source is None or row["url"] != source.url:
+                continue
+            try:
+                snap = ScheduleSnapshot.from_raw(
+                    load_raw(row["raw"]), date.fromisoformat(row["base_date"]), tz, source.region
+                )
+            except (ValueError, TypeError) as e:
+                logger.warning("Збережений графік джерела %s пошкоджений: %s", source.name, e)
+                continue
+            validated_at = mono_now - max(0.0, wall_now - (row["validated_at"] or 0.0))
+            entry = ScheduleEntry(
+                url=source.url,
+                data=snap,
+                etag=row["etag"],
+                last_modified=row["last_modified"],
+                fetched_at=validated_at,
+                validated_at=validated_at,
+                checked_at=mono_now,
+                stale=True,
+                content_hash=row["content_hash"] or "",
+                version=row["version"] or 1,
+            )
+            self.caches[source.name].restore(entry)
+            self._dumped[source.name] = self._dump_mark(entry)
+            restored.append(source.name)
+        return restored
+
+    def state(self, today: date) -> ScheduleState:
+        """Поточні знімки з кешів, зведені по регіонах. Перебудова — лише якщо щось змінилось."""
+        entries = [self.caches[s.name].entry for s in self.sources]
+        versions = tuple(e.version if e is not None else 0 for e in entries)
+        if versions != self._versions:
+            self._versions = versions
+            self.version += 1
+
+        stale = {s.name: e is None or e.stale for s, e in zip(self.sources, entries)}
+        key = (today, versions)
+        if key != self._built_key:
+            self._build(today, entries)
+            self._built_key = key
+        for region, view in self._views.items():
+            view.stale = any(stale[s.name] for s in self._by_region[region])
+        return ScheduleState(
+            views=self._views,
+            snapshot=self._snapshot,
+            version=self.version,
+            stale=all(stale.values()),
+        )
+
+    def _build(self, today: date, entries):
+        parts: dict[str, list[tuple[int, ScheduleSnapshot]]] = {}
+        names: dict[str, list[str]] = {}
+        for source, entry in zip(self.sources, entries):
+            if entry is None:
+                continue
+            # Сторінка без дат означає «сьогодні» — після півночі прив'язуємо до нової дати
+            entry.data = entry.data.rebase(today)
+            parts.setdefault(source.region, []).append((source.priority, entry.data))
+            names.setdefault(source.region, []).append(source.name)
+
+        self._views = {
+            region: RegionView(region, merge_snapshots(p, today, region), names[region])
+            for region, p in parts.items()
+        }
+        snaps = [v.snapshot for v in self._views.values()]
+        if len(snaps) == 1:
+            self._snapshot = snaps[0]
+        elif snaps:
+            # Спільний знімок лише для таймерів і PollController: by_subgroup у ньому змішує регіони
+            self._snapshot = ScheduleSnapshot.from_intervals(
+                [iv for snap in snaps for iv in snap.intervals], today, snaps[0].tz
+            )
+        else:
+            self._snapshot = None
@@ -0,0 +1,22 @@
+# subgroups.py
+"""
+Формат підчерги 'X.Y' — спільний для бота, імпорту користувачів і парсера.
+"""
+import re
+
+# Regex перевірки формату підчерги (наприклад "1.1", "  2 . 3 ")
+_subgroup_re = re.compile(r"^\s*(\d+)\s*\.\s*(\d+)\s*$")
+
+
+def format_subgroup(raw: str) -> str | None:
+    """
+    Приводить введёну строку до вигляду 'X.Y', якщо формат валідний.
+    Інакше повертає None.
+    """
+    m = _subgroup_re.match(raw)
+    if not m:
+        return None
+    g = m.group(1)
+    s = m.group(2)
+    return f"{g}.{s}"
+
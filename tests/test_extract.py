@@ -0,0 +1,28 @@
+# test_extract.py
+"""
+Еквівалентність швидкого витягання тексту (schedule/extract.py) і BeautifulSoup.get_text
+на збережених сторінках ZOE (tests/fixtures/*.html).
+
+Запуск з кореня репозиторію:
+    python -m pytest -q
+"""
+from pathlib import Path
+
+import pytest
+
+from bench.bench_extract import intervals_bs4, intervals_fast
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+PAGES = sorted(FIXTURES.glob("zoe_*.html"))
+
+
+def test_fixtures_present():
+    assert PAGES
+
+
+@pytest.mark.parametrize("path", PAGES, ids=lambda p: p.name)
+def test_fast_matches_bs4(path):
+    page = path.read_text(encoding="utf-8")
+    ref = intervals_bs4(page)
+    assert ref, "сторінка без інтервалів нічого не перевіряє"
+    assert intervals_fast(page) == ref
@@ -0,0 +1,160 @@
+# server.py
+"""
+Мінімальний асинхронний HTTP/1.1 сервер на asyncio streams (без сторонніх залежностей).
+
+Потрібен для локальних службових ендпоінтів: фейковий Bot API для навантажувальних
+тестів, метрики, webhook. Підтримує keep-alive і тіло з Content-Length;
+chunked-запити та TLS не підтримуються — для TLS ставимо reverse proxy.
+"""
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+from urllib.parse import parse_qsl, urlsplit
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+_REASONS = {
+    200: "OK", 204: "No Content", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden",
+    404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+    429: "Too Many Requests", 500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+@dataclass
+class Request:
+    method: str
+    target: str
+    headers: dict[str, str]
+    body: bytes
+
+    @property
+    def path(self) -> str:
+        return urlsplit(self.target).path
+
+    @property
+    def query(self) -> dict[str, str]:
+        return dict(parse_qsl(urlsplit(self.target).query))
+
+    def form(self) -> dict:
+        """Параметри з JSON-тіла або application/x-www-form-urlencoded."""
+        ctype = self.headers.get("content-type", "")
+        if "json" in ctype:
+            return json.loads(self.body or b"{}")
+        return dict(parse_qsl(self.body.decode("utf-8"), keep_blank_values=True))
+
+
+@dataclass
+class Response:
+    status: int = 200
+    body: bytes = b""
+    headers: dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def json(cls, data, status: int = 200) -> "Response":
+        return cls(
+            status,
+            json.dumps(data, ensure_ascii=False).encode("utf-8"),
+            {"Content-Type": "application/json"},
+        )
+
+    @classmethod
+    def text(cls, text: str, status: int = 200, content_type: str = "text/plain; charset=utf-8") -> "Response":
+        return cls(status, text.encode("utf-8"), {"Content-Type": content_type})
+
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+class HttpServer:
+    def __init__(self, handler: Handler, host: str = "127.0.0.1", port: int = 0):
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self._server: asyncio.AbstractServer | None = None
+        self._conns: set[asyncio.Task] = set()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        # port=0 — ОС обирає вільний порт
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("HTTP сервер слухає %s:%s", self.host, self.port)
+        return self
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            for t in list(self._conns):
+                t.cancel()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Request | None:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return None
+        except asyncio.LimitOverrunError:
+            raise ValueError("headers too large")
+        if len(head) > MAX_HEADER_BYTES:
+            raise ValueError("headers too large")
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, _version = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                k, v = line.split(":", 1)
+                headers[k.strip().lower()] = v.strip()
+        length = int(headers.get("content-length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise OverflowError("body too large")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method.upper(), target, headers, body)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._conns.add(task)
+        try:
+            while True:
+                try:
+                    req = await self._read_request(reader)
+                except OverflowError:
+                    await self._write(writer, Response(413), close=True)
+                    return
+                except (ValueError, asyncio.IncompleteReadError):
+                    await self._write(writer, Response(400), close=True)
+                    return
+                if req is None:
+                    return
+                try:
+                    resp = await self.handler(req)
+                except Exception as e:
+                    logger.exception("Помилка обробки %s %s: %s", req.method, req.path, e)
+                    resp = Response(500)
+                close = req.headers.get("connection", "").lower() == "close"
+                await self._write(writer, resp, close=close)
+                if close:
+                    return
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._conns.discard(task)
+            writer.close()
+
+    @staticmethod
+    async def _write(writer: asyncio.StreamWriter, resp: Response, close: bool = False):
+        head = [f"HTTP/1.1 {resp.status} {_REASONS.get(resp.status, 'Unknown')}"]
+        headers = {"Content-Length": str(len(resp.body)), **resp.headers}
+        if close:
+            headers["Connection"] = "close"
+        head += [f"{k}: {v}" for k, v in headers.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + resp.body)
+        await writer.drain()
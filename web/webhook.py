@@ -0,0 +1,161 @@
+# webhook.py
+"""
+Режим webhook замість run_polling: Telegram сам надсилає POST з оновленням.
+
+- перевірка X-Telegram-Bot-Api-Secret-Token (hmac.compare_digest);
+- обмежена черга прийому: якщо переповнена — 503, Telegram повторить пізніше;
+- воркери передають оновлення в app.update_processor — ті самі обробники й той самий
+  CONCURRENT_UPDATES, що й у polling: за замовчуванням (1) один воркер, тож оновлення
+  одного чату (/register, потім текст підчерги) обробляються по черзі, як прийшли;
+- при зупинці (SIGINT / SIGTERM) спершу перестаємо приймати, потім дочікуємось
+  черги (не довше drain_timeout), і лише тоді зупиняємо Application.
+
+Вебхук у Telegram при зупинці не видаляємо: поки бот перезапускається,
+Telegram накопичує оновлення і доставить їх після старту.
+"""
+import asyncio
+import hmac
+import json
+import logging
+import signal
+import time
+
+from telegram import Update
+
+from monitoring.metrics import WEBHOOK_QUEUE_DEPTH, WEBHOOK_QUEUE_WAIT, WEBHOOK_REJECTED
+from web.server import HttpServer, Request, Response
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+
+
+class WebhookIntake:
+    def __init__(
+        self,
+        app,
+        secret_token: str | None,
+        path: str = "/telegram",
+        queue_size: int = 1000,
+        workers: int = 32,
+    ):
+        self.app = app
+        self.secret_token = secret_token
+        self.path = path
+        # Паралельніше, ніж дозволяє CONCURRENT_UPDATES, не обробляємо (інакше порядок оновлень
+        # одного чату не гарантований); workers — лише верхня межа
+        self.workers = max(1, min(workers, app.update_processor.max_concurrent_updates))
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks: list[asyncio.Task] = []
+        self._closing = False
+        WEBHOOK_QUEUE_DEPTH.set_function(self.queue.qsize)
+
+    async def handle(self, req: Request) -> Response:
+        if req.path != self.path:
+            return Response(404)
+        if req.method != "POST":
+            return Response(405)
+        if self.secret_token and not hmac.compare_digest(
+            req.headers.get(SECRET_HEADER, "").encode(), self.secret_token.encode()
+        ):
+            WEBHOOK_REJECTED.labels("secret").inc()
+            return Response(403)
+        if self._closing:
+            WEBHOOK_REJECTED.labels("closing").inc()
+            return Response(503)
+        try:
+            update = Update.de_json(json.loads(req.body), self.app.bot)
+        except Exception as e:
+            logger.warning("Webhook: некоректне тіло запиту: %s", e)
+            WEBHOOK_REJECTED.labels("bad_request").inc()
+            return Response(400)
+        try:
+            self.queue.put_nowait((update, time.perf_counter()))
+        except asyncio.QueueFull:
+            WEBHOOK_REJECTED.labels("queue_full").inc()
+            return Response(503)
+        return Response(200)
+
+    async def _worker(self):
+        while True:
+            update, enqueued = await self.queue.get()
+            WEBHOOK_QUEUE_WAIT.observe(time.perf_counter() - enqueued)
+            try:
+                # Як у PTB-шному циклі отримання оновлень: через update_processor (його семафор)
+                await self.app.update_processor.process_update(update, self.app.process_update(update))
+            except Exception as e:
+                logger.exception("Webhook: помилка обробки оновлення %s: %s", update.update_id, e)
+            finally:
+                self.queue.task_done()
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def drain(self, timeout: float):
+        """Перестає приймати нові оновлення і дочікується обробки черги."""
+        self._closing = True
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Webhook: за %.0fs не оброблено %s оновлень", timeout, self.queue.qsize())
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+async def run_webhook(
+    app,
+    *,
+    listen: str,
+    port: int,
+    path: str,
+    public_url: str | None,
+    secret_token: str | None,
+    queue_size: int = 1000,
+    workers: int = 32,
+    drain_timeout: float = 30,
+    drop_pending_updates: bool = False,
+):
+    """Життєвий цикл Application у режимі webhook (аналог app.run_polling())."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+
+    intake = WebhookIntake(app, secret_token, path=path, queue_size=queue_size, workers=workers)
+    server = HttpServer(intake.handle, listen, port)
+    await app.start()
+    intake.start()
+    await server.start()
+    if public_url:
+        await app.bot.set_webhook(
+            url=public_url,
+            secret_token=secret_token,
+            allowed_updates=Update.ALL_TYPES,
+            drop_pending_updates=drop_pending_updates,
+            max_connections=min(100, intake.workers),
+        )
+        logger.info("Webhook встановлено: %s", public_url)
+    logger.info("Webhook слухає %s:%s%s", listen, server.port, path)
+
+    try:
+        await stop.wait()
+    finally:
+        logger.info("Webhook: зупинка, дочікуємось черги (до %.0fs)", drain_timeout)
+        await server.stop()
+        await intake.drain(drain_timeout)
+        if app.running:
+            await app.stop()
+            if app.post_stop:
+                await app.post_stop(app)
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)